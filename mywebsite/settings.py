@@ -19,6 +19,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Background threads that resize uploaded profile pictures (0 = resize inline)
+THUMBNAIL_WORKERS = 2
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
 
@@ -45,6 +48,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'pages.middleware.StaticFilesMiddleware',
+    'pages.middleware.PrerenderedPagesMiddleware',
+    'pages.metrics.MetricsMiddleware',
+    'pages.replicas.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -57,7 +64,8 @@ ROOT_URLCONF = 'mywebsite.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, plus render timing for /metrics
+        'BACKEND': 'pages.metrics.TimedDjangoTemplates',
         'DIRS': [BASE_DIR, 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -66,6 +74,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'pages.context_processors.unread_messages',
             ],
         },
     },
@@ -76,20 +85,171 @@ LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'home'
 
+# Most booked destinations shown on the home page
+POPULAR_DESTINATIONS_COUNT = 6
+
+# Number of destination cards per gallery page / infinite scroll batch
+GALLERY_PAGE_SIZE = 24
+
+# Number of contact messages per inbox page
+INBOX_PAGE_SIZE = 50
+
+# Days of daily activity shown on the staff dashboard
+DASHBOARD_DAYS = 30
+
+# Admin changelists count rows exactly up to this many. Past it they show
+# "about N" from the planner's statistics (refresh them with
+# `python manage.py analyze_database`), or "more than N" without any
+ADMIN_EXACT_COUNT_LIMIT = 10_000
+
+# Destinations per /api/destinations/ page, and the most ?limit= may ask for
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+
+# Rows per bulk_create batch when importing destinations
+IMPORT_BATCH_SIZE = 1000
+
 
 WSGI_APPLICATION = 'mywebsite.wsgi.application'
 
+# Serve home, about, gallery and destination detail with native async views.
+# Only worth it under an ASGI server (e.g. uvicorn mywebsite.asgi:application).
+ASYNC_PUBLIC_VIEWS = os.environ.get('ASYNC_PUBLIC_VIEWS') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # Stock sqlite3 plus pragmas and lock retries (pages/backends/sqlite/base.py)
+        'ENGINE': 'pages.backends.sqlite',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'busy_timeout': 5000,           # ms to wait for the write lock
+                'cache_size': -64000,           # 64 MB page cache per connection
+                'mmap_size': 256 * 1024 * 1024,
+                'temp_store': 'MEMORY',
+            },
+            'lock_retries': 5,
+        },
     }
 }
 
+# Read replicas: extra DATABASES aliases that only serve reads, picked by
+# pages.replicas.PrimaryReplicaRouter. Locally, USE_SQLITE_REPLICA=1 adds a
+# copy of db.sqlite3 that `python manage.py sync_replica` keeps refreshed.
+if os.environ.get('USE_SQLITE_REPLICA') == '1':
+    DATABASES['replica'] = {
+        'ENGINE': 'pages.backends.sqlite',
+        'NAME': BASE_DIR / 'db-replica.sqlite3',
+        'OPTIONS': {
+            'pragmas': {
+                'query_only': 1,
+                'cache_size': -64000,
+                'mmap_size': 256 * 1024 * 1024,
+            },
+            'lock_retries': 5,
+        },
+        # Under the test runner the alias points at the test database, not the replica file
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+DATABASE_ROUTERS = ['pages.replicas.PrimaryReplicaRouter']
+
+# Seconds a client keeps reading from the primary after one of its requests
+# wrote something; must cover the replica lag (sync_replica --interval)
+REPLICA_STICKY_SECONDS = 10
+
+
+# Contact form write-behind: submissions are appended to a local spool file
+# and `python manage.py drain_contact_queue --interval 2` stores them in
+# batches and emails staff. Off by default: the form saves directly.
+CONTACT_WRITE_BEHIND = os.environ.get('CONTACT_WRITE_BEHIND') == '1'
+CONTACT_QUEUE_PATH = os.path.join(BASE_DIR, 'contact-queue.sqlite3')
+CONTACT_QUEUE_BATCH_SIZE = 500
+
+# Sessions are read from a per-process LRU and the shared 'sessions' cache.
+# With SESSION_WRITE_BEHIND, saves are appended to a local spool file and
+# `python manage.py drain_sessions --interval 2` writes them to the
+# database in batches (and purges expired ones); off, every save writes.
+SESSION_ENGINE = 'pages.sessions'
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_WRITE_BEHIND = os.environ.get('SESSION_WRITE_BEHIND') == '1'
+SESSION_SPOOL_PATH = os.path.join(BASE_DIR, 'session-spool.sqlite3')
+SESSION_DRAIN_BATCH_SIZE = 500
+SESSION_LRU_SIZE = 10_000
+# An unchanged session is stored again only once its expiry would move this far
+SESSION_EXPIRY_REFRESH_SECONDS = 60 * 60
+# Expired sessions deleted per transaction
+SESSION_PURGE_BATCH_SIZE = 1000
+
+# Pre-rendered pages: home, about, gallery and destination pages are written
+# to PRERENDER_DIR and served to anonymous visitors without touching the
+# database. Destination changes remove the affected files and queue them in
+# a local spool; `python manage.py prerender_pages --all --interval 1`
+# renders everything once, then keeps rendering the queued pages.
+PRERENDER_PAGES = os.environ.get('PRERENDER_PAGES') == '1'
+PRERENDER_DIR = os.path.join(BASE_DIR, 'prerendered')
+PRERENDER_QUEUE_PATH = os.path.join(BASE_DIR, 'prerender-queue.sqlite3')
+# A queued page is rendered once it has seen no change for this many
+# seconds, or at the latest this long after it was first queued
+PRERENDER_DEBOUNCE_SECONDS = 2
+PRERENDER_MAX_DELAY_SECONDS = 30
+# Pages rendered per worker round
+PRERENDER_BATCH_SIZE = 200
+
+# Email: printed to the console locally
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = 'TravelXplore <noreply@travelxplore.local>'
+
+
+# Cache
+# A file-based cache is shared by every worker process on the machine
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Its own directory, so culling pages never logs anyone out
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'sessions'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100_000,
+        },
+    },
+}
+
+# Seconds a rendered public page stays cached (saving a Destination clears it sooner)
+PAGE_CACHE_TIMEOUT = 60 * 15
+
+# Each worker process writes its request metrics here; /metrics sums them
+# and folds the files of exited workers into one dead-processes.json.
+# Clear the directory on deploy to reset the counters.
+METRICS_DIR = os.path.join(BASE_DIR, 'metrics')
+
+# Seconds between metric snapshots written by each process
+METRICS_FLUSH_INTERVAL = 5
+
+# bench_routes --baseline fails when a route's p95 latency grows by more than
+# this fraction. Add route names (e.g. 'search': 0.5) to override the default.
+BENCHMARK_THRESHOLDS = {
+    'default': 0.25,
+}
+
+# ...and only when it grew by at least this many milliseconds (timer noise)
+BENCHMARK_MIN_DELTA_MS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -127,6 +287,22 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# collectstatic writes hashed, precompressed (.gz/.br) copies here, and
+# pages.middleware.StaticFilesMiddleware serves them with far-future headers
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'pages.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Seconds browsers may cache static files whose names carry no content hash
+STATIC_MAX_AGE = 60 * 60
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
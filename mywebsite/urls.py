@@ -21,14 +21,21 @@ from django.contrib import admin
 from django.urls import path
 from django.conf import settings
 from django.conf.urls.static import static
-from pages import views
+from pages import api, async_views, views
+
+# Read-heavy public pages: native async views under ASGI, or the sync ones
+public_views = async_views if settings.ASYNC_PUBLIC_VIEWS else views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('', views.home, name='home'),
-    path('about/', views.about, name='about'),
+    path('', public_views.home, name='home'),
+    path('about/', public_views.about, name='about'),
     path('contact/', views.contact, name='contact'),
-    path('gallery/', views.gallery, name='gallery'),
+    path('gallery/', public_views.gallery, name='gallery'),
+    path('gallery/page/', public_views.gallery_page, name='gallery_page'),
+    path('search/', views.search, name='search'),
+    path('highlights/<str:slug>/', views.highlight_detail, name='highlight_detail'),
+    path('highlights/<str:slug>/page/', views.highlight_page, name='highlight_page'),
     
     # Authentication URLs
     path('register/', views.register_view, name='register'),
@@ -41,18 +48,29 @@ urlpatterns = [
     path('travelers/add/', views.traveler_create, name='traveler_create'),
     path('travelers/edit/<int:id>/', views.traveler_update, name='traveler_update'),
     path('travelers/delete/<int:id>/', views.traveler_delete, name='traveler_delete'),
+    path('travelers/export/', views.traveler_export, name='traveler_export'),
     
     # Contact Messages
     path('messages/', views.message_list, name='message_list'),
     path('messages/<int:id>/', views.message_detail, name='message_detail'),
     path('messages/delete/<int:id>/', views.message_delete, name='message_delete'),
+    path('messages/export/', views.message_export, name='message_export'),
     
     # Destinations (Admin Only - except detail view)
     path('destinations/', views.destination_list, name='destination_list'),
     path('destinations/add/', views.destination_create, name='destination_create'),
+    path('destinations/import/', views.destination_import, name='destination_import'),
     path('destinations/edit/<int:id>/', views.destination_update, name='destination_update'),
     path('destinations/delete/<int:id>/', views.destination_delete, name='destination_delete'),
-    path('destinations/<int:id>/', views.destination_detail, name='destination_detail'),
+    path('destinations/<int:id>/', public_views.destination_detail, name='destination_detail'),
+
+    # Read-only JSON API
+    path('api/destinations/', api.destination_list, name='api_destination_list'),
+    path('api/destinations/<int:id>/', api.destination_detail, name='api_destination_detail'),
+
+    # Monitoring (Admin Only)
+    path('dashboard/', views.dashboard, name='dashboard'),
+    path('metrics', views.metrics, name='metrics'),
 ]
 
 # Serve media files in development
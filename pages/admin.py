@@ -28,20 +28,80 @@
 #     mark_as_unread.short_description = "Mark selected messages as unread"
 
 
+from functools import partial
+
 from django.contrib import admin
-from .models import UserProfile, ContactMessage, Traveler
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from .cache import bump_destinations_version, get_destinations_version
+from .counters import invalidate_unread_counts
+from .models import UserProfile, ContactMessage, Traveler, Destination
+from .pagination import EstimatedCountPaginator
+from .prerender import rerender_destination_pages
+from .replicas import replica_may_be_stale
+from .rollups import add_to_rollups, count_by_day
+from .search import fts_available, matching_ids
+
+# Filter choices change with the destinations version, so this only bounds
+# how long entries for old versions linger
+ADMIN_FILTER_CACHE_TIMEOUT = 60 * 60
+
+
+class FastChangeListMixin:
+    # Capped COUNT(*) for the page links, and no second unfiltered count
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class CountryListFilter(admin.SimpleListFilter):
+    title = 'country'
+    parameter_name = 'country'
+
+    def lookups(self, request, model_admin):
+        # One DISTINCT over dest_country_idx per destinations version
+        version = get_destinations_version()
+        key = f'admin:countries:{version}'
+        countries = cache.get(key)
+        if countries is None:
+            countries = list(
+                Destination.objects.order_by('country').values_list('country', flat=True).distinct()
+            )
+            if not replica_may_be_stale(version):
+                cache.set(key, countries, ADMIN_FILTER_CACHE_TIMEOUT)
+        return [(country, country) for country in countries]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(country=self.value())
+        return queryset
+
+
+class LinkedDestinationListFilter(admin.SimpleListFilter):
+    title = 'linked destination'
+    parameter_name = 'linked'
+
+    def lookups(self, request, model_admin):
+        return [('yes', 'Linked'), ('no', 'Not linked')]
+
+    def queryset(self, request, queryset):
+        if self.value() in ('yes', 'no'):
+            return queryset.filter(linked_destination__isnull=self.value() == 'no')
+        return queryset
 
 
 @admin.register(UserProfile)
-class UserProfileAdmin(admin.ModelAdmin):
+class UserProfileAdmin(FastChangeListMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'phone', 'date_of_birth')
+    list_select_related = ('user',)
     search_fields = ('user__username', 'user__email', 'phone')
     list_filter = ('date_of_birth',)
+    autocomplete_fields = ('user',)
     ordering = ('id',)
 
 
 @admin.register(ContactMessage)
-class ContactMessageAdmin(admin.ModelAdmin):
+class ContactMessageAdmin(FastChangeListMixin, admin.ModelAdmin):
     list_display = (
         'id',
         'name',
@@ -52,24 +112,38 @@ class ContactMessageAdmin(admin.ModelAdmin):
     )
     search_fields = ('name', 'email', 'subject')
     list_filter = ('is_read', 'created_at')
+    autocomplete_fields = ('user',)
     ordering = ('-created_at',)
     readonly_fields = ('created_at',)
 
     actions = ['mark_as_read', 'mark_as_unread']
 
+    def _set_read(self, queryset, is_read):
+        with transaction.atomic():
+            changing = queryset.filter(is_read=not is_read)
+            rows = list(changing.values_list('user_id', 'created_at'))
+            changing.update(is_read=is_read)
+            # update() sends no post_save, so move the daily unread counts here
+            change = -1 if is_read else 1
+            add_to_rollups({
+                day: {column: count * change for column, count in columns.items()}
+                for day, columns in count_by_day((created_at for _, created_at in rows), 'unread_messages').items()
+            })
+        invalidate_unread_counts(user_id for user_id, _ in rows)
+
     def mark_as_read(self, request, queryset):
-        queryset.update(is_read=True)
+        self._set_read(queryset, True)
 
     mark_as_read.short_description = "Mark selected messages as read"
 
     def mark_as_unread(self, request, queryset):
-        queryset.update(is_read=False)
+        self._set_read(queryset, False)
 
     mark_as_unread.short_description = "Mark selected messages as unread"
 
 
 @admin.register(Traveler)
-class TravelerAdmin(admin.ModelAdmin):
+class TravelerAdmin(FastChangeListMixin, admin.ModelAdmin):
     list_display = (
         'id',
         'name',
@@ -79,7 +153,55 @@ class TravelerAdmin(admin.ModelAdmin):
         'user',
         'created_at',
     )
+    list_select_related = ('user',)
     search_fields = ('name', 'email', 'destination', 'user__username')
-    list_filter = ('destination', 'created_at')
+    # Filtering on the free-text destination ran a SELECT DISTINCT over every
+    # traveler on each page load; search finds a destination instead
+    list_filter = ('created_at', LinkedDestinationListFilter)
+    autocomplete_fields = ('user', 'linked_destination')
     ordering = ('-created_at',)
     readonly_fields = ('created_at',)
+
+
+@admin.register(Destination)
+class DestinationAdmin(FastChangeListMixin, admin.ModelAdmin):
+    list_display = ('id', 'name', 'country', 'category', 'price_per_day', 'is_featured', 'created_at')
+    list_filter = ('is_featured', 'category', CountryListFilter)
+    search_fields = ('name', 'country')
+    autocomplete_fields = ('created_by',)
+    # Derived from the highlights text on save (see highlights.py); a form
+    # field would overwrite those links straight afterwards
+    exclude = ('highlight_tags',)
+    ordering = ('-created_at',)
+    readonly_fields = ('created_at', 'updated_at')
+
+    actions = ['mark_as_featured', 'mark_as_not_featured']
+
+    def get_search_results(self, request, queryset, search_term):
+        # The FTS5 index rather than a LIKE scan over every destination. It
+        # matches word prefixes in search_fields only, and every hit is kept
+        # (a subquery, not a list of ids) for the changelist to paginate.
+        if not search_term or not fts_available():
+            return super().get_search_results(request, queryset, search_term)
+        ids = matching_ids(search_term, self.search_fields)
+        if ids is None:
+            return queryset.none(), False
+        return queryset.filter(id__in=ids), False
+
+    def _set_featured(self, queryset, is_featured):
+        # updated_at feeds the page ETags, and auto_now is skipped by update()
+        queryset.update(is_featured=is_featured, updated_at=timezone.now())
+        # update() sends no post_save either. Only the home page shows which
+        # destinations are featured, so no destination page needs rendering
+        transaction.on_commit(bump_destinations_version)
+        transaction.on_commit(partial(rerender_destination_pages, []))
+
+    def mark_as_featured(self, request, queryset):
+        self._set_featured(queryset, True)
+
+    mark_as_featured.short_description = "Feature selected destinations"
+
+    def mark_as_not_featured(self, request, queryset):
+        self._set_featured(queryset, False)
+
+    mark_as_not_featured.short_description = "Stop featuring selected destinations"
@@ -0,0 +1,148 @@
+# Read-only JSON API for the mobile client. Rows come straight from
+# .values() and are encoded without templates or model instances, and
+# every response is cached and validated by the destinations version
+# (see cache.py), so a repeat request costs one or two cache reads.
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import condition, require_safe
+
+from .cache import get_destinations_version
+from .models import Destination
+from .pagination import keyset_page
+from .replicas import replica_may_be_stale
+
+# Fields a caller may ask for with ?fields=
+API_FIELDS = ('id', 'name', 'country', 'description', 'category', 'image_url', 'price_per_day',
+              'duration_days', 'highlights', 'is_featured', 'created_at', 'updated_at')
+
+# Returned by the list endpoint without ?fields= (the gallery card columns)
+API_LIST_FIELDS = ('id', 'name', 'country', 'category', 'image_url', 'price_per_day',
+                   'duration_days', 'created_at')
+
+# Cursor keys, always fetched even when not asked for
+PAGE_KEYS = ('created_at', 'id')
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _response_key(request, version):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'api:{version}:{path}'
+
+
+def api_etag(request, *args, **kwargs):
+    # The same version that keys the cached bodies, so the ETag is strong:
+    # equal tags always mean byte-identical responses
+    version = get_destinations_version()
+    if replica_may_be_stale(version):
+        return None
+    return _response_key(request, version)
+
+
+def cached_api(view):
+    """Serve GET/HEAD API responses from the cache, keyed by the destinations version."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        version = get_destinations_version()
+        key = _response_key(request, version)
+        body = cache.get(key)
+        if body is None:
+            try:
+                data = view(request, *args, **kwargs)
+            except BadRequest as error:
+                return JsonResponse({'error': str(error)}, status=400)
+            if data is None:
+                return JsonResponse({'error': 'Not found.'}, status=404)
+            body = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+            # A replica may still miss the change that set this version
+            if not replica_may_be_stale(version):
+                cache.set(key, body, settings.PAGE_CACHE_TIMEOUT)
+        return HttpResponse(body, content_type='application/json')
+
+    conditional = require_safe(condition(etag_func=api_etag)(wrapper))
+
+    @wraps(view)
+    def without_error_validators(request, *args, **kwargs):
+        response = conditional(request, *args, **kwargs)
+        if response.status_code >= 400:
+            # Errors are never cached, so there is nothing to revalidate
+            del response['ETag']
+        return response
+
+    return without_error_validators
+
+
+def parse_fields(request, default):
+    value = request.GET.get('fields')
+    if not value:
+        return default
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in API_FIELDS]
+    if unknown or not fields:
+        raise BadRequest(f"Unknown fields: {', '.join(unknown)}. Choose from {', '.join(API_FIELDS)}.")
+    return fields
+
+
+def _price(request, name):
+    value = request.GET.get(name)
+    if not value:
+        return None
+    try:
+        price = Decimal(value)
+    except InvalidOperation:
+        raise BadRequest(f'{name} must be a number.')
+    if not price.is_finite():
+        raise BadRequest(f'{name} must be a number.')
+    return price
+
+
+def _limit(request):
+    value = request.GET.get('limit')
+    if not value:
+        return settings.API_PAGE_SIZE
+    # isdigit() alone lets through digits like '²' that int() rejects
+    if not (value.isascii() and value.isdecimal()) or not 1 <= int(value) <= settings.API_MAX_PAGE_SIZE:
+        raise BadRequest(f'limit must be between 1 and {settings.API_MAX_PAGE_SIZE}.')
+    return int(value)
+
+
+@cached_api
+def destination_list(request):
+    fields = parse_fields(request, API_LIST_FIELDS)
+    destinations = Destination.objects.all()
+
+    category = request.GET.get('category')
+    if category:
+        if category not in dict(Destination.CATEGORY_CHOICES):
+            raise BadRequest(f"category must be one of {', '.join(dict(Destination.CATEGORY_CHOICES))}.")
+        destinations = destinations.filter(category=category)
+    min_price = _price(request, 'min_price')
+    if min_price is not None:
+        destinations = destinations.filter(price_per_day__gte=min_price)
+    max_price = _price(request, 'max_price')
+    if max_price is not None:
+        destinations = destinations.filter(price_per_day__lte=max_price)
+
+    columns = tuple(dict.fromkeys(fields + PAGE_KEYS))
+    page = keyset_page(destinations.values(*columns), request.GET.get('cursor'), _limit(request))
+    extra = set(columns) - set(fields)
+    results = page.object_list
+    if extra:
+        results = [{field: row[field] for field in fields} for row in results]
+    return {'results': results, 'next_cursor': page.next_cursor}
+
+
+@cached_api
+def destination_detail(request, id):
+    fields = parse_fields(request, API_FIELDS)
+    return Destination.objects.filter(id=id).values(*fields).first()
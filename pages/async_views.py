@@ -0,0 +1,77 @@
+# Native async versions of the read-heavy public views. Under an ASGI
+# server they run on the event loop with the async ORM instead of holding
+# a worker thread each. Enabled with ASYNC_PUBLIC_VIEWS=1 (see mywebsite/urls.py).
+from django.conf import settings
+from django.shortcuts import aget_object_or_404, render
+from django.urls import reverse
+
+from .cache import aload_request_state, cache_public_page, destination_condition, destinations_condition, home_condition
+from .facets import afacet_counts, build_facets, filter_query
+from .models import Destination
+from .pagination import akeyset_page
+from .popularity import apopular_destinations
+from .views import gallery_queryset
+
+
+@home_condition
+@cache_public_page(popularity=True)
+async def home(request):
+    await aload_request_state(request)
+    featured_destinations = [
+        destination async for destination in Destination.objects.filter(is_featured=True)[:8]
+    ]
+
+    context = {
+        'title': 'Welcome to TravelXplore',
+        'featured_destinations': featured_destinations,
+        'popular_destinations': await apopular_destinations(settings.POPULAR_DESTINATIONS_COUNT),
+    }
+    return render(request, 'home.html', context)
+
+
+async def about(request):
+    await aload_request_state(request)
+    context = {
+        'title': 'About Us',
+        'details': 'We are a small company providing excellent services.'
+    }
+    return render(request, 'about.html', context)
+
+
+async def get_gallery_page(request):
+    filters, destinations = gallery_queryset(request)
+    page = await akeyset_page(destinations, request.GET.get('cursor'), settings.GALLERY_PAGE_SIZE)
+    return filters, page
+
+
+@destinations_condition
+@cache_public_page
+async def gallery(request):
+    await aload_request_state(request)
+    filters, page = await get_gallery_page(request)
+
+    context = {
+        'title': 'Gallery',
+        'destinations': page,
+        'list_path': reverse('gallery'),
+        'filter_query': filter_query(filters),
+        'facets': build_facets(filters, await afacet_counts(filters)),
+    }
+    return render(request, 'gallery.html', context)
+
+
+@destinations_condition
+@cache_public_page
+async def gallery_page(request):
+    await aload_request_state(request)
+    filters, page = await get_gallery_page(request)
+    context = {'destinations': page, 'list_path': reverse('gallery'), 'filter_query': filter_query(filters)}
+    return render(request, 'gallery_items.html', context)
+
+
+@destination_condition
+@cache_public_page
+async def destination_detail(request, id):
+    await aload_request_state(request)
+    destination = await aget_object_or_404(Destination.objects.prefetch_related('highlight_tags'), id=id)
+    return render(request, 'destination_detail.html', {'destination': destination})
@@ -0,0 +1,73 @@
+# SQLite tuned for several worker processes, configured through the
+# DATABASES OPTIONS in settings.py:
+#
+# - pragmas: run on every new connection. WAL lets readers carry on while
+#   a writer commits.
+# - transaction_mode: Django's own option. IMMEDIATE takes the write lock at
+#   BEGIN, so two transactions can't both read and then deadlock upgrading
+#   to a write; the second one waits (busy_timeout) instead.
+# - lock_retries: how often a statement still failing with "database is
+#   locked" after busy_timeout is retried, with jittered backoff. Only
+#   statements outside a transaction (BEGIN included) are retried, since
+#   nothing has been applied when those fail.
+import random
+import sqlite3
+import time
+
+from django.db.backends.sqlite3 import base
+
+# Backoff before retry n is random(0, min(MAX, BASE * 2**n)) seconds
+RETRY_BASE_DELAY = 0.05
+RETRY_MAX_DELAY = 1.0
+
+
+def is_lock_error(error):
+    message = str(error)
+    return 'database is locked' in message or 'database table is locked' in message
+
+
+def retry_locked(func, retries, *args):
+    for attempt in range(retries + 1):
+        try:
+            return func(*args)
+        except sqlite3.OperationalError as error:
+            if attempt == retries or not is_lock_error(error):
+                raise
+        # Full jitter: workers that collided wake up at different times
+        time.sleep(random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)))
+
+
+class SQLiteCursorWrapper(base.SQLiteCursorWrapper):
+    lock_retries = 0
+
+    def execute(self, query, params=None):
+        if self.connection.in_transaction:
+            return super().execute(query, params)
+        return retry_locked(super().execute, self.lock_retries, query, params)
+
+    def executemany(self, query, param_list):
+        if self.connection.in_transaction:
+            return super().executemany(query, param_list)
+        # param_list may be a one-shot iterator; a retry needs it again
+        param_list = list(param_list)
+        return retry_locked(super().executemany, self.lock_retries, query, param_list)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = kwargs.pop('pragmas', {})
+        self.lock_retries = kwargs.pop('lock_retries', 0)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=SQLiteCursorWrapper)
+        cursor.lock_retries = self.lock_retries
+        return cursor
@@ -0,0 +1,217 @@
+import http.client
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from urllib.parse import urlsplit
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from django.urls.resolvers import URLPattern
+
+from .models import ContactMessage, Destination, Highlight, Traveler
+from .seeding import seed_database
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed, errors, total_bytes):
+    done = len(latencies)
+    return {
+        'requests': done + errors,
+        'errors': errors,
+        'rps': done / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'bytes_per_request': total_bytes / done if done else 0,
+    }
+
+
+def run_http_load(base_url, paths, concurrency=20, total=1000, bust_cache=False, headers=None):
+    """
+    Send ``total`` GET requests for ``paths`` (round robin) to a running
+    server from ``concurrency`` threads, each on its own keep-alive
+    connection, and return throughput and latency percentiles.
+    """
+    parts = urlsplit(base_url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    prefix = parts.path.rstrip('/')
+    tickets = count()
+    lock = threading.Lock()
+    latencies = []
+    errors = 0
+    total_bytes = 0
+
+    def worker():
+        nonlocal errors, total_bytes
+        connection = connection_class(parts.netloc, timeout=30)
+        local_latencies = []
+        local_errors = 0
+        local_bytes = 0
+        while True:
+            ticket = next(tickets)
+            if ticket >= total:
+                break
+            path = prefix + paths[ticket % len(paths)]
+            if bust_cache:
+                # A unique query string makes every request a page cache miss
+                path += ('&' if '?' in path else '?') + f'_bench={ticket}'
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers or {})
+                response = connection.getresponse()
+                body = response.read()
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                connection.close()
+                connection = connection_class(parts.netloc, timeout=30)
+                continue
+            if response.status >= 400:
+                local_errors += 1
+                continue
+            local_latencies.append(time.perf_counter() - started)
+            local_bytes += len(body)
+        connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            errors += local_errors
+            total_bytes += local_bytes
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(worker)
+    elapsed = time.perf_counter() - started
+    return summarize(latencies, elapsed, errors, total_bytes)
+
+
+# ============ ROUTE BENCHMARK SUITE ============
+
+# Row counts of Destination, Traveler and ContactMessage per named scale
+BENCHMARK_SCALES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+
+BENCHMARK_ROLES = ('anonymous', 'member', 'staff')
+
+# GET /logout/ would end the session the rest of the run depends on
+SKIPPED_ROUTES = {'logout'}
+
+# Query strings that make a route do its real work
+ROUTE_QUERY_STRINGS = {
+    'search': '?q=destination',
+}
+
+
+def seed_benchmark_data(rows):
+    """
+    Seed ``rows`` destinations, travelers and contact messages (see
+    pages/seeding.py) and return a staff user and the busiest member.
+    """
+    staff_ids, member_ids = seed_database(
+        users=max(10, rows // 100), destinations=rows, travelers=rows, messages=rows, prefix='bench-',
+    )
+    return User.objects.get(id=staff_ids[0]), User.objects.get(id=member_ids[0])
+
+
+def benchmark_routes(staff, member, iterations=20, warmup=3, roles=BENCHMARK_ROLES, skip=()):
+    """
+    GET every named route of the project as each role through the test
+    client and return {'<route> <role>': stats} with latency percentiles,
+    queries per request and bytes per response.
+    """
+    clients = {}
+    for role in roles:
+        # Server errors are reported as a 500 status instead of ending the run
+        clients[role] = Client(raise_request_exception=False)
+        if role != 'anonymous':
+            clients[role].force_login(staff if role == 'staff' else member)
+
+    results = {}
+    for name, url in route_urls(member, skip):
+        for role in roles:
+            client = clients[role]
+            for _ in range(warmup):
+                _get(client, url)
+
+            latencies = []
+            queries = 0
+            total_bytes = 0
+            for _ in range(iterations):
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    status, size = _get(client, url)
+                    latencies.append(time.perf_counter() - started)
+                queries += len(captured)
+                total_bytes += size
+
+            results[f'{name} {role}'] = {
+                'url': url,
+                'status': status,
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p95_ms': percentile(latencies, 95) * 1000,
+                'p99_ms': percentile(latencies, 99) * 1000,
+                'queries': queries / iterations,
+                'bytes': total_bytes / iterations,
+            }
+    return results
+
+
+def route_urls(member, skip=()):
+    """(name, url) for each named route in the root URLconf, with real ids."""
+    ids = {
+        'traveler': Traveler.objects.filter(user=member).values_list('id', flat=True).first(),
+        'message': ContactMessage.objects.filter(user=member).values_list('id', flat=True).first(),
+        'destination': Destination.objects.values_list('id', flat=True).first(),
+    }
+    for pattern in get_resolver().url_patterns:
+        name = getattr(pattern, 'name', None)
+        if not isinstance(pattern, URLPattern) or not name or name in SKIPPED_ROUTES | set(skip):
+            continue
+        kwargs = {}
+        if 'id' in pattern.pattern.converters:
+            # destination_detail, api_destination_detail -> the destination id
+            kwargs['id'] = next(ids[part] for part in name.split('_') if part in ids)
+        if 'slug' in pattern.pattern.converters:
+            kwargs['slug'] = Highlight.objects.values_list('slug', flat=True).first()
+        yield name, reverse(name, kwargs=kwargs) + ROUTE_QUERY_STRINGS.get(name, '')
+
+
+def _get(client, url):
+    response = client.get(url)
+    if response.streaming:
+        size = sum(len(chunk) for chunk in response.streaming_content)
+    else:
+        size = len(response.content)
+    return response.status_code, size
+
+
+def find_regressions(baseline, current, thresholds, min_delta_ms):
+    """
+    Compare two result sets of the same scale and describe every route
+    whose p95 grew by more than its threshold (a fraction, looked up by
+    route name with a 'default' fallback) or that now runs more queries.
+    """
+    regressions = []
+    for key, stats in sorted(current.items()):
+        before = baseline.get(key)
+        if before is None:
+            continue
+        allowed = thresholds.get(key.split()[0], thresholds['default'])
+        limit = before['p95_ms'] * (1 + allowed)
+        if stats['p95_ms'] > limit and stats['p95_ms'] - before['p95_ms'] >= min_delta_ms:
+            regressions.append(
+                f"{key}: p95 {stats['p95_ms']:.1f} ms, was {before['p95_ms']:.1f} ms "
+                f"(allowed +{allowed:.0%})"
+            )
+        if stats['queries'] > before['queries']:
+            regressions.append(f"{key}: {stats['queries']:g} queries, was {before['queries']:g}")
+    return regressions
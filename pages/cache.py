@@ -0,0 +1,360 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import partial, wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import condition
+
+from .counters import aunread_count, unread_count
+from .models import Destination
+from .replicas import replica_may_be_stale
+
+DESTINATIONS_VERSION_KEY = 'destinations:version'
+POPULARITY_VERSION_KEY = 'popularity:version'
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # add() keeps the first value when several workers race here
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+async def _aget_version(key):
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key)
+    return version
+
+
+def _bump_version(key):
+    # A timestamp rather than incr(): the file cache has no atomic incr,
+    # and two workers bumping at once must still both change the version
+    cache.set(key, time.time_ns(), None)
+
+
+def get_destinations_version():
+    return _get_version(DESTINATIONS_VERSION_KEY)
+
+
+async def aget_destinations_version():
+    return await _aget_version(DESTINATIONS_VERSION_KEY)
+
+
+def bump_destinations_version():
+    _bump_version(DESTINATIONS_VERSION_KEY)
+
+
+def get_popularity_version():
+    return _get_version(POPULARITY_VERSION_KEY)
+
+
+async def aget_popularity_version():
+    return await _aget_version(POPULARITY_VERSION_KEY)
+
+
+def bump_popularity_version():
+    # Traveler counters changed, so the home page ranking did too
+    _bump_version(POPULARITY_VERSION_KEY)
+
+
+async def aload_request_state(request):
+    """
+    Load everything base.html reads from the request, using async APIs.
+
+    Afterwards the session, the user and the unread badge are plain
+    values, so rendering a template from an async view runs no queries.
+    """
+    if getattr(request, '_state_loaded', False):
+        return
+    request._state_loaded = True
+
+    if hasattr(request, 'session'):
+        await request.session.aitems()
+    if hasattr(request, 'auser'):
+        request.user = await request.auser()
+        if request.user.is_authenticated:
+            request.unread_messages_count = await aunread_count(request.user)
+
+
+def _user_tag(request):
+    # The nav bar shows the username and unread badge, so the ETag
+    # and cached copy must change with both
+    if not request.user.is_authenticated:
+        return 'anon'
+    if hasattr(request, 'unread_messages_count'):
+        return f'{request.user.pk}:{request.unread_messages_count}'
+    return f'{request.user.pk}:{unread_count(request.user)}'
+
+
+def page_cache_variant(request):
+    """
+    Which shared copy of a page this request may see, or None to skip caching.
+
+    The nav bar in base.html prints the username and destination pages show
+    staff-only links, so anonymous visitors share one copy and each staff
+    member gets their own. Other logged-in users are rendered live.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return 'anon'
+    if user.is_staff:
+        return f'staff:{_user_tag(request)}'
+    return None
+
+
+def page_cache_key(request, variant, version):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'page:{version}:{variant}:{path}'
+
+
+def _shared_variant(request):
+    variant = page_cache_variant(request)
+    # Pending flash messages are rendered into the page, so never
+    # serve or store a shared copy while there are any
+    if variant is None or len(messages.get_messages(request)):
+        return None
+    return variant
+
+
+def _cached_response(cached):
+    content, content_type = cached
+    response = HttpResponse(content, content_type=content_type)
+    response['X-Page-Cache'] = 'HIT'
+    return response
+
+
+def _cacheable(response):
+    if hasattr(response, 'render') and callable(response.render):
+        response = response.render()
+    if response.status_code == 200 and not response.streaming and not response.cookies:
+        response['X-Page-Cache'] = 'MISS'
+        return response, (response.content, response['Content-Type'])
+    return response, None
+
+
+def _page_version(versions):
+    # (part of the cache key, time of the newest change)
+    return '.'.join(map(str, versions)), max(versions)
+
+
+def cache_public_page(view=None, *, popularity=False):
+    """
+    Cache the rendered HTML of a public destination page.
+
+    Keys carry the destinations version, so saving or deleting any
+    Destination makes every cached page stale at once (see signals.py).
+    With ``popularity=True`` they carry the popularity version as well,
+    for pages ranking destinations by their traveler counters.
+    Right after a bump a replica may still hold the old rows, so pages
+    read from one are not stored until REPLICA_STICKY_SECONDS have passed.
+    Works on both sync and async views.
+    """
+    if view is None:
+        return partial(cache_public_page, popularity=popularity)
+
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await view(request, *args, **kwargs)
+
+            await aload_request_state(request)
+            variant = _shared_variant(request)
+            if variant is None:
+                return await view(request, *args, **kwargs)
+
+            versions = [await aget_destinations_version()]
+            if popularity:
+                versions.append(await aget_popularity_version())
+            version, changed_at = _page_version(versions)
+            key = page_cache_key(request, variant, version)
+            cached = await cache.aget(key)
+            if cached is not None:
+                return _cached_response(cached)
+
+            response, entry = _cacheable(await view(request, *args, **kwargs))
+            if entry is not None and not replica_may_be_stale(changed_at):
+                await cache.aset(key, entry, settings.PAGE_CACHE_TIMEOUT)
+            return response
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+
+        variant = _shared_variant(request)
+        if variant is None:
+            return view(request, *args, **kwargs)
+
+        versions = [get_destinations_version()]
+        if popularity:
+            versions.append(get_popularity_version())
+        version, changed_at = _page_version(versions)
+        key = page_cache_key(request, variant, version)
+        cached = cache.get(key)
+        if cached is not None:
+            return _cached_response(cached)
+
+        response, entry = _cacheable(view(request, *args, **kwargs))
+        if entry is not None and not replica_may_be_stale(changed_at):
+            cache.set(key, entry, settings.PAGE_CACHE_TIMEOUT)
+        return response
+
+    return wrapper
+
+
+# ============ CONDITIONAL GET ============
+
+def _validator_allowed(request):
+    # Flash messages are shown once, so those responses must not be 304s
+    return not len(messages.get_messages(request))
+
+
+def _destinations_stats(request):
+    # One aggregate query shared by the ETag and Last-Modified functions.
+    # The row count makes deletes change the validator as well.
+    if not hasattr(request, '_destinations_stats'):
+        request._destinations_stats = Destination.objects.aggregate(
+            last_modified=Max('updated_at'),
+            total=Count('id'),
+        )
+    return request._destinations_stats
+
+
+def _destination_updated_at(request, id):
+    if not hasattr(request, '_destination_updated_at'):
+        request._destination_updated_at = (
+            Destination.objects.filter(id=id).values_list('updated_at', flat=True).first()
+        )
+    return request._destination_updated_at
+
+
+async def _aprefetch_destinations_stats(request, *args, **kwargs):
+    if not hasattr(request, '_destinations_stats'):
+        request._destinations_stats = await Destination.objects.aaggregate(
+            last_modified=Max('updated_at'),
+            total=Count('id'),
+        )
+
+
+async def _aprefetch_destination_updated_at(request, id):
+    if not hasattr(request, '_destination_updated_at'):
+        request._destination_updated_at = await (
+            Destination.objects.filter(id=id).values_list('updated_at', flat=True).afirst()
+        )
+
+
+def destinations_etag(request, *args, **kwargs):
+    if not _validator_allowed(request):
+        return None
+    stats = _destinations_stats(request)
+    last_modified = stats['last_modified'].timestamp() if stats['last_modified'] else 0
+    return f"{last_modified}-{stats['total']}-{_user_tag(request)}"
+
+
+def destinations_last_modified(request, *args, **kwargs):
+    if not _validator_allowed(request):
+        return None
+    return _destinations_stats(request)['last_modified']
+
+
+def _popularity_version(request):
+    if not hasattr(request, '_popularity_version'):
+        request._popularity_version = get_popularity_version()
+    return request._popularity_version
+
+
+async def _aprefetch_home_stats(request, *args, **kwargs):
+    await _aprefetch_destinations_stats(request)
+    if not hasattr(request, '_popularity_version'):
+        request._popularity_version = await aget_popularity_version()
+
+
+def home_etag(request, *args, **kwargs):
+    # The home page also ranks destinations by their traveler counters
+    etag = destinations_etag(request)
+    if etag is None:
+        return None
+    return f'{etag}-{_popularity_version(request)}'
+
+
+def home_last_modified(request, *args, **kwargs):
+    last_modified = destinations_last_modified(request)
+    if last_modified is None:
+        return None
+    counted_at = datetime.fromtimestamp(_popularity_version(request) / 1e9, tz=timezone.utc)
+    return max(last_modified, counted_at)
+
+
+def destination_etag(request, id):
+    if not _validator_allowed(request):
+        return None
+    updated_at = _destination_updated_at(request, id)
+    if updated_at is None:
+        return None
+    return f'{id}-{updated_at.timestamp()}-{_user_tag(request)}'
+
+
+def destination_last_modified(request, id):
+    if not _validator_allowed(request):
+        return None
+    return _destination_updated_at(request, id)
+
+
+def conditional_page(etag_func, last_modified_func, aprefetch):
+    """
+    Answer If-None-Match / If-Modified-Since with a 304 before the view runs.
+
+    Validators come from one indexed query on Destination.updated_at (and,
+    for home, the popularity version), so a revalidation never reads a
+    cached page or runs the template engine.
+    For async views ``aprefetch`` runs that query with the async ORM first,
+    and the (sync) validator functions only read its result.
+    """
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+
+        if iscoroutinefunction(view):
+
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                await aload_request_state(request)
+                await aprefetch(request, *args, **kwargs)
+                response = await conditional_view(request, *args, **kwargs)
+                patch_vary_headers(response, ('Cookie',))
+                return response
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+home_condition = conditional_page(home_etag, home_last_modified, _aprefetch_home_stats)
+destinations_condition = conditional_page(
+    destinations_etag, destinations_last_modified, _aprefetch_destinations_stats,
+)
+destination_condition = conditional_page(
+    destination_etag, destination_last_modified, _aprefetch_destination_updated_at,
+)
@@ -0,0 +1,205 @@
+import json
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage, get_connection
+from django.db import DataError, IntegrityError, transaction
+from django.db.models import Case, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .counters import invalidate_unread_counts
+from .models import ContactMessage
+from .rollups import add_to_rollups, count_by_day
+from .spool import close_spools, spool_connection
+
+logger = logging.getLogger(__name__)
+
+# The fields of a ContactMessage kept in the spool
+PAYLOAD_FIELDS = ('user_id', 'name', 'email', 'phone', 'subject', 'message')
+
+# stored: 1 once the row is in ContactMessage and only the email is left.
+# failed_submission keeps those that could not be stored, with the error.
+SPOOL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS submission (
+    id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    queued_at REAL NOT NULL,
+    stored INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS failed_submission (
+    id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    queued_at REAL NOT NULL,
+    error TEXT NOT NULL,
+    failed_at REAL NOT NULL
+);
+"""
+
+# A submission failing with one of these will fail on every retry too.
+# Anything else (a locked database, say) leaves the batch queued.
+PERMANENT_ERRORS = (IntegrityError, DataError, KeyError, TypeError, ValueError)
+
+
+def _spool():
+    # Until it is drained the spool holds the only copy of a submission
+    return spool_connection(settings.CONTACT_QUEUE_PATH, SPOOL_SCHEMA, synchronous='FULL')
+
+
+def close_spool():
+    close_spools()
+
+
+def enqueue_contact_message(contact_message):
+    """Append an unsaved ContactMessage to the spool and return its submission id."""
+    submission_id = uuid.uuid4()
+    payload = {field: getattr(contact_message, field) for field in PAYLOAD_FIELDS}
+    payload['created_at'] = timezone.now().isoformat()
+    _spool().execute(
+        'INSERT INTO submission (id, payload, queued_at) VALUES (?, ?, ?)',
+        (str(submission_id), json.dumps(payload), time.time()),
+    )
+    return submission_id
+
+
+def queue_length():
+    return _spool().execute('SELECT COUNT(*) FROM submission').fetchone()[0]
+
+
+def failed_submissions():
+    """(submission id, payload, error) of the submissions that could not be stored."""
+    return [
+        (submission_id, json.loads(payload), error)
+        for submission_id, payload, error in _spool().execute(
+            'SELECT id, payload, error FROM failed_submission ORDER BY failed_at'
+        )
+    ]
+
+
+def store_messages(submissions):
+    """
+    Insert (submission id, payload) pairs as ContactMessages in one transaction.
+
+    Submissions already in the table are skipped, which makes a retry after
+    a crash between this commit and the spool update harmless.
+    """
+    ids = [uuid.UUID(submission_id) for submission_id, _ in submissions]
+    with transaction.atomic():
+        existing = set(
+            ContactMessage.objects.filter(submission_id__in=ids).values_list('submission_id', flat=True)
+        )
+        wanted = [
+            (submission_id, payload) for submission_id, (_, payload) in zip(ids, submissions)
+            if submission_id not in existing
+        ]
+        # The user may have been deleted since; the foreign key is SET_NULL
+        users = set(User.objects.filter(
+            id__in={payload['user_id'] for _, payload in wanted if payload['user_id']},
+        ).values_list('id', flat=True))
+        new = []
+        submitted_at = []
+        for submission_id, payload in wanted:
+            message = ContactMessage(
+                submission_id=submission_id, **{field: payload[field] for field in PAYLOAD_FIELDS},
+            )
+            if message.user_id not in users:
+                message.user_id = None
+            new.append(message)
+            submitted_at.append(parse_datetime(payload['created_at']))
+        ContactMessage.objects.bulk_create(new)
+        if new:
+            # auto_now_add set the time of the drain; keep the time of submission
+            ContactMessage.objects.filter(id__in=[message.id for message in new]).update(created_at=Case(
+                *[When(id=message.id, then=created_at) for message, created_at in zip(new, submitted_at)],
+            ))
+            for message, created_at in zip(new, submitted_at):
+                message.created_at = created_at
+        # bulk_create() sends no post_save, so update the counters here
+        invalidate_unread_counts([message.user_id for message in new])
+        add_to_rollups(count_by_day((message.created_at for message in new), 'messages', 'unread_messages'))
+    return len(new)
+
+
+def notify_staff(payloads):
+    recipients = list(
+        User.objects.filter(is_staff=True, is_active=True).exclude(email='').values_list('email', flat=True)
+    )
+    if not recipients or not payloads:
+        return 0
+    emails = [
+        EmailMessage(
+            subject=f"New contact message: {payload['subject']}",
+            body=(
+                f"From: {payload['name']} <{payload['email']}>\n"
+                f"Phone: {payload['phone'] or '-'}\n\n"
+                f"{payload['message']}\n"
+            ),
+            to=recipients,
+            reply_to=[payload['email']],
+        )
+        for payload in payloads
+    ]
+    # One connection (one SMTP session) for the whole batch
+    return get_connection().send_messages(emails)
+
+
+def drain_queue(batch_size=None):
+    """
+    Move up to ``batch_size`` submissions from the spool into the database,
+    email staff about them and return how many were handled.
+
+    Rows leave the spool only after both steps succeed, so delivery is
+    at-least-once: a crash before that repeats the insert (deduplicated by
+    submission id) or the email (which may then arrive twice).
+    """
+    spool = _spool()
+    rows = spool.execute(
+        'SELECT id, payload, stored FROM submission ORDER BY queued_at LIMIT ?',
+        (batch_size or settings.CONTACT_QUEUE_BATCH_SIZE,),
+    ).fetchall()
+    if not rows:
+        return 0
+
+    pending = [(submission_id, payload) for submission_id, payload, stored in rows if not stored]
+    failed = {}
+    if pending:
+        try:
+            store_messages([(submission_id, json.loads(payload)) for submission_id, payload in pending])
+        except PERMANENT_ERRORS:
+            # Find the offending submissions by retrying one at a time
+            for submission_id, payload in pending:
+                try:
+                    store_messages([(submission_id, json.loads(payload))])
+                except PERMANENT_ERRORS as error:
+                    failed[submission_id] = repr(error)
+        if failed:
+            _set_aside(spool, failed)
+            logger.error('Set aside %d contact messages that could not be stored', len(failed))
+        spool.executemany(
+            'UPDATE submission SET stored = 1 WHERE id = ?',
+            [(id,) for id, _ in pending if id not in failed],
+        )
+
+    notify_staff([json.loads(payload) for id, payload, _ in rows if id not in failed])
+    spool.executemany('DELETE FROM submission WHERE id = ?', [(id,) for id, _, _ in rows if id not in failed])
+    logger.info('Stored %d queued contact messages', len(pending) - len(failed))
+    return len(rows)
+
+
+def _set_aside(spool, errors):
+    # Moved in one transaction, so a submission is always in exactly one table
+    spool.execute('BEGIN IMMEDIATE')
+    try:
+        spool.executemany(
+            'INSERT OR REPLACE INTO failed_submission (id, payload, queued_at, error, failed_at) '
+            'SELECT id, payload, queued_at, ?, ? FROM submission WHERE id = ?',
+            [(error, time.time(), submission_id) for submission_id, error in errors.items()],
+        )
+        spool.executemany('DELETE FROM submission WHERE id = ?', [(id,) for id in errors])
+    except BaseException:
+        spool.execute('ROLLBACK')
+        raise
+    spool.execute('COMMIT')
@@ -0,0 +1,13 @@
+from django.utils.functional import SimpleLazyObject
+
+from .counters import unread_count
+
+
+def unread_messages(request):
+    # Lazy, so pages that never show the nav badge never read the counter
+    if not request.user.is_authenticated:
+        return {}
+    if hasattr(request, 'unread_messages_count'):
+        # Already counted by an async view (no ORM calls while rendering)
+        return {'unread_messages': request.unread_messages_count}
+    return {'unread_messages': SimpleLazyObject(lambda: unread_count(request.user))}
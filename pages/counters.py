@@ -0,0 +1,61 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import ContactMessage
+
+# Counters are dropped on every change, this only bounds a racing stale read
+UNREAD_COUNT_TIMEOUT = 60 * 5
+
+
+def _unread_key(user_id=None):
+    return f'unread:{user_id}' if user_id else 'unread:all'
+
+
+def global_unread_count():
+    count = cache.get(_unread_key())
+    if count is None:
+        count = ContactMessage.objects.filter(is_read=False).count()
+        cache.set(_unread_key(), count, UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+def user_unread_count(user_id):
+    count = cache.get(_unread_key(user_id))
+    if count is None:
+        count = ContactMessage.objects.filter(user_id=user_id, is_read=False).count()
+        cache.set(_unread_key(user_id), count, UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+def unread_count(user):
+    # Staff see every unread message, everyone else only their own
+    if user.is_staff:
+        return global_unread_count()
+    return user_unread_count(user.pk)
+
+
+async def aglobal_unread_count():
+    count = await cache.aget(_unread_key())
+    if count is None:
+        count = await ContactMessage.objects.filter(is_read=False).acount()
+        await cache.aset(_unread_key(), count, UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+async def auser_unread_count(user_id):
+    count = await cache.aget(_unread_key(user_id))
+    if count is None:
+        count = await ContactMessage.objects.filter(user_id=user_id, is_read=False).acount()
+        await cache.aset(_unread_key(user_id), count, UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+async def aunread_count(user):
+    if user.is_staff:
+        return await aglobal_unread_count()
+    return await auser_unread_count(user.pk)
+
+
+def invalidate_unread_counts(user_ids=()):
+    keys = [_unread_key()] + [_unread_key(user_id) for user_id in set(user_ids) if user_id]
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,82 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import ContactMessage, Traveler
+
+# Rows fetched from SQLite per round trip while streaming
+EXPORT_CHUNK_SIZE = 2000
+
+# Spreadsheets run a cell starting with one of these as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+EXPORTS = {
+    'messages': {
+        'model': ContactMessage,
+        'fields': ('id', 'created_at', 'user__username', 'name', 'email', 'phone',
+                   'subject', 'message', 'is_read'),
+        'ordering': ('created_at', 'id'),
+    },
+    'travelers': {
+        'model': Traveler,
+        'fields': ('id', 'created_at', 'user__username', 'name', 'email', 'phone', 'destination'),
+        'ordering': ('id',),
+    },
+}
+
+
+class Echo:
+    # csv.writer wants a file; this one hands each line straight back
+    def write(self, value):
+        return value
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def csv_cell(value):
+    # Names and messages are user input; a leading quote keeps them text
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def export_queryset(kind, since=None, until=None, is_read=None):
+    export = EXPORTS[kind]
+    queryset = export['model'].objects.order_by(*export['ordering'])
+    # Plain range bounds (not __date) so the created_at index can be used
+    if since:
+        queryset = queryset.filter(created_at__gte=start_of_day(since))
+    if until:
+        queryset = queryset.filter(created_at__lt=start_of_day(until + timedelta(days=1)))
+    if is_read is not None and kind == 'messages':
+        queryset = queryset.filter(is_read=is_read)
+    return queryset.values_list(*export['fields'])
+
+
+def stream_export(kind, file_format, chunk_size=EXPORT_CHUNK_SIZE, **filters):
+    """
+    Yield the export one line at a time.
+
+    Rows come from a single ``.iterator()`` cursor, so neither model
+    instances nor the whole result set are ever held in memory.
+    """
+    fields = [field.replace('user__username', 'username') for field in EXPORTS[kind]['fields']]
+    rows = export_queryset(kind, **filters).iterator(chunk_size=chunk_size)
+
+    if file_format == 'jsonl':
+        for row in rows:
+            yield json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+    else:
+        writer = csv.writer(Echo())
+        yield writer.writerow(fields)
+        for row in rows:
+            yield writer.writerow([csv_cell(value) for value in row])
+
+
+def export_filename(kind, file_format):
+    return f"{kind}.{'jsonl' if file_format == 'jsonl' else 'csv'}"
@@ -0,0 +1,139 @@
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .cache import aget_destinations_version, get_destinations_version
+from .models import Destination
+from .replicas import replica_may_be_stale
+
+CATEGORY_ICONS = {'beaches': '🏖️', 'mountains': '⛰️', 'cities': '🏙️', 'nature': '🌿'}
+
+# key -> (label, lowest price per day, first price above the band)
+PRICE_BANDS = {
+    'budget': ('Under ₹3,000', None, 3000),
+    'mid': ('₹3,000 – 10,000', 3000, 10000),
+    'premium': ('₹10,000 – 20,000', 10000, 20000),
+    'luxury': ('₹20,000+', 20000, None),
+}
+
+# key -> (label, fewest days, first length above the band)
+DURATION_BANDS = {
+    'short': ('1 – 3 days', None, 4),
+    'week': ('4 – 7 days', 4, 8),
+    'long': ('8+ days', 8, None),
+}
+
+# facet -> {option: label}; 'all' switches the facet off
+FACETS = {
+    'category': {
+        'all': 'All',
+        **{key: f'{CATEGORY_ICONS.get(key, "")} {label}'.strip() for key, label in Destination.CATEGORY_CHOICES},
+    },
+    'price': {'all': 'Any price', **{key: label for key, (label, _, _) in PRICE_BANDS.items()}},
+    'duration': {'all': 'Any length', **{key: label for key, (label, _, _) in DURATION_BANDS.items()}},
+}
+
+# Facet counts change with every Destination save, and the key carries the
+# destinations version, so this only bounds how long unused entries linger
+FACET_CACHE_TIMEOUT = 60 * 60
+
+
+def parse_filters(request):
+    """The selected option of every facet, with 'all' for missing or unknown values."""
+    filters = {}
+    for facet, options in FACETS.items():
+        value = request.GET.get(facet, 'all')
+        filters[facet] = value if value in options else 'all'
+    return filters
+
+
+def _band_q(field, bands, key):
+    _, low, high = bands[key]
+    q = Q()
+    if low is not None:
+        q &= Q(**{f'{field}__gte': low})
+    if high is not None:
+        q &= Q(**{f'{field}__lt': high})
+    return q
+
+
+def option_q(facet, key):
+    if key == 'all':
+        return Q()
+    if facet == 'category':
+        return Q(category=key)
+    if facet == 'price':
+        return _band_q('price_per_day', PRICE_BANDS, key)
+    return _band_q('duration_days', DURATION_BANDS, key)
+
+
+def filter_q(filters, skip=None):
+    q = Q()
+    for facet, key in filters.items():
+        if facet != skip:
+            q &= option_q(facet, key)
+    return q
+
+
+def _count_aggregates(filters):
+    # Each facet is counted under the other facets' filters, so picking a
+    # category still shows how many destinations every other category has
+    aggregates = {}
+    for facet, options in FACETS.items():
+        others = filter_q(filters, skip=facet)
+        for key in options:
+            condition = others & option_q(facet, key)
+            aggregates[f'{facet}_{key}'] = Count('id', filter=condition) if condition else Count('id')
+    return aggregates
+
+
+def _counts_key(filters, version):
+    return 'facets:{}:{category}:{price}:{duration}'.format(version, **filters)
+
+
+def facet_counts(filters):
+    """
+    Destination counts for every option of every facet, from one grouped
+    query (conditional COUNTs over the dest_facets_idx covering index),
+    cached until the destinations version changes.
+    """
+    version = get_destinations_version()
+    key = _counts_key(filters, version)
+    counts = cache.get(key)
+    if counts is None:
+        counts = Destination.objects.aggregate(**_count_aggregates(filters))
+        if not replica_may_be_stale(version):
+            cache.set(key, counts, FACET_CACHE_TIMEOUT)
+    return counts
+
+
+async def afacet_counts(filters):
+    version = await aget_destinations_version()
+    key = _counts_key(filters, version)
+    counts = await cache.aget(key)
+    if counts is None:
+        counts = await Destination.objects.aaggregate(**_count_aggregates(filters))
+        if not replica_may_be_stale(version):
+            await cache.aset(key, counts, FACET_CACHE_TIMEOUT)
+    return counts
+
+
+def filter_query(filters, **changes):
+    return urlencode({**filters, **changes})
+
+
+def build_facets(filters, counts):
+    """facet -> list of options (label, count, link, active) for the template."""
+    return {
+        facet: [
+            {
+                'label': label,
+                'count': counts[f'{facet}_{key}'],
+                'query': filter_query(filters, **{facet: key}),
+                'active': filters[facet] == key,
+            }
+            for key, label in options.items()
+        ]
+        for facet, options in FACETS.items()
+    }
@@ -128,4 +128,45 @@ class DestinationForm(forms.ModelForm):
             'price_per_day': forms.NumberInput(attrs={'placeholder': '5000'}),
             'duration_days': forms.NumberInput(attrs={'placeholder': '7'}),
             'highlights': forms.Textarea(attrs={'placeholder': 'Eiffel Tower, Louvre Museum, Seine River Cruise', 'rows': 3}),
-        }
\ No newline at end of file
+        }
+
+# Bulk import of destinations (Admin Only)
+class DestinationImportForm(forms.Form):
+    FORMAT_CHOICES = [
+        ('auto', 'Detect from file name'),
+        ('csv', 'CSV'),
+        ('jsonl', 'JSON Lines'),
+    ]
+
+    file = forms.FileField(help_text='CSV with a header row, or one JSON object per line')
+    format = forms.ChoiceField(choices=FORMAT_CHOICES, initial='auto')
+    upsert = forms.BooleanField(
+        required=False,
+        help_text='Update destinations that already exist with the same name and country',
+    )
+
+
+# Filters for the staff CSV / JSON Lines exports
+class ExportFilterForm(forms.Form):
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('jsonl', 'JSON Lines'),
+    ]
+    READ_CHOICES = [
+        ('', 'All'),
+        ('unread', 'Unread'),
+        ('read', 'Read'),
+    ]
+
+    format = forms.ChoiceField(choices=FORMAT_CHOICES, required=False)
+    since = forms.DateField(required=False)
+    until = forms.DateField(required=False)
+    status = forms.ChoiceField(choices=READ_CHOICES, required=False)
+
+    def filters(self):
+        status = self.cleaned_data.get('status')
+        return {
+            'since': self.cleaned_data.get('since'),
+            'until': self.cleaned_data.get('until'),
+            'is_read': {'read': True, 'unread': False}.get(status),
+        }
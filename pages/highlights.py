@@ -0,0 +1,61 @@
+import re
+
+from django.utils.text import slugify
+
+from .models import Destination, Highlight
+
+# Highlights are typed one per line or separated by commas
+SEPARATORS = re.compile(r'[,\n]')
+
+NAME_LENGTH = Highlight._meta.get_field('name').max_length
+
+
+def parse_highlights(text):
+    """[(slug, name)] for a highlights string; the first spelling of a slug wins."""
+    found = {}
+    for part in SEPARATORS.split(text or ''):
+        name = ' '.join(part.split())[:NAME_LENGTH]
+        slug = slugify(name, allow_unicode=True)
+        if slug and slug not in found:
+            found[slug] = name
+    return list(found.items())
+
+
+def sync_highlights(destinations):
+    """
+    Point each saved Destination's highlight_tags at the Highlights its
+    text lists, creating missing ones and deleting those left unused. Runs a fixed number of queries for
+    any number of destinations, so bulk writers call it once per batch.
+    """
+    wanted = {destination.pk: parse_highlights(destination.highlights) for destination in destinations}
+    names = {}
+    for pairs in wanted.values():
+        for slug, name in pairs:
+            names.setdefault(slug, name)
+
+    ids = {}
+    if names:
+        Highlight.objects.bulk_create(
+            [Highlight(slug=slug, name=name) for slug, name in names.items()], ignore_conflicts=True,
+        )
+        ids = dict(Highlight.objects.filter(slug__in=names).values_list('slug', 'id'))
+
+    Link = Destination.highlight_tags.through
+    links = Link.objects.filter(destination_id__in=wanted)
+    dropped = set(links.values_list('highlight_id', flat=True)) - set(ids.values())
+    links.delete()
+    Link.objects.bulk_create([
+        Link(destination_id=destination_id, highlight_id=ids[slug])
+        for destination_id, pairs in wanted.items()
+        for slug, _ in pairs
+    ])
+    if dropped:
+        delete_unused_highlights(Highlight.objects.filter(id__in=dropped))
+
+
+def delete_unused_highlights(highlights):
+    """
+    Delete those of ``highlights`` (a Highlight queryset) that no destination
+    lists any more, so tag pages and facets stop showing them.
+    """
+    highlights.filter(destinations=None).delete()
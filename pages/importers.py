@@ -0,0 +1,195 @@
+import csv
+import io
+import json
+
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .cache import bump_destinations_version
+from .forms import DestinationForm
+from .highlights import sync_highlights
+from .models import Destination
+from .prerender import rerender_destination_pages
+from .rollups import add_to_rollups, count_by_day
+
+IMPORT_FIELDS = DestinationForm.Meta.fields
+
+# Only the first errors are kept; the rest are just counted
+MAX_REPORTED_ERRORS = 1000
+
+FALSE_VALUES = ('', '0', 'false', 'no', 'n', 'off')
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    @property
+    def total(self):
+        return self.created + self.updated + self.failed
+
+
+def detect_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def iter_rows(stream, file_format):
+    """
+    Yield ``(line_number, row_dict_or_error)`` from a text stream one row at
+    a time, so memory does not grow with the size of the file.
+    """
+    if file_format == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                yield line_number, f'Invalid JSON: {error}'
+                continue
+            if not isinstance(row, dict):
+                yield line_number, 'Each line must be a JSON object'
+                continue
+            yield line_number, row
+    else:
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def open_text(binary_file):
+    # utf-8-sig drops the BOM that spreadsheet exports like to add
+    return io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+
+
+def clean_row(row):
+    data = {field: row.get(field) for field in IMPORT_FIELDS if row.get(field) is not None}
+    featured = data.get('is_featured')
+    if isinstance(featured, str):
+        # CheckboxInput treats any non-empty string except "false" as True
+        data['is_featured'] = featured.strip().lower() not in FALSE_VALUES
+    if isinstance(data.get('highlights'), list):
+        data['highlights'] = ', '.join(data['highlights'])
+    return data
+
+
+def import_destinations(rows, batch_size=500, upsert=False, created_by=None):
+    """
+    Validate rows with DestinationForm and insert them in bulk_create batches.
+
+    With ``upsert`` rows whose (name, country) already exists update that
+    destination instead. A bad row is reported and skipped; it never aborts
+    the rest of the import.
+    """
+    result = ImportResult()
+    batch = []
+
+    for line, row in rows:
+        if isinstance(row, str):
+            result.add_error(line, row)
+            continue
+
+        form = DestinationForm(data=clean_row(row))
+        if not form.is_valid():
+            result.add_error(line, _format_errors(form))
+            continue
+
+        destination = form.save(commit=False)
+        destination.created_by = created_by
+        batch.append((line, destination))
+
+        if len(batch) >= batch_size:
+            _save_batch(batch, upsert, result)
+            batch = []
+
+    if batch:
+        _save_batch(batch, upsert, result)
+
+    if result.created or result.updated:
+        # bulk_create and bulk_update do not send post_save
+        transaction.on_commit(bump_destinations_version)
+        # Which rows changed is not kept, so every pre-rendered page goes
+        transaction.on_commit(rerender_destination_pages)
+    return result
+
+
+def _format_errors(form):
+    return '; '.join(
+        f"{field}: {' '.join(messages)}" if field != '__all__' else ' '.join(messages)
+        for field, messages in form.errors.items()
+    )
+
+
+def _save_batch(batch, upsert, result):
+    try:
+        with transaction.atomic():
+            created, updated = _write(batch, upsert)
+    except DatabaseError:
+        # Find the offending rows by retrying one at a time
+        for line, destination in batch:
+            try:
+                with transaction.atomic():
+                    created, updated = _write([(line, destination)], upsert)
+            except DatabaseError as error:
+                result.add_error(line, f'Database error: {error}')
+            else:
+                result.created += created
+                result.updated += updated
+    else:
+        result.created += created
+        result.updated += updated
+
+
+def _write(batch, upsert):
+    new_rows = [destination for _, destination in batch]
+    changed_rows = []
+
+    if upsert:
+        existing = {}
+        names = {destination.name for destination in new_rows}
+        matches = (
+            Destination.objects
+            .filter(name__in=names, country__in={destination.country for destination in new_rows})
+            .only('id', 'name', 'country')
+        )
+        for match in matches:
+            existing.setdefault((match.name, match.country), match.id)
+
+        now = timezone.now()
+        pending = {}
+        updates = {}
+        duplicates = 0
+        for destination in new_rows:
+            key = (destination.name, destination.country)
+            # A later row for the same place in this batch wins
+            if key in existing:
+                destination.id = existing[key]
+                destination.updated_at = now
+                duplicates += key in updates
+                updates[key] = destination
+            else:
+                duplicates += key in pending
+                pending[key] = destination
+        new_rows = list(pending.values())
+        changed_rows = list(updates.values())
+    else:
+        duplicates = 0
+
+    if new_rows:
+        Destination.objects.bulk_create(new_rows)
+    if changed_rows:
+        # bulk_update skips auto_now, so updated_at is set above
+        fields = [field for field in IMPORT_FIELDS if field not in ('name', 'country')] + ['updated_at']
+        Destination.objects.bulk_update(changed_rows, fields)
+    # Neither bulk method sends post_save, which links highlights otherwise
+    sync_highlights(new_rows + changed_rows)
+    add_to_rollups(count_by_day((destination.created_at for destination in new_rows), 'destinations'))
+    return len(new_rows), len(changed_rows) + duplicates
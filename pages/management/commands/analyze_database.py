@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh SQLite's table statistics (ANALYZE). The query planner and the admin's "
+        'row estimates past ADMIN_EXACT_COUNT_LIMIT use them; run it after large imports '
+        'or from a nightly cron job'
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('ANALYZE statistics are only read on the SQLite database backend.')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.stdout.write(self.style.SUCCESS('Table statistics refreshed.'))
@@ -0,0 +1,43 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from pages.popularity import backfill_batch, recount_popularity
+from pages.prerender import refresh_popular_pages
+
+# Last traveler id handled, so an interrupted run picks up where it stopped
+CHECKPOINT_KEY = 'backfill_traveler_destinations:last_id'
+
+
+class Command(BaseCommand):
+    help = (
+        'Link travelers to the Destination their free-text destination names, in batches, '
+        'and count them. Resumes after the last finished batch; --restart starts over.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--restart', action='store_true', help='Ignore the saved checkpoint')
+        parser.add_argument('--recount', action='store_true',
+                            help='Afterwards rebuild every counter from the travelers table')
+
+    def handle(self, *args, **options):
+        last_id = 0 if options['restart'] else cache.get(CHECKPOINT_KEY, 0)
+        if last_id:
+            self.stdout.write(f'Resuming after traveler {last_id}')
+
+        total = 0
+        while True:
+            batch_last_id, linked = backfill_batch(last_id, options['batch_size'])
+            if batch_last_id is None:
+                break
+            last_id = batch_last_id
+            total += linked
+            # Saved after the batch committed, so no batch is counted twice
+            cache.set(CHECKPOINT_KEY, last_id, None)
+            self.stdout.write(f'Up to traveler {last_id}: {total} linked')
+
+        if options['recount']:
+            recount_popularity()
+        cache.delete(CHECKPOINT_KEY)
+        refresh_popular_pages()
+        self.stdout.write(self.style.SUCCESS(f'Linked {total} travelers.'))
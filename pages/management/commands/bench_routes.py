@@ -0,0 +1,118 @@
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from pages.benchmarks import (
+    BENCHMARK_ROLES, BENCHMARK_SCALES, benchmark_routes, find_regressions, seed_benchmark_data,
+)
+
+# Every alias the site uses, sessions included (SESSION_CACHE_ALIAS)
+BENCHMARK_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'sessions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'sessions'},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database at each scale, GET every named route as an anonymous '
+        'visitor, a member and staff, and report p50/p95/p99 latency, queries and bytes. '
+        'Save results with --output and fail on regressions against --baseline, e.g. '
+        'bench_routes --scale 1k --scale 100k --output bench.json --baseline main.json'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', action='append', dest='scales', choices=BENCHMARK_SCALES,
+                            help='Rows per table: 1k, 100k or 1m; repeat for several (default: 1k)')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--role', action='append', dest='roles', choices=BENCHMARK_ROLES)
+        parser.add_argument('--skip', action='append', default=[], metavar='ROUTE',
+                            help='Route name to leave out, e.g. the exports at 1m rows')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--baseline', help='Earlier --output file to compare against')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        report = {
+            'created': timezone.now().isoformat(),
+            'iterations': options['iterations'],
+            'scales': {},
+        }
+        for scale in options['scales'] or ['1k']:
+            report['scales'][scale] = self.run_scale(scale, options)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            self.check_regressions(baseline, report)
+
+    def run_scale(self, scale, options):
+        rows = BENCHMARK_SCALES[scale]
+        setup_test_environment()
+        # Every 404 and 500 response would otherwise log a traceback
+        logging.disable(logging.ERROR)
+        # A fresh test database, so the run never touches real data
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES, METRICS_DIR=None, THUMBNAIL_WORKERS=0):
+                started = time.perf_counter()
+                staff, member = seed_benchmark_data(rows)
+                self.stdout.write(f'{scale}: seeded {rows} rows per table in {time.perf_counter() - started:.1f}s')
+
+                results = benchmark_routes(
+                    staff, member,
+                    iterations=options['iterations'],
+                    warmup=options['warmup'],
+                    roles=options['roles'] or BENCHMARK_ROLES,
+                    skip=options['skip'],
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            logging.disable(logging.NOTSET)
+
+        self.write_table(results)
+        return {'rows': rows, 'routes': results}
+
+    def write_table(self, results):
+        self.stdout.write(
+            f"{'route':<32}{'status':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+            f"{'queries':>9}{'bytes':>10}"
+        )
+        for key, stats in results.items():
+            self.stdout.write(
+                f"{key:<32}{stats['status']:>7}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+                f"{stats['p99_ms']:>10.1f}{stats['queries']:>9g}{stats['bytes']:>10.0f}"
+            )
+
+    def check_regressions(self, baseline, report):
+        regressions = []
+        for scale, current in report['scales'].items():
+            before = baseline.get('scales', {}).get(scale)
+            if before is None:
+                self.stdout.write(f'{scale}: not in the baseline, skipped')
+                continue
+            regressions += [
+                f'{scale} {line}'
+                for line in find_regressions(
+                    before['routes'], current['routes'],
+                    settings.BENCHMARK_THRESHOLDS, settings.BENCHMARK_MIN_DELTA_MS,
+                )
+            ]
+        if regressions:
+            raise CommandError('Performance regressions:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
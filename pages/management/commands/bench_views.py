@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pages.benchmarks import run_http_load
+from pages.models import Destination
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare throughput and latency of the public pages on running servers, e.g. '
+        'ASYNC_PUBLIC_VIEWS=0 and ASYNC_PUBLIC_VIEWS=1 under the same ASGI server: '
+        'bench_views --target sync=http://127.0.0.1:8001 --target async=http://127.0.0.1:8002'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', required=True, metavar='NAME=URL',
+                            help='Server to benchmark; repeat to compare several')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Path to request (default: home, about, gallery and some destinations)')
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--warmup', type=int, default=100)
+        parser.add_argument('--bust-cache', action='store_true',
+                            help='Add a unique query string so the page cache never answers')
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['target']:
+            name, _, url = target.partition('=')
+            if not url:
+                raise CommandError(f'Expected NAME=URL, got {target!r}.')
+            targets.append((name, url))
+
+        paths = options['paths'] or self.default_paths()
+
+        self.stdout.write(f"{'target':<20}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for name, url in targets:
+            run_http_load(url, paths, options['concurrency'], options['warmup'], options['bust_cache'])
+            stats = run_http_load(url, paths, options['concurrency'], options['requests'], options['bust_cache'])
+            self.stdout.write(
+                f"{name:<20}{stats['rps']:>10.1f}{stats['p50_ms']:>10.1f}"
+                f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}{stats['errors']:>8}"
+            )
+
+    def default_paths(self):
+        paths = ['/', '/about/', '/gallery/']
+        for destination_id in Destination.objects.values_list('id', flat=True)[:20]:
+            paths.append(f'/destinations/{destination_id}/')
+        return paths
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from pages.contact_queue import drain_queue, failed_submissions, queue_length
+
+
+class Command(BaseCommand):
+    help = (
+        'Store queued contact form submissions in batches and email staff about them, '
+        'once or every --interval seconds, e.g. drain_contact_queue --interval 2'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Keep draining, this many seconds apart')
+        parser.add_argument('--batch-size', type=int, help='Submissions per transaction')
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                self.drain(options['batch_size'])
+            except Exception as error:
+                if not options['interval']:
+                    raise
+                # Whatever was not finished stays queued for the next round
+                self.stderr.write(f'Drain failed, retrying: {error!r}')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def drain(self, batch_size):
+        total = 0
+        while handled := drain_queue(batch_size):
+            total += handled
+        if total:
+            self.stdout.write(f'Handled {total} submissions, {queue_length()} queued')
+        failed = failed_submissions()
+        if failed:
+            self.stderr.write(f'{len(failed)} submissions could not be stored; see failed_submissions()')
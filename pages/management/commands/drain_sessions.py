@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from pages.sessions import drain_sessions, purge_expired_sessions, queued_sessions
+
+
+class Command(BaseCommand):
+    help = (
+        'Write queued sessions to the database in batches and purge one batch of expired '
+        'sessions, once or every --interval seconds, e.g. drain_sessions --interval 2'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Keep draining, this many seconds apart')
+        parser.add_argument('--batch-size', type=int, help='Sessions per transaction')
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                self.drain(options['batch_size'])
+            except Exception as error:
+                if not options['interval']:
+                    raise
+                # Queued sessions stay queued for the next round
+                self.stderr.write(f'Drain failed, retrying: {error!r}')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def drain(self, batch_size):
+        total = 0
+        while written := drain_sessions(batch_size):
+            total += written
+        # One batch per round, so purging never holds the write lock for long
+        purged = purge_expired_sessions()
+        if total or purged:
+            self.stdout.write(f'Wrote {total} sessions, purged {purged} expired, {queued_sessions()} queued')
@@ -0,0 +1,36 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pages.exporters import EXPORTS, stream_export
+from pages.forms import ExportFilterForm
+
+
+class Command(BaseCommand):
+    help = 'Stream contact messages or travelers to CSV or JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+        parser.add_argument('--since', help='First day to include (YYYY-MM-DD)')
+        parser.add_argument('--until', help='Last day to include (YYYY-MM-DD)')
+        parser.add_argument('--status', choices=['read', 'unread'], help='Messages only')
+        parser.add_argument('--output', '-o', help='File to write (default: stdout)')
+
+    def handle(self, *args, **options):
+        form = ExportFilterForm({
+            'format': options['format'],
+            'since': options['since'],
+            'until': options['until'],
+            'status': options['status'],
+        })
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+
+        output = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        try:
+            for line in stream_export(options['kind'], options['format'], **form.filters()):
+                output.write(line)
+        finally:
+            if output is not sys.stdout:
+                output.close()
@@ -0,0 +1,49 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from pages.importers import detect_format, import_destinations, iter_rows, open_text
+
+
+class Command(BaseCommand):
+    help = 'Import destinations from a CSV or JSON Lines file ("-" reads stdin)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--upsert', action='store_true',
+                            help='Update destinations that already exist with the same name and country')
+        parser.add_argument('--created-by', help='Username recorded as the creator')
+
+    def handle(self, *args, **options):
+        created_by = None
+        if options['created_by']:
+            created_by = User.objects.filter(username=options['created_by']).first()
+            if created_by is None:
+                raise CommandError(f"No user called {options['created_by']!r}.")
+
+        path = options['path']
+        file_format = options['format'] or detect_format(path)
+        try:
+            binary = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        except OSError as error:
+            raise CommandError(str(error))
+
+        with binary:
+            result = import_destinations(
+                iter_rows(open_text(binary), file_format),
+                batch_size=options['batch_size'],
+                upsert=options['upsert'],
+                created_by=created_by,
+            )
+
+        for line, message in result.errors:
+            self.stderr.write(f'Line {line}: {message}')
+        if result.failed > len(result.errors):
+            self.stderr.write(f'... and {result.failed - len(result.errors)} more errors')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.created} created, {result.updated} updated, {result.failed} failed.'
+        ))
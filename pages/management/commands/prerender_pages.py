@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from pages.prerender import prerender_queued_pages, queued_pages, rebuild_all_pages
+
+
+class Command(BaseCommand):
+    help = (
+        'Render the queued public pages to PRERENDER_DIR once their changes have settled, '
+        'once or every --interval seconds; --all renders every page first, '
+        'e.g. prerender_pages --all --interval 1'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='First render every page, queued or not')
+        parser.add_argument('--interval', type=float, help='Keep rendering, this many seconds apart')
+        parser.add_argument('--batch-size', type=int, help='Pages rendered per round')
+
+    def handle(self, *args, **options):
+        if not settings.PRERENDER_PAGES:
+            raise CommandError('PRERENDER_PAGES is off, so nothing would serve the pages.')
+
+        if options['all']:
+            started = time.perf_counter()
+            count = rebuild_all_pages()
+            self.stdout.write(f'Rendered {count} pages in {time.perf_counter() - started:.1f}s')
+
+        while True:
+            try:
+                rendered = prerender_queued_pages(options['batch_size'])
+            except Exception as error:
+                if not options['interval']:
+                    raise
+                # The pages stay queued for the next round
+                self.stderr.write(f'Render failed, retrying: {error!r}')
+            else:
+                if rendered:
+                    self.stdout.write(f'Rendered {rendered} pages, {queued_pages()} queued')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from pages.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily dashboard rollups (DailyStats) from the users, messages, travelers and destinations tables'
+
+    def handle(self, *args, **options):
+        days = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f'Rollups rebuilt for {days} days.'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from pages.models import Destination
+from pages.search import create_index_sql, fts_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the FTS5 destination search index from the destinations table'
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            raise CommandError('Full-text search needs the SQLite database backend.')
+
+        # Recreates the table and triggers if they were dropped by hand
+        with connection.cursor() as cursor:
+            for statement in create_index_sql():
+                cursor.execute(statement)
+
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Search index rebuilt for {Destination.objects.count()} destinations.'
+        ))
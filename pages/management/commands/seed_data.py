@@ -0,0 +1,61 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from pages.cache import bump_destinations_version
+from pages.prerender import rerender_destination_pages
+from pages.seeding import SEED_PASSWORD, seed_database
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with synthetic users, profiles, destinations, travelers and '
+        'contact messages for scale testing, e.g. '
+        'seed_data --users 100000 --travelers 1000000 --messages 1000000 --workers 4'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--destinations', type=int, default=5000)
+        parser.add_argument('--travelers', type=int, default=50_000)
+        parser.add_argument('--messages', type=int, default=50_000)
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Processes generating rows in parallel (needs a file or server database)')
+        parser.add_argument('--seed', type=int, default=42, help='Same seed, same data')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='seed', help='Usernames are <prefix><n>')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('--users must be at least 1.')
+        if User.objects.filter(username__startswith=options['prefix']).exists():
+            raise CommandError(f"Users starting with {options['prefix']!r} exist already; pick another --prefix.")
+
+        started = time.perf_counter()
+
+        def progress(kind, done, total):
+            self.stdout.write(f'{kind:<13}{done:>10}/{total:<10}{time.perf_counter() - started:>8.1f}s')
+
+        seed_database(
+            users=options['users'],
+            destinations=options['destinations'],
+            travelers=options['travelers'],
+            messages=options['messages'],
+            workers=options['workers'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            prefix=options['prefix'],
+            progress=progress,
+        )
+
+        # bulk_create sends no signals, so drop cached pages and counters here
+        bump_destinations_version()
+        cache.clear()
+        rerender_destination_pages()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded in {time.perf_counter() - started:.1f}s. "
+            f"Log in as {options['prefix']}0 (staff) or {options['prefix']}<n> with password {SEED_PASSWORD!r}."
+        ))
@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from pages.replicas import copy_sqlite_database
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the primary SQLite database over a local replica file, once or every '
+        '--interval seconds, e.g. USE_SQLITE_REPLICA=1 python manage.py sync_replica --interval 5'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--replica', default='replica', help='DATABASES alias of the replica')
+        parser.add_argument('--interval', type=float, help='Keep syncing, this many seconds apart')
+
+    def handle(self, *args, **options):
+        alias = options['replica']
+        if alias not in settings.DATABASE_REPLICAS:
+            raise CommandError(f'{alias!r} is not a replica in DATABASES (set USE_SQLITE_REPLICA=1).')
+        if connections[alias].vendor != 'sqlite' or connections['default'].vendor != 'sqlite':
+            raise CommandError('sync_replica only copies SQLite databases.')
+        if options['interval'] and options['interval'] >= settings.REPLICA_STICKY_SECONDS:
+            self.stderr.write('Warning: --interval is not below REPLICA_STICKY_SECONDS, '
+                              'so clients may not see their own writes.')
+
+        primary = connections['default']
+        target = str(connections[alias].settings_dict['NAME'])
+        while True:
+            started = time.perf_counter()
+            primary.ensure_connection()
+            copy_sqlite_database(primary.connection, target)
+            self.stdout.write(f'Synced {target} in {time.perf_counter() - started:.2f}s')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
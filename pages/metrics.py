@@ -0,0 +1,356 @@
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates, Template
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no flock(), and os.kill(pid, 0) there ends the process
+    fcntl = None
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Totals of worker processes that have exited, kept in METRICS_DIR so the
+# counters never go down when a worker's own file is removed
+DEAD_PROCESSES_FILE = 'dead-processes.json'
+
+# Held while /metrics reads the directory, so no file is read both before
+# and after being folded into DEAD_PROCESSES_FILE
+LOCK_FILE = '.lock'
+
+# Per-view totals exported as Prometheus counters: field -> (metric, help)
+COUNTERS = {
+    'sql_queries': ('pages_sql_queries_total', 'SQL queries run while handling requests.'),
+    'sql_seconds': ('pages_sql_duration_seconds_total', 'Time spent in SQL queries.'),
+    'template_seconds': ('pages_template_render_seconds_total', 'Time spent rendering templates.'),
+    'response_bytes': ('pages_response_bytes_total', 'Bytes of (non-streaming) response bodies.'),
+}
+
+# The stats of the request being handled. A ContextVar rather than a
+# thread local so queries an async view runs via sync_to_async still count.
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    __slots__ = ('sql_queries', 'sql_seconds', 'template_seconds')
+
+    def __init__(self):
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+
+
+def _empty_view():
+    return {
+        'requests': defaultdict(int),  # status code -> count
+        'buckets': [0] * len(LATENCY_BUCKETS),
+        'latency_sum': 0.0,
+        'latency_count': 0,
+        'sql_queries': 0,
+        'sql_seconds': 0.0,
+        'template_seconds': 0.0,
+        'response_bytes': 0,
+    }
+
+
+class MetricsRegistry:
+    """
+    In-process totals per URL name, flushed to a file per process.
+
+    Recording is a few additions under a lock. Every METRICS_FLUSH_INTERVAL
+    seconds the whole snapshot is written to ``METRICS_DIR/<pid>-<id>.json``,
+    and collect() sums every file there, so /metrics covers all workers.
+    collect() also folds the files of exited processes into
+    DEAD_PROCESSES_FILE and deletes them, so restarts do not pile up files.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(_empty_view)
+        # pid alone is not unique across restarts, which would let a new
+        # worker overwrite (and so lower) an old worker's counters
+        self.process_id = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self.last_flush = 0.0
+
+    def record(self, view, status, seconds, stats, response_bytes):
+        with self.lock:
+            data = self.views[view]
+            data['requests'][str(status)] += 1
+            data['latency_sum'] += seconds
+            data['latency_count'] += 1
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    data['buckets'][index] += 1
+                    break
+            data['sql_queries'] += stats.sql_queries
+            data['sql_seconds'] += stats.sql_seconds
+            data['template_seconds'] += stats.template_seconds
+            data['response_bytes'] += response_bytes
+
+        if time.monotonic() - self.last_flush >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(self.views))
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        _write_json(directory, f'{self.process_id}.json', self.snapshot())
+
+    def collect(self):
+        """Return the totals of every process, summed per view."""
+        directory = settings.METRICS_DIR
+        if not directory:
+            return self.snapshot()
+
+        self.flush()
+        with _directory_lock(directory):
+            self.prune(directory)
+            merged = defaultdict(_empty_view)
+            for filename in os.listdir(directory):
+                if not filename.endswith('.json'):
+                    continue
+                views = _read_json(os.path.join(directory, filename))
+                if views is None:
+                    continue
+                if filename == DEAD_PROCESSES_FILE:
+                    views = views['views']
+                for view, data in views.items():
+                    _merge(merged[view], data)
+        return merged
+
+    def prune(self, directory):
+        """Fold the files of exited processes into DEAD_PROCESSES_FILE. Call it under the lock."""
+        if fcntl is None:
+            return
+        path = os.path.join(directory, DEAD_PROCESSES_FILE)
+        state = _read_json(path) or {'views': {}, 'folded': []}
+        # Counted in the last run, which stopped before deleting them
+        for filename in state['folded']:
+            _unlink(os.path.join(directory, filename))
+
+        dead = {}
+        for filename in os.listdir(directory):
+            pid = _file_pid(filename)
+            if pid is None or filename == f'{self.process_id}.json' or _process_alive(pid):
+                continue
+            views = _read_json(os.path.join(directory, filename))
+            if views is not None:
+                dead[filename] = views
+        if not dead:
+            return
+
+        totals = defaultdict(_empty_view)
+        for views in [state['views'], *dead.values()]:
+            for view, data in views.items():
+                _merge(totals[view], data)
+        # Names kept until the next run, so a crash before the deletes
+        # below cannot count these files twice
+        _write_json(directory, DEAD_PROCESSES_FILE, {'views': totals, 'folded': list(dead)})
+        for filename in dead:
+            _unlink(os.path.join(directory, filename))
+
+
+@contextmanager
+def _directory_lock(directory):
+    # Closing the file releases the lock
+    with open(os.path.join(directory, LOCK_FILE), 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def _file_pid(filename):
+    # Worker files are named <pid>-<random id>.json
+    if not filename.endswith('.json'):
+        return None
+    pid, separator, _ = filename.partition('-')
+    return int(pid) if separator and pid.isdigit() else None
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Alive, but owned by another user
+        return True
+    return True
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(directory, filename, data):
+    # Write then rename, so readers never see half a file
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp_path, os.path.join(directory, filename))
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _merge(total, data):
+    for status, count in data['requests'].items():
+        total['requests'][status] += count
+    total['buckets'] = [a + b for a, b in zip(total['buckets'], data['buckets'])]
+    for key in ('latency_sum', 'latency_count', *COUNTERS):
+        total[key] += data[key]
+
+
+registry = MetricsRegistry()
+
+
+# ============ COLLECTION HOOKS ============
+
+def _time_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.sql_queries += 1
+        stats.sql_seconds += time.perf_counter() - start
+
+
+def install_query_timer(connection):
+    # The same hook connection.execute_wrapper() uses, installed for the
+    # lifetime of every connection instead of around each request
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+class TimedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_seconds += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing each top-level render."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+# ============ MIDDLEWARE ============
+
+class MetricsMiddleware:
+    """Record count, latency, SQL, render time and size per URL name."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, time.perf_counter() - start, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, time.perf_counter() - start, stats)
+        return response
+
+    def record(self, request, response, seconds, stats):
+        match = getattr(request, 'resolver_match', None)
+        # Unnamed and unmatched URLs are grouped so labels stay bounded
+        view = match.view_name if match and match.url_name else 'other'
+        size = 0 if response.streaming else len(response.content)
+        registry.record(view, response.status_code, seconds, stats, size)
+
+
+# ============ PROMETHEUS TEXT FORMAT ============
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(views):
+    lines = [
+        '# HELP pages_requests_total Requests handled, by view and status code.',
+        '# TYPE pages_requests_total counter',
+    ]
+    for view, data in sorted(views.items()):
+        for status, count in sorted(data['requests'].items()):
+            lines.append(f'pages_requests_total{{view="{_label(view)}",status="{status}"}} {count}')
+
+    lines += [
+        '# HELP pages_request_duration_seconds Request latency, by view.',
+        '# TYPE pages_request_duration_seconds histogram',
+    ]
+    for view, data in sorted(views.items()):
+        label = _label(view)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, data['buckets']):
+            cumulative += count
+            lines.append(f'pages_request_duration_seconds_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+        lines.append(f'pages_request_duration_seconds_bucket{{view="{label}",le="+Inf"}} {data["latency_count"]}')
+        lines.append(f'pages_request_duration_seconds_sum{{view="{label}"}} {data["latency_sum"]}')
+        lines.append(f'pages_request_duration_seconds_count{{view="{label}"}} {data["latency_count"]}')
+
+    for key, (metric, help_text) in COUNTERS.items():
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} counter']
+        for view, data in sorted(views.items()):
+            lines.append(f'{metric}{{view="{_label(view)}"}} {data[key]}')
+
+    return '\n'.join(lines) + '\n'
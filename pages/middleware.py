@@ -0,0 +1,225 @@
+import json
+import mimetypes
+import os
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+from .prerender import page_file
+
+# Files up to this size are kept in memory; larger ones are streamed from disk
+STATIC_MEMORY_LIMIT = 512 * 1024
+
+# Content-Encoding -> suffix written by CompressedManifestStaticFilesStorage
+STATIC_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class StaticFile:
+    def __init__(self, path, immutable):
+        self.path = path
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        stat = os.stat(path)
+        # Weak: the br, gzip and plain bodies differ but mean the same file
+        self.etag = f'W/"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+        if immutable:
+            self.cache_control = 'public, max-age=31536000, immutable'
+        else:
+            self.cache_control = f'public, max-age={settings.STATIC_MAX_AGE}'
+
+        # encoding ('' for none) -> (path, bytes or None)
+        self.variants = {'': self._load(path)}
+        for encoding, suffix in STATIC_ENCODINGS:
+            if os.path.exists(path + suffix):
+                self.variants[encoding] = self._load(path + suffix)
+
+    def _load(self, path):
+        if os.path.getsize(path) > STATIC_MEMORY_LIMIT:
+            return path, None
+        with open(path, 'rb') as f:
+            return path, f.read()
+
+    def pick_encoding(self, accept_encoding):
+        accepted = _accepted_encodings(accept_encoding)
+        for encoding, _ in STATIC_ENCODINGS:
+            if encoding in self.variants and encoding in accepted:
+                return encoding
+        return ''
+
+
+def _accepted_encodings(header):
+    accepted = set()
+    for part in header.split(','):
+        encoding, _, params = part.partition(';')
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            # "gzip;q=0" means the client refuses gzip
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(encoding.strip().lower())
+    return accepted
+
+
+def load_static_files(root):
+    """
+    Map each URL path under STATIC_ROOT to a StaticFile.
+
+    Names listed as hashed in collectstatic's manifest are cached for a
+    year; anything else gets STATIC_MAX_AGE so edits still show up.
+    """
+    if not root or not os.path.isdir(root):
+        return {}
+
+    hashed = set()
+    manifest_path = os.path.join(root, 'staticfiles.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            hashed = set(json.load(f).get('paths', {}).values())
+
+    files = {}
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.endswith(('.gz', '.br')) or filename == 'staticfiles.json':
+                continue
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            files[name] = StaticFile(path, name in hashed)
+    return files
+
+
+class StaticFilesMiddleware:
+    """
+    Serve collected static files from STATIC_ROOT before the rest of the stack.
+
+    The file index is built once at startup, so a request costs one dict
+    lookup. Precompressed .br/.gz copies are picked from Accept-Encoding.
+    Run ``collectstatic`` and restart to pick up new files.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.files = load_static_files(settings.STATIC_ROOT)
+        if not self.files:
+            raise MiddlewareNotUsed('STATIC_ROOT is empty; run collectstatic')
+        self.prefix = settings.STATIC_URL
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        response = self.serve(request)
+        if self.async_mode:
+            return self._acall(request, response)
+        if response is None:
+            response = self.get_response(request)
+        return response
+
+    async def _acall(self, request, response):
+        if response is None:
+            response = await self.get_response(request)
+        return response
+
+    def serve(self, request):
+        if request.method not in ('GET', 'HEAD') or not request.path.startswith(self.prefix):
+            return None
+        static_file = self.files.get(request.path[len(self.prefix):])
+        if static_file is None:
+            return None
+
+        encoding = static_file.pick_encoding(request.headers.get('Accept-Encoding', ''))
+        if static_file.etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            path, content = static_file.variants[encoding]
+            if content is None:
+                response = FileResponse(open(path, 'rb'), content_type=static_file.content_type)
+            else:
+                response = HttpResponse(content, content_type=static_file.content_type)
+            if encoding:
+                response['Content-Encoding'] = encoding
+
+        response['ETag'] = static_file.etag
+        response['Cache-Control'] = static_file.cache_control
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+# Paths that may have a pre-rendered copy (no dots, so never outside PRERENDER_DIR)
+PRERENDERED_PATH = re.compile(r'/(?:[\w-]+/)*')
+
+
+class PrerenderedPagesMiddleware:
+    """
+    Serve pages written by pages.prerender to anonymous visitors.
+
+    Only GET/HEAD requests with no query string and neither a session nor a
+    flash message cookie qualify: those are the visitors the files were
+    rendered for. A hit is one open() and never reaches the ORM or the
+    template engine; a missing file (not rendered yet, or removed by a
+    change) sends the request on to the live view.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PRERENDER_PAGES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        response = self.serve(request)
+        if self.async_mode:
+            return self._acall(request, response)
+        if response is None:
+            response = self.get_response(request)
+        return response
+
+    async def _acall(self, request, response):
+        if response is None:
+            response = await self.get_response(request)
+        return response
+
+    def serve(self, request):
+        if request.method not in ('GET', 'HEAD') or request.META.get('QUERY_STRING'):
+            return None
+        if settings.SESSION_COOKIE_NAME in request.COOKIES or CookieStorage.cookie_name in request.COOKIES:
+            return None
+        if not PRERENDERED_PATH.fullmatch(request.path_info):
+            return None
+
+        path = page_file(request.path_info)
+        variants = [(path, '')]
+        if 'gzip' in _accepted_encodings(request.headers.get('Accept-Encoding', '')):
+            variants.insert(0, (path + '.gz', 'gzip'))
+        for path, encoding in variants:
+            try:
+                f = open(path, 'rb')
+            except FileNotFoundError:
+                continue
+            with f:
+                stat = os.fstat(f.fileno())
+                etag = f'W/"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+                if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                    response = HttpResponseNotModified()
+                else:
+                    response = HttpResponse(f.read())
+                    if encoding:
+                        response['Content-Encoding'] = encoding
+            response['ETag'] = etag
+            response['X-Prerendered'] = 'HIT'
+            patch_vary_headers(response, ('Cookie', 'Accept-Encoding'))
+            return response
+        return None
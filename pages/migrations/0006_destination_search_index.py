@@ -0,0 +1,64 @@
+from django.db import migrations
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS pages_destination_fts USING fts5(
+        name, country, description, highlights,
+        content='pages_destination', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS pages_destination_fts_ai AFTER INSERT ON pages_destination BEGIN
+        INSERT INTO pages_destination_fts(rowid, name, country, description, highlights)
+        VALUES (new.id, new.name, new.country, new.description, new.highlights);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS pages_destination_fts_ad AFTER DELETE ON pages_destination BEGIN
+        INSERT INTO pages_destination_fts(pages_destination_fts, rowid, name, country, description, highlights)
+        VALUES ('delete', old.id, old.name, old.country, old.description, old.highlights);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS pages_destination_fts_au
+    AFTER UPDATE OF name, country, description, highlights ON pages_destination BEGIN
+        INSERT INTO pages_destination_fts(pages_destination_fts, rowid, name, country, description, highlights)
+        VALUES ('delete', old.id, old.name, old.country, old.description, old.highlights);
+        INSERT INTO pages_destination_fts(rowid, name, country, description, highlights)
+        VALUES (new.id, new.name, new.country, new.description, new.highlights);
+    END
+    """,
+    "INSERT INTO pages_destination_fts(pages_destination_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS pages_destination_fts_ai",
+    "DROP TRIGGER IF EXISTS pages_destination_fts_ad",
+    "DROP TRIGGER IF EXISTS pages_destination_fts_au",
+    "DROP TABLE IF EXISTS pages_destination_fts",
+]
+
+
+# FTS5 is SQLite only; other databases fall back to LIKE searches
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in CREATE_SQL:
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in DROP_SQL:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0005_destination'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
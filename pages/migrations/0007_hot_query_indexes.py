@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0006_destination_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['-created_at', '-id'], name='message_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['user', '-created_at'], name='message_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['is_read', '-created_at'], name='message_read_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='destination',
+            index=models.Index(fields=['-created_at', '-id'], name='dest_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='destination',
+            index=models.Index(fields=['is_featured', '-created_at'], name='dest_featured_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='destination',
+            index=models.Index(fields=['category', '-created_at', '-id'], name='dest_category_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='destination',
+            index=models.Index(fields=['updated_at'], name='dest_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='traveler',
+            index=models.Index(fields=['user', '-created_at'], name='traveler_user_created_idx'),
+        ),
+    ]
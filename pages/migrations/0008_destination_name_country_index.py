@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0007_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='destination',
+            index=models.Index(fields=['name', 'country'], name='dest_name_country_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0009_contactmessage_submission_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='destination',
+            index=models.Index(fields=['category', 'price_per_day', 'duration_days'], name='dest_facets_idx'),
+        ),
+    ]
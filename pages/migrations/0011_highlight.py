@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0010_destination_facets_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Highlight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.SlugField(allow_unicode=True, max_length=100, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='destination',
+            name='highlight_tags',
+            field=models.ManyToManyField(blank=True, related_name='destinations', to='pages.highlight'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+import re
+
+from django.db import migrations, transaction
+from django.utils.text import slugify
+
+# Destinations read and linked per transaction
+BATCH_SIZE = 1000
+
+
+def parse_highlights(text):
+    # A frozen copy of pages.highlights.parse_highlights
+    found = {}
+    for part in re.split(r'[,\n]', text or ''):
+        name = ' '.join(part.split())[:100]
+        slug = slugify(name, allow_unicode=True)
+        if slug and slug not in found:
+            found[slug] = name
+    return list(found.items())
+
+
+def backfill_highlights(apps, schema_editor):
+    Destination = apps.get_model('pages', 'Destination')
+    Highlight = apps.get_model('pages', 'Highlight')
+    Link = Destination.highlight_tags.through
+    db = schema_editor.connection.alias
+
+    ids = {}
+    last_id = 0
+    while True:
+        # Keyset batches, so memory stays flat however many rows there are
+        rows = list(
+            Destination.objects.using(db)
+            .filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'highlights')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        wanted = {destination_id: parse_highlights(text) for destination_id, text in rows}
+        new = {slug: name for pairs in wanted.values() for slug, name in pairs if slug not in ids}
+        with transaction.atomic(using=db):
+            if new:
+                Highlight.objects.using(db).bulk_create(
+                    [Highlight(slug=slug, name=name) for slug, name in new.items()], ignore_conflicts=True,
+                )
+                ids.update(Highlight.objects.using(db).filter(slug__in=new).values_list('slug', 'id'))
+            Link.objects.using(db).bulk_create([
+                Link(destination_id=destination_id, highlight_id=ids[slug])
+                for destination_id, pairs in wanted.items()
+                for slug, _ in pairs
+            ], ignore_conflicts=True)
+
+
+def clear_highlights(apps, schema_editor):
+    # The text column still holds everything, so nothing is lost going back
+    apps.get_model('pages', 'Highlight').objects.using(schema_editor.connection.alias).all().delete()
+
+
+class Migration(migrations.Migration):
+    # One transaction per batch rather than one for the whole table
+    atomic = False
+
+    dependencies = [
+        ('pages', '0011_highlight'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_highlights, clear_highlights),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:12
+
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0012_backfill_highlights'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DestinationPopularity',
+            fields=[
+                ('destination', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='pages.destination')),
+                ('traveler_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='traveler',
+            name='linked_destination',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='travelers', to='pages.destination'),
+        ),
+        migrations.AddIndex(
+            model_name='destination',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='dest_name_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='destinationpopularity',
+            index=models.Index(fields=['-traveler_count'], name='popularity_count_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0013_traveler_linked_destination'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False)),
+                ('registrations', models.IntegerField(default=0)),
+                ('messages', models.IntegerField(default=0)),
+                ('unread_messages', models.IntegerField(default=0)),
+                ('travelers', models.IntegerField(default=0)),
+                ('destinations', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0014_dailystats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='destination',
+            index=models.Index(fields=['country'], name='dest_country_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='traveler',
+            index=models.Index(fields=['-created_at', '-id'], name='traveler_created_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+# The admin's changelist counts use the planner's row estimates past
+# ADMIN_EXACT_COUNT_LIMIT, and those only exist after an ANALYZE
+def analyze(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('ANALYZE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0015_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(analyze, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,19 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+
+from .thumbnails import thumbnail_name
 
 class Traveler(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='travelers')
     name = models.CharField(max_length=100)
     destination = models.CharField(max_length=100)
+    # The Destination the text names, when it names exactly one; set on
+    # save and by the backfill_traveler_destinations command (see popularity.py)
+    linked_destination = models.ForeignKey(
+        'Destination', on_delete=models.SET_NULL, null=True, blank=True, related_name='travelers',
+    )
     email = models.EmailField()
     phone = models.CharField(max_length=15)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -12,6 +21,14 @@ class Traveler(models.Model):
     def __str__(self):
         return self.name
 
+    class Meta:
+        indexes = [
+            # traveler_list: filter by user, newest first
+            models.Index(fields=['user', '-created_at'], name='traveler_user_created_idx'),
+            # admin changelist: newest first
+            models.Index(fields=['-created_at', '-id'], name='traveler_created_idx'),
+        ]
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     phone = models.CharField(max_length=15, blank=True)
@@ -22,6 +39,27 @@ class UserProfile(models.Model):
     def __str__(self):
         return self.user.username
 
+    def picture_url(self, size, extension='jpg'):
+        # Resized copy made by pages.thumbnails; the original until it exists
+        if not self.profile_picture:
+            return ''
+        name = thumbnail_name(self.profile_picture.name, size, extension)
+        if default_storage.exists(name):
+            return default_storage.url(name)
+        return self.profile_picture.url
+
+    @property
+    def avatar_url(self):
+        return self.picture_url('avatar')
+
+    @property
+    def card_url(self):
+        return self.picture_url('card')
+
+    @property
+    def full_url(self):
+        return self.picture_url('full')
+
 class ContactMessage(models.Model):
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     name = models.CharField(max_length=100)
@@ -31,12 +69,30 @@ class ContactMessage(models.Model):
     message = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
+    # Set for submissions that went through the contact queue, so a batch
+    # stored twice after a crash still creates each message once
+    submission_id = models.UUIDField(unique=True, null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.name} - {self.subject}"
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # message_list for staff: everything, newest first
+            models.Index(fields=['-created_at', '-id'], name='message_created_idx'),
+            # message_list for users: filter by user, newest first
+            models.Index(fields=['user', '-created_at'], name='message_user_created_idx'),
+            # Unread counters and the read/unread inbox filter
+            models.Index(fields=['is_read', '-created_at'], name='message_read_created_idx'),
+        ]
+
+class Highlight(models.Model):
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=100, unique=True, allow_unicode=True)
+
+    def __str__(self):
+        return self.name
 
 # NEW: Destination Model
 class Destination(models.Model):
@@ -55,6 +111,9 @@ class Destination(models.Model):
     price_per_day = models.DecimalField(max_digits=10, decimal_places=2, help_text="Price in INR")
     duration_days = models.IntegerField(help_text="Recommended duration in days")
     highlights = models.TextField(help_text="Key highlights (comma-separated)")
+    # The same highlights, normalised (see highlights.py) so they can be
+    # looked up by index; kept in sync with the text on every save
+    highlight_tags = models.ManyToManyField(Highlight, related_name='destinations', blank=True)
     is_featured = models.BooleanField(default=False, help_text="Show on homepage slider")
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -64,4 +123,61 @@ class Destination(models.Model):
         return f"{self.name}, {self.country}"
 
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            # gallery / destination_list: newest first, keyset on (created_at, id)
+            models.Index(fields=['-created_at', '-id'], name='dest_created_idx'),
+            # home slider: featured only, newest first
+            models.Index(fields=['is_featured', '-created_at'], name='dest_featured_created_idx'),
+            # gallery category tabs
+            models.Index(fields=['category', '-created_at', '-id'], name='dest_category_created_idx'),
+            # MAX(updated_at) validator for conditional GETs
+            models.Index(fields=['updated_at'], name='dest_updated_idx'),
+            # Upsert lookups when importing
+            models.Index(fields=['name', 'country'], name='dest_name_country_idx'),
+            # Gallery facet counts: every column they read, so the single
+            # aggregate scans this small index instead of the table
+            models.Index(fields=['category', 'price_per_day', 'duration_days'], name='dest_facets_idx'),
+            # Admin country filter choices (one DISTINCT over this index)
+            models.Index(fields=['country'], name='dest_country_idx'),
+            # Matching traveler destination text (popularity.py)
+            models.Index(Lower('name'), name='dest_name_lower_idx'),
+        ]
+
+
+class DestinationPopularity(models.Model):
+    """How many travelers are linked to a destination, kept current by signals."""
+    destination = models.OneToOneField(
+        Destination, on_delete=models.CASCADE, primary_key=True, related_name='popularity',
+    )
+    traveler_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.destination_id}: {self.traveler_count}"
+
+    class Meta:
+        indexes = [
+            # home: the most booked destinations, read from the top of this index
+            models.Index(fields=['-traveler_count'], name='popularity_count_idx'),
+        ]
+
+
+class DailyStats(models.Model):
+    """
+    One row of activity counts per day (in TIME_ZONE) for the staff
+    dashboard, kept current by signals and rebuilt by rebuild_rollups.
+    """
+    day = models.DateField(primary_key=True)
+    registrations = models.IntegerField(default=0)
+    messages = models.IntegerField(default=0)
+    # Messages from this day that are still unread
+    unread_messages = models.IntegerField(default=0)
+    travelers = models.IntegerField(default=0)
+    destinations = models.IntegerField(default=0)
+
+    def __str__(self):
+        return str(self.day)
+
+    @property
+    def read_messages(self):
+        return self.messages - self.unread_messages
@@ -0,0 +1,155 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, router
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(values):
+    raw = json.dumps([str(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    # Returns None for anything we did not hand out ourselves
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError:
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    if not all(isinstance(value, str) for value in values):
+        return None
+    return values
+
+
+def keyset_page(queryset, cursor=None, page_size=24, keys=('created_at', 'id')):
+    """
+    Return one page of ``queryset`` ordered newest first on ``keys``.
+
+    Rows are located with a ``WHERE (a, b) < (x, y)`` style filter instead
+    of OFFSET, so fetching page 1000 costs the same as fetching page 1.
+    """
+    queryset = _keyset_queryset(queryset, cursor, keys)
+    if queryset is None:
+        return KeysetPage([], None)
+    return _make_page(list(queryset[:page_size + 1]), page_size, keys)
+
+
+async def akeyset_page(queryset, cursor=None, page_size=24, keys=('created_at', 'id')):
+    # Same as keyset_page, for async views
+    queryset = _keyset_queryset(queryset, cursor, keys)
+    if queryset is None:
+        return KeysetPage([], None)
+    return _make_page([row async for row in queryset[:page_size + 1]], page_size, keys)
+
+
+def _keyset_queryset(queryset, cursor, keys):
+    queryset = queryset.order_by(*['-' + key for key in keys])
+
+    values = decode_cursor(cursor, len(keys))
+    if values is not None:
+        condition = Q()
+        for index, key in enumerate(keys):
+            step = Q(**{key + '__lt': values[index]})
+            for previous_key, previous_value in zip(keys[:index], values[:index]):
+                step &= Q(**{previous_key: previous_value})
+            condition |= step
+        try:
+            queryset = queryset.filter(condition)
+        except (ValidationError, ValueError, TypeError):
+            # Tampered cursor values that do not convert to the field type
+            return None
+    return queryset
+
+
+def _make_page(rows, page_size, keys):
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor([_key_value(last, key) for key in keys])
+    return KeysetPage(rows, next_cursor)
+
+
+def _key_value(row, key):
+    value = row[key] if isinstance(row, dict) else getattr(row, key)
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def estimated_row_count(model):
+    """
+    The row count SQLite's planner uses (from the last ANALYZE), or None
+    when the table was never analysed or the database is not SQLite.
+    """
+    connection = connections[router.db_for_read(model)]
+    if connection.vendor != 'sqlite':
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [model._meta.db_table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    return int(row[0].split()[0]) if row else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Counts exactly up to ADMIN_EXACT_COUNT_LIMIT rows and no further.
+
+    Past the limit an unfiltered list reports the planner's estimate and a
+    filtered one reports the limit plus one, so a COUNT never reads more
+    than that many index entries however large the table is. count_label
+    says which, for the admin templates in templates/admin/pages/.
+    """
+
+    # 'exact', 'estimate' (from the last ANALYZE) or 'more' (past the limit)
+    count_kind = 'exact'
+
+    @cached_property
+    def count(self):
+        limit = settings.ADMIN_EXACT_COUNT_LIMIT
+        counted = self.object_list.order_by()[:limit + 1].count()
+        if counted <= limit:
+            return counted
+        if not self.object_list.query.has_filters():
+            estimate = estimated_row_count(self.object_list.model)
+            # Stats from before the table grew past the limit are no help
+            if estimate and estimate > limit:
+                self.count_kind = 'estimate'
+                return estimate
+        self.count_kind = 'more'
+        return counted
+
+    @property
+    def count_label(self):
+        count = self.count
+        if self.count_kind == 'estimate':
+            return f'about {count}'
+        if self.count_kind == 'more':
+            return f'more than {settings.ADMIN_EXACT_COUNT_LIMIT}'
+        return str(count)
@@ -0,0 +1,139 @@
+import string
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Lower
+
+from .cache import bump_popularity_version
+from .models import Destination, DestinationPopularity, Traveler
+
+
+# SQLite's LOWER() only folds A-Z, so str.lower() would turn "Île" into
+# "île" while the index holds "Île" and the two would never match
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def name_key(text):
+    # Compared with LOWER(name) in SQL, so folds ASCII letters only as well
+    return ' '.join((text or '').split()).translate(_ASCII_LOWER)
+
+
+def match_destinations(texts):
+    """
+    Map each traveler destination text to the id of the one Destination it
+    names, as "Name" or "Name, Country" (case and spacing ignored). Texts
+    that match no destination, or several, are left out.
+    """
+    wanted = {}
+    for text in set(texts):
+        name, _, country = text.partition(',')
+        if name_key(name):
+            wanted[text] = (name_key(name), name_key(country))
+    if not wanted:
+        return {}
+
+    candidates = defaultdict(list)
+    rows = (
+        Destination.objects
+        .annotate(name_lower=Lower('name'))
+        .filter(name_lower__in={name for name, _ in wanted.values()})  # dest_name_lower_idx
+        .order_by()
+        .values_list('id', 'name_lower', 'country')
+    )
+    for destination_id, name, country in rows:
+        candidates[name].append((destination_id, name_key(country)))
+
+    matches = {}
+    for text, (name, country) in wanted.items():
+        ids = [destination_id for destination_id, other in candidates[name] if not country or other == country]
+        if len(ids) == 1:
+            matches[text] = ids[0]
+    return matches
+
+
+def adjust_popularity(deltas):
+    """Add ``{destination_id: change}`` to the traveler counters, in the current transaction."""
+    deltas = {destination_id: delta for destination_id, delta in deltas.items() if destination_id and delta}
+    if not deltas:
+        return
+    DestinationPopularity.objects.bulk_create(
+        [DestinationPopularity(destination_id=destination_id) for destination_id in deltas],
+        ignore_conflicts=True,
+    )
+    # Relative updates, so concurrent saves never overwrite each other's counts
+    for destination_id, delta in deltas.items():
+        DestinationPopularity.objects.filter(destination_id=destination_id).update(
+            traveler_count=F('traveler_count') + delta,
+        )
+    # Cached home pages and their validators carry this version
+    transaction.on_commit(bump_popularity_version)
+
+
+def _popular_queryset(limit):
+    return (
+        DestinationPopularity.objects
+        .filter(traveler_count__gt=0)
+        .select_related('destination')
+        .order_by('-traveler_count')[:limit]
+    )
+
+
+def _with_count(row):
+    row.destination.traveler_count = row.traveler_count
+    return row.destination
+
+
+def popular_destinations(limit):
+    """The most booked destinations, read from the top of popularity_count_idx."""
+    return [_with_count(row) for row in _popular_queryset(limit)]
+
+
+async def apopular_destinations(limit):
+    return [_with_count(row) async for row in _popular_queryset(limit)]
+
+
+def recount_popularity():
+    """Rebuild every counter from the travelers table (one full GROUP BY)."""
+    with transaction.atomic():
+        DestinationPopularity.objects.all().delete()
+        DestinationPopularity.objects.bulk_create(
+            DestinationPopularity(destination_id=row['linked_destination'], traveler_count=row['total'])
+            for row in (
+                Traveler.objects.filter(linked_destination__isnull=False)
+                .order_by().values('linked_destination').annotate(total=Count('id'))
+            )
+        )
+        transaction.on_commit(bump_popularity_version)
+
+
+def backfill_batch(after_id, batch_size):
+    """
+    Link the next ``batch_size`` unlinked travelers with an id above
+    ``after_id`` and count them, in one transaction. Returns (last id seen
+    or None when done, travelers linked).
+    """
+    rows = list(
+        Traveler.objects
+        .filter(id__gt=after_id, linked_destination__isnull=True)
+        .order_by('id')
+        .values_list('id', 'destination')[:batch_size]
+    )
+    if not rows:
+        return None, 0
+
+    matches = match_destinations(text for _, text in rows)
+    by_destination = defaultdict(list)
+    for traveler_id, text in rows:
+        if text in matches:
+            by_destination[matches[text]].append(traveler_id)
+
+    linked = {}
+    with transaction.atomic():
+        for destination_id, traveler_ids in by_destination.items():
+            # Still unlinked? A save may have linked some in the meantime
+            linked[destination_id] = Traveler.objects.filter(
+                id__in=traveler_ids, linked_destination__isnull=True,
+            ).update(linked_destination_id=destination_id)
+        adjust_popularity(linked)
+    return rows[-1][0], sum(linked.values())
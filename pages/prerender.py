@@ -0,0 +1,225 @@
+# Pre-rendered public pages (PRERENDER_PAGES). Home, about, gallery and
+# every destination page are rendered as an anonymous visitor sees them
+# into PRERENDER_DIR, and PrerenderedPagesMiddleware serves those files
+# without the ORM or the template engine. A Destination change removes the
+# pages showing it at once (so visitors fall back to the live view) and
+# queues them in a local spool; `python manage.py prerender_pages
+# --interval 1` renders them again once the changes have settled.
+import gzip
+import os
+import shutil
+import tempfile
+import time
+from inspect import unwrap
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404, HttpRequest
+from django.urls import Resolver404, resolve, reverse
+
+from .models import Destination
+from .spool import spool_connection
+
+# URL names of the pre-rendered pages
+PRERENDERED_VIEWS = ('home', 'about', 'gallery', 'destination_detail')
+
+# Queued by bulk writes that do not say which destinations changed
+ALL_PAGES = '*'
+
+# Destination ids read per query during a full rebuild
+REBUILD_BATCH_SIZE = 1000
+
+# One row per page waiting to be rendered. removed: 1 when its file was
+# deleted because the page changed, so a copy rendered before that change
+# must not be left in place. first_queued_at bounds the debounce.
+SPOOL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS page (
+    url TEXT PRIMARY KEY,
+    removed INTEGER NOT NULL,
+    first_queued_at REAL NOT NULL,
+    queued_at REAL NOT NULL
+)
+"""
+
+
+def _spool():
+    # A lost entry only leaves its page to the live view, no fsync needed
+    return spool_connection(settings.PRERENDER_QUEUE_PATH, SPOOL_SCHEMA, synchronous='NORMAL')
+
+
+def page_file(url):
+    """The file holding the pre-rendered copy of ``url`` (a path like /gallery/)."""
+    return os.path.join(settings.PRERENDER_DIR, *url.strip('/').split('/'), 'index.html')
+
+
+def destination_urls(ids):
+    """The pages showing these destinations: their own, the home page and the gallery."""
+    return [reverse('home'), reverse('gallery')] + [reverse('destination_detail', args=[id]) for id in ids]
+
+
+def rerender_destination_pages(ids=None):
+    """
+    Remove the pre-rendered pages showing the destinations ``ids`` (every
+    page when None) and queue them to be rendered again. Run it once the
+    change has committed, or the worker may render the old rows.
+    """
+    if not settings.PRERENDER_PAGES:
+        return
+    if ids is None:
+        shutil.rmtree(settings.PRERENDER_DIR, ignore_errors=True)
+        queue_pages([ALL_PAGES])
+        return
+    urls = destination_urls(ids)
+    for url in urls:
+        remove_page(url)
+    queue_pages(urls)
+
+
+def refresh_popular_pages():
+    # The home page ranks destinations by bookings. The old copy is still
+    # fine to serve meanwhile, so it is queued but not removed.
+    queue_pages([reverse('home')], removed=False)
+
+
+def queue_pages(urls, removed=True):
+    if not settings.PRERENDER_PAGES:
+        return
+    now = time.time()
+    # A page queued again keeps its place, so steady changes cannot hold it back forever
+    _spool().executemany(
+        'INSERT INTO page VALUES (?, ?, ?, ?) ON CONFLICT(url) DO UPDATE SET '
+        'removed = max(removed, excluded.removed), queued_at = excluded.queued_at',
+        [(url, int(removed), now, now) for url in urls],
+    )
+
+
+def queued_pages():
+    return _spool().execute('SELECT COUNT(*) FROM page').fetchone()[0]
+
+
+def render_page(url):
+    """The HTML of ``url`` as an anonymous visitor sees it, or None if there is no such page."""
+    try:
+        match = resolve(url)
+    except Resolver404:
+        return None
+    if match.url_name not in PRERENDERED_VIEWS:
+        return None
+    # Imported here: views imports the importer, which imports this module
+    from . import views
+
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = url
+    request.META = {'SERVER_NAME': 'localhost', 'SERVER_PORT': '80'}
+    request.user = AnonymousUser()
+    # unwrap() skips the page cache and ETag decorators
+    view = unwrap(getattr(views, match.url_name))
+    try:
+        response = view(request, *match.args, **match.kwargs)
+    except Http404:
+        return None
+    return response.content if response.status_code == 200 else None
+
+
+def _replace(path, content):
+    # Readers get the old file or the new one, never half of either
+    fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.chmod(temp, 0o644)
+        os.replace(temp, path)
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+
+def write_page(url, content):
+    path = page_file(url)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _replace(path, content)
+    _replace(path + '.gz', gzip.compress(content))
+
+
+def remove_page(url):
+    path = page_file(url)
+    for name in (path + '.gz', path):
+        try:
+            os.unlink(name)
+        except FileNotFoundError:
+            pass
+
+
+def render_pages(urls):
+    """Write the current copy of each page, or remove it if the page is gone. Returns how many."""
+    count = 0
+    for url in urls:
+        content = render_page(url)
+        if content is None:
+            remove_page(url)
+        else:
+            write_page(url, content)
+        count += 1
+    return count
+
+
+def rebuild_all_pages():
+    """Render every pre-rendered page and drop those of deleted destinations."""
+    count = render_pages([reverse('home'), reverse('about'), reverse('gallery')])
+    last_id = 0
+    while True:
+        # Keyset batches, so memory stays flat however many rows there are
+        ids = list(
+            Destination.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', flat=True)[:REBUILD_BATCH_SIZE]
+        )
+        if not ids:
+            break
+        last_id = ids[-1]
+        count += render_pages(reverse('destination_detail', args=[id]) for id in ids)
+
+    directory = os.path.dirname(os.path.dirname(page_file(reverse('destination_detail', args=[0]))))
+    try:
+        names = [name for name in os.listdir(directory) if name.isdigit()]
+    except FileNotFoundError:
+        names = []
+    for start in range(0, len(names), REBUILD_BATCH_SIZE):
+        batch = names[start:start + REBUILD_BATCH_SIZE]
+        existing = set(Destination.objects.filter(id__in=batch).values_list('id', flat=True))
+        for name in batch:
+            if int(name) not in existing:
+                shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+    return count
+
+
+def prerender_queued_pages(batch_size=None):
+    """
+    Render up to ``batch_size`` queued pages that saw no change for
+    PRERENDER_DEBOUNCE_SECONDS, or were first queued PRERENDER_MAX_DELAY_SECONDS
+    ago. Returns how many pages were rendered.
+    """
+    spool = _spool()
+    now = time.time()
+    rows = spool.execute(
+        'SELECT url, queued_at FROM page WHERE queued_at <= ? OR first_queued_at <= ? '
+        'ORDER BY first_queued_at LIMIT ?',
+        (
+            now - settings.PRERENDER_DEBOUNCE_SECONDS,
+            now - settings.PRERENDER_MAX_DELAY_SECONDS,
+            batch_size or settings.PRERENDER_BATCH_SIZE,
+        ),
+    ).fetchall()
+
+    count = 0
+    for url, queued_at in rows:
+        count += rebuild_all_pages() if url == ALL_PAGES else render_pages([url])
+        if spool.execute('DELETE FROM page WHERE url = ? AND queued_at = ?', (url, queued_at)).rowcount:
+            continue
+        # Queued again while rendering: the change may have committed after
+        # the page read the database, so it waits for another round
+        requeued = spool.execute('SELECT removed FROM page WHERE url = ?', (url,)).fetchone()
+        if requeued and requeued[0] and url != ALL_PAGES:
+            remove_page(url)
+        spool.execute('UPDATE page SET first_queued_at = queued_at, removed = 0 WHERE url = ?', (url,))
+    return count
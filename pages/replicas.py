@@ -0,0 +1,129 @@
+import contextvars
+import os
+import random
+import sqlite3
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+# Set on a response after a write. While it lasts the client reads from the
+# primary, so it sees its own changes even if the replicas lag behind.
+STICKY_COOKIE = 'read_primary'
+
+PRIMARY = 'default'
+
+
+class RoutingState:
+    __slots__ = ('use_replica', 'wrote')
+
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+
+
+# None outside a request (commands, signals, tests): everything uses the primary
+_state = contextvars.ContextVar('db_routing', default=None)
+
+
+def reads_from_replica():
+    state = _state.get()
+    return bool(settings.DATABASE_REPLICAS) and state is not None and state.use_replica and not state.wrote
+
+
+def replica_may_be_stale(changed_at_ns):
+    """True if this request reads from a replica that may not have a change made at ``changed_at_ns``."""
+    return reads_from_replica() and time.time_ns() - changed_at_ns < settings.REPLICA_STICKY_SECONDS * 10 ** 9
+
+
+class PrimaryReplicaRouter:
+    """
+    Send reads of safe (GET/HEAD) requests to a random replica and
+    everything else to the primary. The first write of a request pins its
+    remaining reads to the primary, and ReplicaRoutingMiddleware extends
+    that to the client's next requests.
+    """
+
+    def db_for_read(self, model, **hints):
+        if reads_from_replica():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaRoutingMiddleware:
+    """Decide per request whether its reads may go to a replica."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = self.start(request)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        state = self.start(request)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    def start(self, request):
+        safe = request.method in ('GET', 'HEAD')
+        return RoutingState(use_replica=safe and STICKY_COOKIE not in request.COOKIES)
+
+    def finish(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+def copy_sqlite_database(source, target_path):
+    """
+    Copy the open sqlite3 connection ``source`` to ``target_path``.
+
+    The backup runs as one read transaction, which under WAL never blocks
+    writers. The copy is switched to a rollback journal (a WAL file left
+    next to it would not match) and moved into place atomically, so
+    replica connections see either the old or the new copy.
+    """
+    temp_path = f'{target_path}.tmp'
+    target = sqlite3.connect(temp_path)
+    try:
+        source.backup(target)
+        target.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        target.close()
+    os.replace(temp_path, target_path)
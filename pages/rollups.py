@@ -0,0 +1,96 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ContactMessage, DailyStats, Destination, Traveler
+
+# rollup column -> (model, its timestamp field, extra filter)
+ROLLUP_SOURCES = {
+    'registrations': (User, 'date_joined', Q()),
+    'messages': (ContactMessage, 'created_at', Q()),
+    'unread_messages': (ContactMessage, 'created_at', Q(is_read=False)),
+    'travelers': (Traveler, 'created_at', Q()),
+    'destinations': (Destination, 'created_at', Q()),
+}
+
+
+def rollup_day(moment):
+    # The same day TruncDate() gives in SQL, in the current time zone
+    return timezone.localdate(moment) if timezone.is_aware(moment) else moment.date()
+
+
+def add_to_rollups(changes):
+    """
+    Add ``{day: {column: change}}`` to the daily rows, in the current
+    transaction, so the counts commit or roll back with the write itself.
+    """
+    changes = {
+        day: {column: change for column, change in columns.items() if change}
+        for day, columns in changes.items()
+    }
+    missing = {day: columns for day, columns in changes.items() if columns and not _add(day, columns)}
+    if missing:
+        # The first write of a day creates its row
+        DailyStats.objects.bulk_create([DailyStats(day=day) for day in missing], ignore_conflicts=True)
+        for day, columns in missing.items():
+            _add(day, columns)
+
+
+def _add(day, columns):
+    # A relative update, so concurrent writers never overwrite each other
+    return DailyStats.objects.filter(day=day).update(
+        **{column: F(column) + change for column, change in columns.items()}
+    )
+
+
+def add_to_rollup(moment, **columns):
+    add_to_rollups({rollup_day(moment): columns})
+
+
+def count_by_day(moments, *columns):
+    """``{day: {column: n}}`` for a batch of timestamps, for bulk writes that send no signals."""
+    changes = defaultdict(lambda: defaultdict(int))
+    for moment in moments:
+        for column in columns:
+            changes[rollup_day(moment)][column] += 1
+    return changes
+
+
+def rebuild_rollups():
+    """Recompute every daily row from the raw tables (one GROUP BY per column)."""
+    rows = defaultdict(dict)
+    # Counted inside the (IMMEDIATE) transaction, so no write can land
+    # between the counts and the swap and be lost
+    with transaction.atomic():
+        for column, (model, field, condition) in ROLLUP_SOURCES.items():
+            counts = (
+                model.objects.filter(condition)
+                .annotate(day=TruncDate(field))
+                .order_by().values('day').annotate(total=Count('pk'))
+            )
+            for row in counts:
+                rows[row['day']][column] = row['total']
+        DailyStats.objects.all().delete()
+        DailyStats.objects.bulk_create(DailyStats(day=day, **columns) for day, columns in rows.items())
+    return len(rows)
+
+
+def dashboard_stats(days):
+    """
+    The daily rows of the last ``days`` days, oldest first with missing days
+    as zeros, and their totals. One primary key range read on the rollup
+    table, so the cost does not grow with the raw tables.
+    """
+    first = timezone.localdate() - timedelta(days=days - 1)
+    stored = {row.day: row for row in DailyStats.objects.filter(day__gte=first).order_by('day')}
+    recent = []
+    for offset in range(days):
+        day = first + timedelta(days=offset)
+        recent.append(stored.get(day) or DailyStats(day=day))
+    totals = {column: sum(getattr(row, column) for row in recent) for column in ROLLUP_SOURCES}
+    return recent, totals
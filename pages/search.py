@@ -0,0 +1,133 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+
+from .models import Destination
+
+FTS_TABLE = 'pages_destination_fts'
+FTS_COLUMNS = ('name', 'country', 'description', 'highlights')
+
+# Column weights for bm25(): a hit in the name beats one in the description.
+# Passed through the rank column so FTS5 sorts results itself.
+FTS_WEIGHTS = (10.0, 5.0, 1.0, 3.0)
+
+MAX_TERMS = 8
+
+# Control characters mark snippet hits so the text can be escaped safely
+_HIT_START = '\x02'
+_HIT_END = '\x03'
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def create_index_sql():
+    columns = ', '.join(FTS_COLUMNS)
+    new_values = ', '.join('new.' + column for column in FTS_COLUMNS)
+    old_values = ', '.join('old.' + column for column in FTS_COLUMNS)
+    delete_old = (
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) "
+        f"VALUES ('delete', old.id, {old_values});"
+    )
+    insert_new = (
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});"
+    )
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{columns}, content='pages_destination', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON pages_destination "
+        f"BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON pages_destination "
+        f"BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {columns} ON pages_destination "
+        f"BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+def drop_index_sql():
+    return [
+        f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+        f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+        f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+        f"DROP TABLE IF EXISTS {FTS_TABLE}",
+    ]
+
+
+def rebuild_index():
+    # Re-reads the whole content table in one pass inside SQLite
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+def build_match_query(query):
+    """
+    Turn free text from the search box into a safe FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term, so FTS5 operators typed by the
+    user (AND, NEAR, column filters, quotes) are treated as plain text.
+    """
+    terms = re.findall(r'\w+', query or '')[:MAX_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def matching_ids(query, columns=FTS_COLUMNS):
+    """
+    SQL selecting the id of every destination matching ``query`` in
+    ``columns``, for an ``id__in`` filter, or None if the query has no
+    words. Needs FTS5 (see fts_available).
+    """
+    match = build_match_query(query)
+    if not match:
+        return None
+    # A column filter, so only the given columns can match
+    match = f"{{{' '.join(columns)}}} : ({match})"
+    return RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+
+
+def search_destinations(query, limit=50):
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    if not fts_available():
+        return _fallback_search(query, limit)
+
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    sql = (
+        f"SELECT d.id, d.name, d.country, d.category, d.image_url, d.price_per_day, "
+        f"d.duration_days, d.created_at, "
+        f"snippet({FTS_TABLE}, -1, %s, %s, '…', 16) AS snippet, "
+        f"{FTS_TABLE}.rank AS rank "
+        f"FROM {FTS_TABLE} JOIN pages_destination d ON d.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rank MATCH 'bm25({weights})' "
+        f"ORDER BY {FTS_TABLE}.rank LIMIT %s"
+    )
+    results = list(Destination.objects.raw(sql, [_HIT_START, _HIT_END, match, limit]))
+    for destination in results:
+        destination.snippet = highlight_snippet(destination.snippet)
+    return results
+
+
+def highlight_snippet(snippet):
+    html = escape(snippet or '')
+    return html.replace(_HIT_START, '<mark>').replace(_HIT_END, '</mark>')
+
+
+def _fallback_search(query, limit):
+    # Databases without FTS5 get a plain (slow) LIKE search
+    condition = Q()
+    for term in re.findall(r'\w+', query)[:MAX_TERMS]:
+        term_condition = Q()
+        for column in FTS_COLUMNS:
+            term_condition |= Q(**{column + '__icontains': term})
+        condition &= term_condition
+    results = list(Destination.objects.filter(condition)[:limit])
+    for destination in results:
+        destination.snippet = escape(destination.description[:200])
+    return results
@@ -0,0 +1,334 @@
+import itertools
+import multiprocessing
+import random
+from contextlib import nullcontext
+from datetime import timedelta
+
+import django
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from .highlights import sync_highlights
+from .models import ContactMessage, Destination, Traveler, UserProfile
+from .popularity import recount_popularity
+from .rollups import rebuild_rollups
+
+# Every seeded user logs in with this password
+SEED_PASSWORD = 'password'
+
+# Rows generated per task. Each chunk has its own random seed, so the rows
+# come out the same whatever the number of worker processes. Workers insert
+# chunks in any order, though, so rows are looked up by their index (in the
+# username or image URL), never by id.
+SEED_CHUNK_SIZE = 20_000
+
+FIRST_NAMES = [
+    'Aarav', 'Aditi', 'Ananya', 'Arjun', 'Diya', 'Ishaan', 'Kabir', 'Kavya', 'Meera', 'Neha',
+    'Priya', 'Rahul', 'Riya', 'Rohan', 'Saanvi', 'Sara', 'Tara', 'Vihaan', 'Vivek', 'Zoya',
+    'Emma', 'Liam', 'Olivia', 'Noah', 'Sofia', 'Lucas', 'Mia', 'Leo', 'Hana', 'Kenji',
+]
+LAST_NAMES = [
+    'Patel', 'Shah', 'Mehta', 'Sharma', 'Gupta', 'Iyer', 'Reddy', 'Nair', 'Desai', 'Joshi',
+    'Kapoor', 'Singh', 'Vaghela', 'Rao', 'Bose', 'Smith', 'Garcia', 'Muller', 'Rossi', 'Tanaka',
+]
+# (place, country, category)
+PLACES = [
+    ('Goa', 'India', 'beaches'), ('Manali', 'India', 'mountains'), ('Jaipur', 'India', 'cities'),
+    ('Kerala Backwaters', 'India', 'nature'), ('Leh', 'India', 'mountains'), ('Mumbai', 'India', 'cities'),
+    ('Andaman', 'India', 'beaches'), ('Rishikesh', 'India', 'nature'), ('Bali', 'Indonesia', 'beaches'),
+    ('Phuket', 'Thailand', 'beaches'), ('Bangkok', 'Thailand', 'cities'), ('Kyoto', 'Japan', 'cities'),
+    ('Hokkaido', 'Japan', 'nature'), ('Swiss Alps', 'Switzerland', 'mountains'), ('Paris', 'France', 'cities'),
+    ('Santorini', 'Greece', 'beaches'), ('Dubai', 'UAE', 'cities'), ('Maldives', 'Maldives', 'beaches'),
+    ('Kathmandu', 'Nepal', 'mountains'), ('Banff', 'Canada', 'nature'), ('Cape Town', 'South Africa', 'cities'),
+    ('Patagonia', 'Argentina', 'mountains'), ('Queenstown', 'New Zealand', 'nature'), ('Rome', 'Italy', 'cities'),
+]
+PACKAGE_NAMES = ['Getaway', 'Escape', 'Explorer', 'Retreat', 'Discovery', 'Trail', 'Holiday', 'Adventure']
+SUBJECTS = [
+    'Booking enquiry', 'Group discount', 'Change of dates', 'Visa help', 'Refund request',
+    'Honeymoon package', 'Custom itinerary', 'Payment failed', 'Hotel upgrade', 'Feedback',
+]
+SENTENCES = [
+    'We are a family of four planning a trip next month.',
+    'Could you share the detailed itinerary and what is included?',
+    'Is airport pickup part of the package?',
+    'We would prefer a hotel close to the beach.',
+    'Please let me know the best time of year to visit.',
+    'My booking confirmation never arrived by email.',
+    'Do you offer discounts for senior citizens?',
+    'Thank you for the wonderful trip last year!',
+]
+
+# Zipf exponents: how strongly a few users dominate each table
+TRAVELER_SKEW = 1.2
+MESSAGE_SKEW = 0.8
+
+# Share of travelers booked on a catalogue destination, spread over the
+# first BOOKED_POOL destinations with this Zipf exponent
+BOOKED_SHARE = 0.7
+BOOKED_POOL = 500
+BOOKED_SKEW = 1.0
+
+# Typical age of a row; created_at falls off exponentially into the past
+MEAN_AGE_DAYS = 90
+
+
+def bulk_create_with_timestamps(model, rows):
+    """
+    bulk_create() that keeps the created_at/updated_at values set on ``rows``.
+
+    Inserting runs auto_now/auto_now_add over them, so they are written back
+    afterwards with bulk_update(), which does not. Switching those flags off
+    instead would change the shared Field objects for every other thread.
+    """
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    stamps = [[getattr(row, field.attname) for field in fields] for row in rows]
+    model.objects.bulk_create(rows)
+    if not fields:
+        return
+    for row, values in zip(rows, stamps):
+        for field, value in zip(fields, values):
+            setattr(row, field.attname, value)
+    model.objects.bulk_update(rows, [field.name for field in fields])
+
+
+def zipf_cum_weights(count, exponent):
+    return list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(count)))
+
+
+def _age(rng, now):
+    return now - timedelta(days=min(rng.expovariate(1 / MEAN_AGE_DAYS), 3 * 365))
+
+
+def _person(rng):
+    return rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+
+
+def _phone(rng):
+    return f'9{rng.randrange(10 ** 9):09d}'
+
+
+def _image_url(i):
+    return f'https://images.example.com/destinations/{i}.jpg'
+
+
+# ============ ROW GENERATORS ============
+# Each builds the rows with indexes [start, stop) from its own chunk seed.
+
+def users_chunk(rng, start, stop, context):
+    rows = []
+    for i in range(start, stop):
+        first, last = _person(rng)
+        rows.append(User(
+            username=f"{context['prefix']}{i}",
+            first_name=first,
+            last_name=last,
+            email=f'{first}.{last}{i}@example.com'.lower(),
+            password=context['password'],
+            is_staff=i < context['staff'],
+            date_joined=_age(rng, context['now']),
+        ))
+    return User, rows
+
+
+def profiles_chunk(rng, start, stop, context):
+    return UserProfile, [
+        UserProfile(user_id=user_id, phone=_phone(rng) if rng.random() < 0.6 else '')
+        for user_id in context['user_ids'][start:stop]
+    ]
+
+
+def destinations_chunk(rng, start, stop, context):
+    rows = []
+    for i in range(start, stop):
+        place, country, category = rng.choice(PLACES)
+        created_at = _age(rng, context['now'])
+        rows.append(Destination(
+            name=f'{place} {rng.choice(PACKAGE_NAMES)} {i}',
+            country=country,
+            description=' '.join(rng.sample(SENTENCES, 3)),
+            category=category,
+            image_url=_image_url(i),
+            price_per_day=rng.randrange(1500, 25000, 100),
+            duration_days=rng.randint(2, 14),
+            highlights=', '.join(rng.sample(['Beach', 'Museum', 'Old Town', 'Trek', 'Safari', 'Cruise', 'Food tour'], 3)),
+            is_featured=rng.random() < 0.01,
+            created_by_id=rng.choice(context['staff_ids']),
+            created_at=created_at,
+            updated_at=created_at,
+        ))
+    return Destination, rows
+
+
+def travelers_chunk(rng, start, stop, context):
+    owners = rng.choices(context['member_ids'], cum_weights=context['traveler_weights'], k=stop - start)
+    rows = []
+    booked = context['booked']
+    for i, owner in zip(range(start, stop), owners):
+        first, last = _person(rng)
+        linked_id, destination = None, rng.choice(PLACES)[0]
+        # Most travelers name a catalogue destination, a few popular ones far more often
+        if booked and rng.random() < BOOKED_SHARE:
+            linked_id, destination = rng.choices(booked, cum_weights=context['booked_weights'])[0]
+        rows.append(Traveler(
+            user_id=owner,
+            name=f'{first} {last}',
+            destination=destination,
+            linked_destination_id=linked_id,
+            email=f'{first}.{last}.t{i}@example.com'.lower(),
+            phone=_phone(rng),
+            created_at=_age(rng, context['now']),
+        ))
+    return Traveler, rows
+
+
+def messages_chunk(rng, start, stop, context):
+    owners = rng.choices(context['member_ids'], cum_weights=context['message_weights'], k=stop - start)
+    now = context['now']
+    rows = []
+    for owner, i in zip(owners, range(start, stop)):
+        created_at = _age(rng, now)
+        age_days = (now - created_at).days
+        first, last = _person(rng)
+        rows.append(ContactMessage(
+            user_id=owner,
+            name=f'{first} {last}',
+            email=f'{first}.{last}.m{i}@example.com'.lower(),
+            phone=_phone(rng) if rng.random() < 0.5 else None,
+            subject=rng.choice(SUBJECTS),
+            message=' '.join(rng.choices(SENTENCES, k=rng.randint(1, 8))),
+            created_at=created_at,
+            # New messages are mostly unread; a few old ones never get read
+            is_read=rng.random() > max(0.9 * 0.8 ** (age_days / 7), 0.03),
+        ))
+    return ContactMessage, rows
+
+
+GENERATORS = {
+    'users': users_chunk,
+    'profiles': profiles_chunk,
+    'destinations': destinations_chunk,
+    'travelers': travelers_chunk,
+    'messages': messages_chunk,
+}
+
+
+# ============ WORKERS ============
+
+_context = None
+_write_lock = nullcontext()
+
+
+def _init_worker(context, write_lock=None):
+    global _context, _write_lock
+    if not apps.ready:  # spawned rather than forked
+        django.setup()
+    _context = context
+    _write_lock = write_lock or nullcontext()
+
+
+def _run_chunk(task):
+    kind, start, stop = task
+    rng = random.Random(f"{_context['seed']}:{kind}:{start}")
+    model, rows = GENERATORS[kind](rng, start, stop, _context)
+    batch_size = _context['batch_size']
+    # Rows are built in parallel; on SQLite only one process may write at a time
+    with _write_lock:
+        for offset in range(0, len(rows), batch_size):
+            with transaction.atomic():
+                bulk_create_with_timestamps(model, rows[offset:offset + batch_size])
+                if model is Destination:
+                    sync_highlights(rows[offset:offset + batch_size])
+    return kind, len(rows)
+
+
+def _run(kind, total, context, workers, progress):
+    tasks = [(kind, start, min(total, start + SEED_CHUNK_SIZE)) for start in range(0, total, SEED_CHUNK_SIZE)]
+    if workers <= 1:
+        _init_worker(context)
+        results = map(_run_chunk, tasks)
+        _report(kind, total, results, progress)
+        return
+
+    write_lock = multiprocessing.Lock() if connection.vendor == 'sqlite' else None
+    # Children must open their own connections, not share the parent's
+    connections.close_all()
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(context, write_lock)) as pool:
+        _report(kind, total, pool.imap_unordered(_run_chunk, tasks), progress)
+
+
+def _report(kind, total, results, progress):
+    done = 0
+    for _, count in results:
+        done += count
+        if progress:
+            progress(kind, done, total)
+
+
+def seed_database(users=1000, destinations=5000, travelers=50_000, messages=50_000,
+                  workers=1, seed=42, batch_size=5000, prefix='seed', progress=None):
+    """
+    Fill the database with realistic, skewed rows and return
+    (staff ids, member ids ordered from most to least active).
+
+    Users share one pre-hashed password. A handful of members own most
+    travelers and messages, and unread messages thin out with age but
+    never quite disappear. The same ``seed`` always produces the same data.
+    """
+    staff = max(1, users // 1000)
+    context = {
+        'seed': seed,
+        'batch_size': batch_size,
+        'prefix': prefix,
+        'now': timezone.now(),
+        'password': make_password(SEED_PASSWORD),
+        'staff': staff,
+    }
+    _run('users', users, context, workers, progress)
+
+    # By index, not id: workers may have inserted the chunks in any order
+    seeded = User.objects.filter(username__startswith=prefix).values_list('username', 'id', 'is_staff')
+    seeded = sorted(
+        (int(username[len(prefix):]), user_id, is_staff)
+        for username, user_id, is_staff in seeded if username[len(prefix):].isdigit()
+    )
+    user_ids = [user_id for _, user_id, _ in seeded]
+    staff_ids = [user_id for _, user_id, is_staff in seeded if is_staff]
+    member_ids = [user_id for _, user_id, is_staff in seeded if not is_staff] or staff_ids
+    # Shuffle once so the busiest members are not simply the oldest accounts
+    random.Random(f'{seed}:members').shuffle(member_ids)
+    context.update(
+        user_ids=user_ids,
+        staff_ids=staff_ids,
+        member_ids=member_ids,
+        traveler_weights=zipf_cum_weights(len(member_ids), TRAVELER_SKEW),
+        message_weights=zipf_cum_weights(len(member_ids), MESSAGE_SKEW),
+    )
+
+    _run('profiles', len(user_ids), context, workers, progress)
+    _run('destinations', destinations, context, workers, progress)
+    # The first BOOKED_POOL destinations of this run, in index order
+    pool = {_image_url(i): i for i in range(min(destinations, BOOKED_POOL))}
+    rows = (
+        Destination.objects.filter(image_url__in=pool, created_by__in=staff_ids)
+        .values_list('image_url', 'id', 'name')
+    )
+    booked = [(destination_id, name) for _, destination_id, name in sorted(
+        (pool[image_url], destination_id, name) for image_url, destination_id, name in rows
+    )]
+    context.update(booked=booked, booked_weights=zipf_cum_weights(len(booked), BOOKED_SKEW))
+    _run('travelers', travelers, context, workers, progress)
+    # bulk_create sends no signals, so count the links in one pass
+    recount_popularity()
+    _run('messages', messages, context, workers, progress)
+    # Likewise for the dashboard's daily rows
+    rebuild_rollups()
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return staff_ids, member_ids
@@ -0,0 +1,267 @@
+# Session engine (SESSION_ENGINE = 'pages.sessions'). A session is read
+# from a per-process LRU, then the shared SESSION_CACHE_ALIAS cache, then
+# the write-behind spool, and only then the database. Saves go to the
+# cache at once; with SESSION_WRITE_BEHIND they reach the database in
+# batches through `python manage.py drain_sessions`, otherwise on every save.
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends.base import CreateError
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import router, transaction
+from django.utils import timezone
+
+from .spool import spool_connection
+
+KEY_PREFIX = 'session:'
+
+# The latest state of every session saved since the last drain.
+# deleted: 1 for a session to remove from the database instead.
+SPOOL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS session (
+    session_key TEXT PRIMARY KEY,
+    session_data TEXT NOT NULL,
+    expire_date REAL NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    queued_at REAL NOT NULL
+)
+"""
+
+
+def _spool():
+    # The cache holds a copy too, so losing the last commits to a power
+    # cut only costs a few logins; no fsync on every save
+    return spool_connection(settings.SESSION_SPOOL_PATH, SPOOL_SCHEMA, synchronous='NORMAL')
+
+
+def _stamp(cache, key):
+    # Identifies one write of a file cache entry (each write is a new file),
+    # so a stat() tells whether the LRU copy is still current. None when
+    # the entry is missing or the cache is not file-based.
+    if not isinstance(cache, FileBasedCache):
+        return None
+    try:
+        stat = os.stat(cache._key_to_file(key))
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class SessionLRU:
+    """Serialized sessions recently read or written by this process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key, stamp):
+        with self.lock:
+            found = self.entries.get(key)
+            if found is None or found[0] != stamp:
+                return None
+            self.entries.move_to_end(key)
+            return found[1]
+
+    def put(self, key, stamp, entry):
+        if stamp is None:
+            return
+        with self.lock:
+            self.entries[key] = (stamp, entry)
+            self.entries.move_to_end(key)
+            while len(self.entries) > settings.SESSION_LRU_SIZE:
+                self.entries.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+lru = SessionLRU()
+
+
+class SessionStore(DBStore):
+    """
+    Entries are (serialized data, expiry timestamp). Serialized data is
+    what a save compares against, so a request that leaves the session as
+    it found it writes nothing until the expiry needs refreshing.
+    """
+
+    def __init__(self, session_key=None):
+        self._cache = caches[settings.SESSION_CACHE_ALIAS]
+        self._loaded = None
+        super().__init__(session_key)
+
+    def load(self):
+        entry = self._read(self.session_key)
+        if entry is None:
+            # Never adopt a key the client made up, as the db backend does
+            self._session_key = None
+            return {}
+        self._loaded = entry
+        return self.serializer().loads(entry[0])
+
+    def _read(self, session_key):
+        cache_key = KEY_PREFIX + session_key
+        stamp = _stamp(self._cache, cache_key)
+        entry = lru.get(session_key, stamp) if stamp else None
+        if entry is None:
+            try:
+                entry = self._cache.get(cache_key)
+            except Exception:
+                # Invalid keys raise on some backends, see cached_db
+                entry = None
+            if entry is None:
+                entry = self._read_stored(session_key)
+                if entry is None:
+                    return None
+                self._cache.set(cache_key, entry, max(0, int(entry[1] - time.time())))
+                stamp = _stamp(self._cache, cache_key)
+            lru.put(session_key, stamp, entry)
+        return entry if entry[1] > time.time() else None
+
+    def _read_stored(self, session_key):
+        # Only after a cache miss (a new worker, or an evicted entry)
+        if settings.SESSION_WRITE_BEHIND:
+            row = _spool().execute(
+                'SELECT session_data, expire_date, deleted FROM session WHERE session_key = ?', (session_key,),
+            ).fetchone()
+            if row:
+                return None if row[2] else (self.serializer().dumps(self.decode(row[0])), row[1])
+        stored = self.model.objects.filter(session_key=session_key, expire_date__gt=timezone.now()).first()
+        if stored is None:
+            return None
+        return (self.serializer().dumps(self.decode(stored.session_data)), stored.expire_date.timestamp())
+
+    def exists(self, session_key):
+        # Only asked for fresh random keys; save(must_create=True) is what
+        # guarantees uniqueness, through cache.add()
+        return bool(session_key) and (KEY_PREFIX + session_key) in self._cache
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        entry = (self.serializer().dumps(data), self.get_expiry_date().timestamp())
+        if not must_create and self._loaded and self._loaded[0] == entry[0]:
+            if entry[1] - self._loaded[1] < settings.SESSION_EXPIRY_REFRESH_SECONDS:
+                # Only the expiry would move, and not by much
+                return
+
+        cache_key = KEY_PREFIX + self.session_key
+        if must_create:
+            if not self._cache.add(cache_key, entry, self.get_expiry_age()):
+                raise CreateError
+        else:
+            self._cache.set(cache_key, entry, self.get_expiry_age())
+        self._loaded = entry
+        lru.put(self.session_key, _stamp(self._cache, cache_key), entry)
+        queue_session(self.session_key, self.encode(data), entry[1])
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        self._cache.delete(KEY_PREFIX + session_key)
+        lru.discard(session_key)
+        queue_session(session_key, '', 0, deleted=True)
+
+    async def aload(self):
+        return await sync_to_async(self.load)()
+
+    async def aexists(self, session_key):
+        return await sync_to_async(self.exists)(session_key)
+
+    async def asave(self, must_create=False):
+        return await sync_to_async(self.save)(must_create)
+
+    async def adelete(self, session_key=None):
+        return await sync_to_async(self.delete)(session_key)
+
+    @classmethod
+    def clear_expired(cls):
+        # `clearsessions`, one short transaction per batch
+        while purge_expired_sessions():
+            pass
+
+    @classmethod
+    async def aclear_expired(cls):
+        await sync_to_async(cls.clear_expired)()
+
+
+def queue_session(session_key, session_data, expire_date, deleted=False):
+    if settings.SESSION_WRITE_BEHIND:
+        # Replaces any earlier state of the same session still queued
+        _spool().execute(
+            'INSERT OR REPLACE INTO session VALUES (?, ?, ?, ?, ?)',
+            (session_key, session_data, expire_date, int(deleted), time.time()),
+        )
+    else:
+        write_sessions([(session_key, session_data, expire_date, deleted)])
+
+
+def write_sessions(rows):
+    """Store (key, encoded data, expiry timestamp, deleted) rows in one transaction."""
+    Session = SessionStore.get_model_class()
+    using = router.db_for_write(Session)
+    stored = [
+        Session(
+            session_key=session_key,
+            session_data=session_data,
+            expire_date=datetime.fromtimestamp(expire_date, tz=dt_timezone.utc),
+        )
+        for session_key, session_data, expire_date, deleted in rows
+        if not deleted
+    ]
+    deleted = [session_key for session_key, _, _, deleted in rows if deleted]
+    with transaction.atomic(using=using):
+        if stored:
+            Session.objects.using(using).bulk_create(
+                stored,
+                update_conflicts=True,
+                unique_fields=['session_key'],
+                update_fields=['session_data', 'expire_date'],
+            )
+        if deleted:
+            Session.objects.using(using).filter(session_key__in=deleted).delete()
+
+
+def drain_sessions(batch_size=None):
+    """Write up to ``batch_size`` queued sessions to the database and return how many."""
+    spool = _spool()
+    rows = spool.execute(
+        'SELECT session_key, session_data, expire_date, deleted, queued_at FROM session '
+        'ORDER BY queued_at LIMIT ?',
+        (batch_size or settings.SESSION_DRAIN_BATCH_SIZE,),
+    ).fetchall()
+    if not rows:
+        return 0
+    write_sessions([row[:4] for row in rows])
+    # A session saved again meanwhile has a newer queued_at and stays queued
+    spool.executemany(
+        'DELETE FROM session WHERE session_key = ? AND queued_at = ?', [(row[0], row[4]) for row in rows],
+    )
+    return len(rows)
+
+
+def queued_sessions():
+    return _spool().execute('SELECT COUNT(*) FROM session').fetchone()[0]
+
+
+def purge_expired_sessions(batch_size=None):
+    """Delete one batch of expired sessions (django_session.expire_date is indexed)."""
+    Session = SessionStore.get_model_class()
+    keys = list(
+        Session.objects.filter(expire_date__lt=timezone.now())
+        .values_list('session_key', flat=True)[:batch_size or settings.SESSION_PURGE_BATCH_SIZE]
+    )
+    if keys:
+        Session.objects.filter(session_key__in=keys).delete()
+    return len(keys)
@@ -0,0 +1,159 @@
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import bump_destinations_version
+from .counters import invalidate_unread_counts
+from .highlights import delete_unused_highlights, parse_highlights, sync_highlights
+from .metrics import install_query_timer
+from .models import ContactMessage, Destination, Highlight, Traveler, UserProfile
+from .popularity import adjust_popularity, match_destinations
+from .prerender import refresh_popular_pages, rerender_destination_pages
+from .rollups import add_to_rollup
+from .thumbnails import delete_thumbnails, queue_thumbnails, thumbnails_exist
+
+
+# Note: queryset.update() and bulk_create() do not send these signals;
+# code using them must call bump_destinations_version() itself.
+@receiver(post_save, sender=Destination)
+@receiver(post_delete, sender=Destination)
+def invalidate_destination_pages(sender, **kwargs):
+    # After commit, so no request can re-cache the old rows under the new version
+    transaction.on_commit(bump_destinations_version)
+
+
+@receiver(post_save, sender=Destination)
+@receiver(post_delete, sender=Destination)
+def invalidate_prerendered_pages(sender, instance, **kwargs):
+    transaction.on_commit(partial(rerender_destination_pages, [instance.id]))
+
+
+@receiver(post_save, sender=Destination)
+def link_highlights(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'highlights' in update_fields:
+        sync_highlights([instance])
+
+
+@receiver(post_delete, sender=Destination)
+def unlink_highlights(sender, instance, **kwargs):
+    # Its links went with it; the text says which highlights they were
+    slugs = [slug for slug, _ in parse_highlights(instance.highlights)]
+    if slugs:
+        delete_unused_highlights(Highlight.objects.filter(slug__in=slugs))
+
+
+@receiver(post_save, sender=ContactMessage)
+@receiver(post_delete, sender=ContactMessage)
+def invalidate_unread_message_counts(sender, instance, **kwargs):
+    invalidate_unread_counts([instance.user_id])
+
+
+# Traveler popularity counters. Like the others these signals miss
+# bulk_create() and update(); backfill_batch() and seed_database()
+# adjust the counters themselves.
+@receiver(post_init, sender=Traveler)
+def remember_traveler_destination(sender, instance, **kwargs):
+    instance._saved_destination = (instance.destination, instance.linked_destination_id)
+
+
+@receiver(pre_save, sender=Traveler)
+def link_traveler_destination(sender, instance, **kwargs):
+    added = instance._state.adding and instance.linked_destination_id is None
+    if added or instance.destination != instance._saved_destination[0]:
+        instance.linked_destination_id = match_destinations([instance.destination]).get(instance.destination)
+
+
+@receiver(post_save, sender=Traveler)
+def count_traveler(sender, instance, **kwargs):
+    before = instance._saved_destination[1]
+    if before != instance.linked_destination_id:
+        adjust_popularity({before: -1, instance.linked_destination_id: 1})
+        transaction.on_commit(refresh_popular_pages)
+    instance._saved_destination = (instance.destination, instance.linked_destination_id)
+
+
+@receiver(post_delete, sender=Traveler)
+def uncount_traveler(sender, instance, **kwargs):
+    if instance._saved_destination[1]:
+        adjust_popularity({instance._saved_destination[1]: -1})
+        transaction.on_commit(refresh_popular_pages)
+
+
+# Daily dashboard rollups. Written in the transaction of the save that
+# sends them, so views wrap those saves in transaction.atomic() (the admin
+# already does). Bulk writes skip these signals and add their own counts.
+ROLLUP_COLUMNS = {User: 'registrations', Traveler: 'travelers', Destination: 'destinations'}
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Traveler)
+@receiver(post_save, sender=Destination)
+def count_created(sender, instance, created, **kwargs):
+    if created:
+        add_to_rollup(_created_at(instance), **{ROLLUP_COLUMNS[sender]: 1})
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Traveler)
+@receiver(post_delete, sender=Destination)
+def uncount_deleted(sender, instance, **kwargs):
+    add_to_rollup(_created_at(instance), **{ROLLUP_COLUMNS[sender]: -1})
+
+
+def _created_at(instance):
+    return instance.date_joined if isinstance(instance, User) else instance.created_at
+
+
+@receiver(post_init, sender=ContactMessage)
+def remember_message_read(sender, instance, **kwargs):
+    # None when is_read was deferred, to avoid a query per loaded row
+    instance._saved_is_read = instance.__dict__.get('is_read')
+
+
+@receiver(post_save, sender=ContactMessage)
+def count_message(sender, instance, created, **kwargs):
+    if created:
+        add_to_rollup(instance.created_at, messages=1, unread_messages=int(not instance.is_read))
+    elif instance._saved_is_read is not None and instance._saved_is_read != instance.is_read:
+        add_to_rollup(instance.created_at, unread_messages=-1 if instance.is_read else 1)
+    instance._saved_is_read = instance.is_read
+
+
+@receiver(post_delete, sender=ContactMessage)
+def uncount_message(sender, instance, **kwargs):
+    add_to_rollup(instance.created_at, messages=-1, unread_messages=-int(not instance.is_read))
+
+
+@receiver(post_init, sender=UserProfile)
+def remember_profile_picture(sender, instance, **kwargs):
+    # None when the field was deferred, like remember_message_read()
+    picture = instance.__dict__.get('profile_picture')
+    instance._saved_picture = getattr(picture, 'name', picture)
+
+
+@receiver(post_save, sender=UserProfile)
+def resize_profile_picture(sender, instance, **kwargs):
+    # Every upload gets a new file name, so missing derivatives mean a new picture
+    if instance.profile_picture and not thumbnails_exist(instance.profile_picture.name):
+        queue_thumbnails(instance.profile_picture.name)
+    # The derivatives of a replaced or cleared picture are never shown again
+    old = instance._saved_picture
+    if old and old != instance.profile_picture.name:
+        transaction.on_commit(partial(delete_thumbnails, old))
+    instance._saved_picture = instance.profile_picture.name
+
+
+@receiver(post_delete, sender=UserProfile)
+def delete_profile_thumbnails(sender, instance, **kwargs):
+    if instance.profile_picture:
+        transaction.on_commit(partial(delete_thumbnails, instance.profile_picture.name))
+
+
+@receiver(connection_created)
+def time_queries(sender, connection, **kwargs):
+    # Feeds the per-view SQL totals on /metrics
+    install_query_timer(connection)
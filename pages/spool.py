@@ -0,0 +1,27 @@
+import sqlite3
+import threading
+
+_local = threading.local()
+
+
+def spool_connection(path, schema, synchronous='FULL'):
+    """
+    A connection to a local SQLite spool file, one per thread and path.
+
+    A spool is its own file, so appending to it never waits on the main
+    database's write lock.
+    """
+    path = str(path)
+    connections = _local.__dict__.setdefault('connections', {})
+    if path not in connections:
+        conn = sqlite3.connect(path, isolation_level=None, timeout=5)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute(f'PRAGMA synchronous = {synchronous}')
+        conn.executescript(schema)
+        connections[path] = conn
+    return connections[path]
+
+
+def close_spools():
+    for conn in _local.__dict__.pop('connections', {}).values():
+        conn.close()
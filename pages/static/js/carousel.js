@@ -0,0 +1,88 @@
+// Small scroll-snap slider for the home page. It covers the Flickity
+// options we used (autoPlay, wrapAround, pageDots, prevNextButtons)
+// without loading a library from a CDN.
+function setupCarousel(carousel) {
+    const options = JSON.parse(carousel.dataset.carousel || '{}');
+    const viewport = carousel.querySelector('.carousel-viewport');
+    const cells = Array.from(viewport.querySelectorAll('.carousel-cell'));
+    let selected = 0;
+    let timer = null;
+
+    if (cells.length < 2) {
+        return;
+    }
+
+    function select(index) {
+        if (options.wrapAround) {
+            index = (index + cells.length) % cells.length;
+        } else {
+            index = Math.max(0, Math.min(index, cells.length - 1));
+        }
+        const cell = cells[index];
+        viewport.scrollLeft = cell.offsetLeft - (viewport.clientWidth - cell.clientWidth) / 2;
+    }
+
+    // Keep the dots in sync however the slide changed (buttons, swipe, autoplay)
+    function updateSelected() {
+        const centre = viewport.scrollLeft + viewport.clientWidth / 2;
+        let closest = 0;
+        cells.forEach((cell, index) => {
+            const distance = Math.abs(cell.offsetLeft + cell.clientWidth / 2 - centre);
+            const best = Math.abs(cells[closest].offsetLeft + cells[closest].clientWidth / 2 - centre);
+            if (distance < best) {
+                closest = index;
+            }
+        });
+        selected = closest;
+        carousel.querySelectorAll('.carousel-dots .dot').forEach((dot, index) => {
+            dot.classList.toggle('is-selected', index === selected);
+        });
+    }
+
+    if (options.prevNextButtons) {
+        [['previous', '‹', -1], ['next', '›', 1]].forEach(([name, label, step]) => {
+            const button = document.createElement('button');
+            button.type = 'button';
+            button.className = 'carousel-button ' + name;
+            button.setAttribute('aria-label', name);
+            button.textContent = label;
+            button.addEventListener('click', () => select(selected + step));
+            carousel.appendChild(button);
+        });
+    }
+
+    if (options.pageDots) {
+        const dots = document.createElement('div');
+        dots.className = 'carousel-dots';
+        cells.forEach((cell, index) => {
+            const dot = document.createElement('button');
+            dot.type = 'button';
+            dot.className = 'dot';
+            dot.setAttribute('aria-label', 'Slide ' + (index + 1));
+            dot.addEventListener('click', () => select(index));
+            dots.appendChild(dot);
+        });
+        carousel.appendChild(dots);
+    }
+
+    let scrollTimer = null;
+    viewport.addEventListener('scroll', function() {
+        clearTimeout(scrollTimer);
+        scrollTimer = setTimeout(updateSelected, 100);
+    });
+    updateSelected();
+
+    if (options.autoPlay) {
+        const start = () => {
+            timer = setInterval(() => select(selected + 1), options.autoPlay);
+        };
+        const stop = () => clearInterval(timer);
+        carousel.addEventListener('mouseenter', stop);
+        carousel.addEventListener('mouseleave', start);
+        start();
+    }
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('.carousel[data-carousel]').forEach(setupCarousel);
+});
@@ -0,0 +1,49 @@
+// Infinite scroll: swap the sentinel for the next page fragment
+function observeSentinel(observer) {
+    const sentinel = document.querySelector('.gallery-sentinel');
+    if (sentinel) {
+        observer.observe(sentinel);
+    }
+}
+
+function fadeIn(items) {
+    items.forEach((item, index) => {
+        item.style.opacity = '0';
+        item.style.transform = 'scale(0.8)';
+        setTimeout(() => {
+            item.style.transition = 'all 0.4s ease';
+            item.style.opacity = '1';
+            item.style.transform = 'scale(1)';
+        }, index * 50);
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    fadeIn(document.querySelectorAll('.gallery-item'));
+
+    if (!('IntersectionObserver' in window)) {
+        return;
+    }
+
+    const observer = new IntersectionObserver(function(entries) {
+        entries.forEach(entry => {
+            if (!entry.isIntersecting) {
+                return;
+            }
+            const sentinel = entry.target;
+            observer.unobserve(sentinel);
+            fetch(sentinel.dataset.next)
+                .then(response => response.text())
+                .then(html => {
+                    const template = document.createElement('template');
+                    template.innerHTML = html;
+                    fadeIn(template.content.querySelectorAll('.gallery-item'));
+                    sentinel.replaceWith(template.content);
+                    observeSentinel(observer);
+                })
+                .catch(() => observer.observe(sentinel));
+        });
+    }, { rootMargin: '600px' });
+
+    observeSentinel(observer);
+});
@@ -0,0 +1,57 @@
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # optional: only .gz files are written without it
+    brotli = None
+
+# Only text formats shrink; images and fonts are already compressed
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.txt', '.json', '.map', '.html', '.xml')
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    collectstatic storage that writes content-hashed names plus .gz and .br
+    copies of every text file, so StaticFilesMiddleware can serve them
+    with far-future cache headers and no compression work per request.
+    """
+    # Names missing from the manifest fall back to the plain name
+    manifest_strict = False
+
+    def stored_name(self, name):
+        # Before collectstatic has run (tests, a fresh checkout) there is
+        # no manifest, so use plain names rather than failing every page
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS) and self.exists(name):
+                self.compress(name)
+
+    def compress(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as source:
+            content = source.read()
+
+        # mtime=0 keeps the .gz bytes identical across deploys
+        variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content, quality=11)))
+
+        for suffix, compressed in variants:
+            # Not worth a separate file when it barely shrinks
+            if len(compressed) < len(content) * 0.95:
+                with open(path + suffix, 'wb') as target:
+                    target.write(compressed)
+            elif os.path.exists(path + suffix):
+                os.remove(path + suffix)
@@ -0,0 +1,34 @@
+from django import template
+from django.utils.html import format_html
+
+from pages.thumbnails import THUMBNAIL_SIZES, thumbnails_exist
+
+register = template.Library()
+
+
+@register.simple_tag
+def profile_picture(profile, size='avatar', css_class=''):
+    """
+    Render a <picture> with the WebP derivative and a JPEG fallback, e.g.
+    {% profile_picture profile 'card' 'profile-photo' %}
+    """
+    if not profile or not profile.profile_picture:
+        return ''
+    if not thumbnails_exist(profile.profile_picture.name):
+        # Still being resized in the background
+        return format_html(
+            '<img src="{}" alt="{}" class="{}">',
+            profile.profile_picture.url, profile.user.username, css_class,
+        )
+
+    width, height, crop = THUMBNAIL_SIZES[size]
+    dimensions = format_html(' width="{}" height="{}"', width, height) if crop else ''
+    return format_html(
+        '<picture><source srcset="{}" type="image/webp">'
+        '<img src="{}" alt="{}"{} class="{}" loading="lazy"></picture>',
+        profile.picture_url(size, 'webp'),
+        profile.picture_url(size, 'jpg'),
+        profile.user.username,
+        dimensions,
+        css_class,
+    )
@@ -1,3 +1,1902 @@
-from django.test import TestCase
+import csv
+import gzip
+import importlib
+import io
+import json
+import os
+import posixpath
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.cache import cache, caches as django_caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import path, reverse
+from django.utils import timezone
+from PIL import Image
+
+from mywebsite import urls as project_urls
+
+from . import async_views, prerender
+from .backends.sqlite.base import DatabaseWrapper as TunedSQLiteWrapper
+from .benchmarks import benchmark_routes, find_regressions, seed_benchmark_data
+from .cache import bump_destinations_version, get_destinations_version
+from .contact_queue import close_spool, drain_queue, failed_submissions, queue_length, store_messages
+from .counters import unread_count
+from .exporters import stream_export
+from .facets import facet_counts
+from .highlights import sync_highlights
+from .importers import import_destinations, iter_rows
+from .metrics import registry
+from .middleware import StaticFilesMiddleware
+from .models import Traveler, UserProfile, ContactMessage, DailyStats, Destination, DestinationPopularity, Highlight
+from .popularity import backfill_batch, match_destinations, popular_destinations, recount_popularity
+from .prerender import (
+    page_file, prerender_queued_pages, queue_pages, queued_pages, rebuild_all_pages, rerender_destination_pages,
+)
+from .replicas import STICKY_COOKIE, PrimaryReplicaRouter, ReplicaRoutingMiddleware, copy_sqlite_database
+from .rollups import dashboard_stats, rebuild_rollups
+from .seeding import seed_database
+from .sessions import SessionStore, drain_sessions, lru as session_lru, purge_expired_sessions, queued_sessions
+from .thumbnails import THUMBNAIL_FORMATS, THUMBNAIL_SIZES, generate_thumbnails, thumbnail_name
+
+# A private cache per test run, cleared before each test so every
+# request below is a cold-cache request
+TEST_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'sessions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'sessions'},
+}
+
+# "SCAN pages_destination" without an index, or sorting in a temp b-tree
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+def seed_dataset(users=5, destinations=300, messages_per_user=40, travelers_per_user=30):
+    """
+    Seed enough rows that SQLite's planner prefers indexes over scans,
+    with the skew of real data (few featured, many read messages).
+    """
+    now = timezone.now()
+    staff = User.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True)
+    members = [
+        User.objects.create_user(f'user{i}', f'user{i}@example.com', 'pw')
+        for i in range(users)
+    ]
+    UserProfile.objects.bulk_create([UserProfile(user=user) for user in members + [staff]])
+
+    categories = [choice for choice, _ in Destination.CATEGORY_CHOICES]
+    Destination.objects.bulk_create([
+        Destination(
+            name=f'Destination {i}',
+            country=f'Country {i % 25}',
+            description='A lovely place to visit. ' * 10,
+            category=categories[i % len(categories)],
+            image_url=f'https://example.com/{i}.jpg',
+            price_per_day=1000 + i,
+            duration_days=1 + i % 14,
+            highlights='Beach, Museum, Old Town',
+            is_featured=i % 20 == 0,
+            created_by=staff,
+        )
+        for i in range(destinations)
+    ])
+    Destination.objects.update(created_at=now)
+    sync_highlights(Destination.objects.all())
+
+    ContactMessage.objects.bulk_create([
+        ContactMessage(
+            user=user,
+            name=user.username,
+            email=user.email,
+            subject=f'Question {i}',
+            message='Hello! ' * 50,
+            is_read=i % 5 != 0,
+        )
+        for user in members
+        for i in range(messages_per_user)
+    ])
+    Traveler.objects.bulk_create([
+        Traveler(
+            user=user,
+            name=f'Traveler {i}',
+            destination=f'Destination {i % 10}',
+            email=f'traveler{i}@example.com',
+            phone='9876543210',
+        )
+        for user in members
+        for i in range(travelers_per_user)
+    ])
+    backfill_batch(0, users * travelers_per_user)
+    for model in (ContactMessage, Traveler):
+        for index, pk in enumerate(model.objects.values_list('pk', flat=True)):
+            model.objects.filter(pk=pk).update(created_at=now - timedelta(minutes=index))
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return staff, members
+
+
+@override_settings(CACHES=TEST_CACHE)
+class HotQueryTests(TestCase):
+    """
+    Every view runs a fixed number of queries, and none of the queries on
+    our own tables falls back to a full table scan or an in-memory sort.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff, cls.members = seed_dataset()
+        cls.member = cls.members[0]
+        cls.destination = Destination.objects.order_by('id')[10]
+        cls.unread_message = ContactMessage.objects.filter(user=cls.member, is_read=False).first()
+        cls.read_message = ContactMessage.objects.filter(user=cls.member, is_read=True).first()
+        cls.traveler = Traveler.objects.filter(user=cls.member).first()
+
+    def setUp(self):
+        cache.clear()
+
+    def assertUsesIndexes(self, queries, allow_index_scan=False):
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or 'pages_' not in sql:
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = [row[-1] for row in cursor.fetchall()]
+            for step in plan:
+                match = FULL_SCAN.match(step)
+                if match and match.group(1).startswith('pages_'):
+                    self.fail(f'Full table scan in {sql!r}: {plan}')
+                if TEMP_SORT in step:
+                    self.fail(f'Sort without an index in {sql!r}: {plan}')
+                if allow_index_scan or 'VIRTUAL TABLE' in step or 'COVERING INDEX' in step:
+                    continue
+                if step.startswith('SCAN pages_'):
+                    # Walking a whole index is only fine when the query has a LIMIT
+                    self.assertIn('LIMIT', sql, f'Unbounded index scan in {sql!r}: {plan}')
+
+    def assertView(self, url, num_queries, user=None, allow_index_scan=False):
+        if user is not None:
+            self.client.force_login(user)
+            # The nav badge counter is warm on all but the first request
+            unread_count(user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        self.assertEqual(
+            len(context.captured_queries), num_queries,
+            '\n'.join(query['sql'] for query in context.captured_queries),
+        )
+        self.assertUsesIndexes(context.captured_queries, allow_index_scan)
+        return response
+
+    def test_home(self):
+        # featured slider, stats, most booked
+        self.assertView(reverse('home'), 3)
+
+    def test_about(self):
+        self.assertView(reverse('about'), 0)
+
+    def test_gallery(self):
+        # validators, page, facet counts
+        self.assertView(reverse('gallery'), 3)
+
+    def test_gallery_category(self):
+        self.assertView(reverse('gallery') + '?category=beaches', 3)
+
+    def test_gallery_facets(self):
+        self.assertView(reverse('gallery') + '?category=cities&price=budget&duration=short', 3)
+
+    def test_gallery_next_page(self):
+        response = self.client.get(reverse('gallery_page'))
+        cursor = response.context['destinations'].next_cursor
+        self.assertView(reverse('gallery_page') + f'?category=all&cursor={cursor}', 2)
+
+    def test_highlight_detail(self):
+        # validators, highlight, page
+        self.assertView(reverse('highlight_detail', args=['museum']), 3)
+
+    def test_search(self):
+        self.assertView(reverse('search') + '?q=destination', 1)
+
+    def test_destination_detail(self):
+        # validator, destination, prefetched highlights
+        self.assertView(reverse('destination_detail', args=[self.destination.id]), 3)
+
+    def test_contact(self):
+        # user, profile (the session comes from the session cache)
+        self.assertView(reverse('contact'), 2, user=self.member)
+
+    def test_profile(self):
+        self.assertView(reverse('profile'), 3, user=self.member)
+
+    def test_traveler_list(self):
+        self.assertView(reverse('traveler_list'), 2, user=self.member, allow_index_scan=True)
+
+    def test_traveler_update(self):
+        self.assertView(reverse('traveler_update', args=[self.traveler.id]), 2, user=self.member)
+
+    def test_message_list(self):
+        self.assertView(reverse('message_list'), 2, user=self.member, allow_index_scan=True)
+
+    def test_message_list_staff(self):
+        self.assertView(reverse('message_list'), 2, user=self.staff, allow_index_scan=True)
+
+    def test_message_detail_unread(self):
+        # user, message, then in one transaction (a savepoint here)
+        # the conditional UPDATE and the day's unread rollup
+        self.assertView(reverse('message_detail', args=[self.unread_message.id]), 6, user=self.member)
+
+    def test_message_detail_read(self):
+        # Already read: no write at all
+        self.assertView(reverse('message_detail', args=[self.read_message.id]), 2, user=self.member)
+
+    def test_destination_list(self):
+        self.assertView(reverse('destination_list'), 2, user=self.staff, allow_index_scan=True)
+
+    def test_dashboard(self):
+        # A year of rows, or the planner rightly scans the one row there is
+        today = timezone.localdate()
+        DailyStats.objects.bulk_create(
+            [DailyStats(day=today - timedelta(days=offset), messages=offset) for offset in range(1, 366)],
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE pages_dailystats')
+        # user, one range of rollup rows
+        self.assertView(reverse('dashboard'), 2, user=self.staff)
+
+    def test_destination_update(self):
+        self.assertView(reverse('destination_update', args=[self.destination.id]), 2, user=self.staff)
+
+
+@override_settings(CACHES=TEST_CACHE)
+class PageCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff, cls.members = seed_dataset(users=1, destinations=5, messages_per_user=0, travelers_per_user=0)
+        cls.destination = Destination.objects.order_by('id').first()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_second_request_is_served_from_the_cache(self):
+        for url in (reverse('home'), reverse('gallery'), reverse('destination_detail', args=[self.destination.id])):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+                # Only the validator query of the conditional GET is left
+                with self.assertNumQueries(1):
+                    response = self.client.get(url)
+                self.assertEqual(response['X-Page-Cache'], 'HIT')
+
+    def test_save_invalidates_once_committed(self):
+        url = reverse('gallery')
+        self.client.get(url)
+        version = get_destinations_version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.destination.name = 'Renamed Place'
+            self.destination.save()
+        # Until the commit, a request could still cache the old rows
+        self.assertEqual(get_destinations_version(), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_destinations_version(), version)
+
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Renamed Place')
+
+    def test_delete_invalidates(self):
+        url = reverse('gallery')
+        self.assertContains(self.client.get(url), self.destination.name)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.destination.delete()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertNotContains(response, f'>{self.destination.name}<')
+
+    def test_anonymous_and_staff_copies_are_separate(self):
+        url = reverse('home')
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+
+        self.client.force_login(self.staff)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, self.staff.username)
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'HIT')
+
+        self.client.logout()
+        self.client.cookies.clear()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertNotContains(response, self.staff.username)
+
+    def test_other_members_are_rendered_live(self):
+        self.client.force_login(self.members[0])
+        for _ in range(2):
+            self.assertNotIn('X-Page-Cache', self.client.get(reverse('home')))
+
+
+@override_settings(CACHES=TEST_CACHE)
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff, _ = seed_dataset(users=1, destinations=5, messages_per_user=0, travelers_per_user=0)
+        cls.destination = Destination.objects.order_by('id').first()
+
+    def setUp(self):
+        cache.clear()
+
+    def urls(self):
+        return (reverse('home'), reverse('gallery'), reverse('destination_detail', args=[self.destination.id]))
+
+    def test_unchanged_pages_answer_304(self):
+        for url in self.urls():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                # The validator query, before any page cache or template
+                with self.assertNumQueries(1):
+                    self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+                response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(response.status_code, 304)
+
+    def test_edited_destination_answers_200(self):
+        old = {url: self.client.get(url) for url in self.urls()}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.destination.name = 'Renamed Place'
+            self.destination.save()
+        for url, response in old.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Renamed Place')
+
+    def test_validators_differ_per_user(self):
+        url = reverse('home')
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(CACHES=TEST_CACHE, INBOX_PAGE_SIZE=10)
+class InboxTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff, cls.members = seed_dataset(users=2, destinations=0, messages_per_user=15, travelers_per_user=0)
+        cls.member = cls.members[0]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_through_every_message_once(self):
+        self.client.force_login(self.staff)
+        seen = []
+        url = reverse('message_list')
+        while url:
+            response = self.client.get(url)
+            page = response.context['inbox']
+            seen += [message.id for message in page]
+            url = f"{reverse('message_list')}?cursor={page.next_cursor}" if page.has_next else None
+        expected = list(ContactMessage.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_list_skips_message_body(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('message_list'))
+        self.assertIn('message', response.context['inbox'].object_list[0].get_deferred_fields())
+
+    def test_unread_filter(self):
+        self.client.force_login(self.member)
+        response = self.client.get(reverse('message_list') + '?status=unread')
+        self.assertTrue(response.context['inbox'].object_list)
+        self.assertTrue(all(not message.is_read for message in response.context['inbox']))
+
+    def test_flash_messages_are_not_shadowed(self):
+        self.client.force_login(self.member)
+        response = self.client.get(reverse('message_list'))
+        self.assertNotContains(response, 'class="alert')
+
+    def test_counters_follow_reads(self):
+        message = ContactMessage.objects.filter(user=self.member, is_read=False).first()
+        before_user = unread_count(self.member)
+        before_all = unread_count(self.staff)
+
+        self.client.force_login(self.staff)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('message_detail', args=[message.id]))
+
+        self.assertEqual(unread_count(self.member), before_user - 1)
+        self.assertEqual(unread_count(self.staff), before_all - 1)
+        message.refresh_from_db()
+        self.assertTrue(message.is_read)
+
+    def test_counters_follow_new_messages(self):
+        before = unread_count(self.staff)
+        with self.captureOnCommitCallbacks(execute=True):
+            ContactMessage.objects.create(user=self.member, name='a', email='a@example.com', subject='s', message='m')
+        self.assertEqual(unread_count(self.staff), before + 1)
+
+
+@override_settings(CACHES=TEST_CACHE, CONTACT_WRITE_BEHIND=True)
+class ContactQueueTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff, cls.members = seed_dataset(users=1, destinations=0, messages_per_user=0, travelers_per_user=0)
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(close_spool)
+        spool = self.settings(CONTACT_QUEUE_PATH=os.path.join(directory.name, 'queue.sqlite3'))
+        spool.enable()
+        self.addCleanup(spool.disable)
+
+    def submit(self, count):
+        self.client.force_login(self.members[0])
+        for i in range(count):
+            response = self.client.post(reverse('contact'), {
+                'name': 'Asha', 'email': 'asha@example.com', 'subject': f'Trip {i}', 'message': 'Hello',
+            })
+            self.assertRedirects(response, reverse('contact'))
+
+    def test_submissions_are_stored_in_batches_by_the_drain(self):
+        self.submit(3)
+        self.assertEqual(ContactMessage.objects.count(), 0)
+        self.assertEqual(queue_length(), 3)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(drain_queue(batch_size=10), 3)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(queue_length(), 0)
+        self.assertEqual(
+            sorted(ContactMessage.objects.values_list('subject', flat=True)), ['Trip 0', 'Trip 1', 'Trip 2'],
+        )
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].to, [self.staff.email])
+        self.assertEqual(mail.outbox[0].reply_to, ['asha@example.com'])
+
+    def test_failed_notifications_are_retried_without_duplicate_rows(self):
+        self.submit(2)
+        with mock.patch('pages.contact_queue.get_connection', side_effect=ConnectionError):
+            with self.assertRaises(ConnectionError):
+                drain_queue()
+        self.assertEqual(ContactMessage.objects.count(), 2)
+        self.assertEqual(queue_length(), 2)
+
+        # As if the process died before marking the batch as stored
+        spool = sqlite3.connect(settings.CONTACT_QUEUE_PATH)
+        spool.execute('UPDATE submission SET stored = 0')
+        spool.commit()
+        spool.close()
+
+        self.assertEqual(drain_queue(), 2)
+        self.assertEqual(ContactMessage.objects.count(), 2)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(queue_length(), 0)
+
+    def edit_payloads(self, **changes):
+        spool = sqlite3.connect(settings.CONTACT_QUEUE_PATH)
+        for submission_id, payload in spool.execute('SELECT id, payload FROM submission').fetchall():
+            payload = {**json.loads(payload), **changes.get(submission_id, {})}
+            spool.execute('UPDATE submission SET payload = ? WHERE id = ?', (json.dumps(payload), submission_id))
+        spool.commit()
+        spool.close()
+
+    def queued_ids(self):
+        spool = sqlite3.connect(settings.CONTACT_QUEUE_PATH)
+        ids = [row[0] for row in spool.execute('SELECT id FROM submission ORDER BY queued_at')]
+        spool.close()
+        return ids
+
+    def test_messages_of_deleted_users_are_kept(self):
+        self.submit(1)
+        self.members[0].delete()
+        self.assertEqual(drain_queue(), 1)
+        self.assertIsNone(ContactMessage.objects.get().user_id)
+        self.assertEqual(queue_length(), 0)
+
+    def test_submission_time_is_kept(self):
+        self.submit(1)
+        submitted = timezone.now() - timedelta(hours=3)
+        self.edit_payloads(**{self.queued_ids()[0]: {'created_at': submitted.isoformat()}})
+        drain_queue()
+        self.assertEqual(ContactMessage.objects.get().created_at, submitted)
+
+    def test_bad_submissions_are_set_aside(self):
+        self.submit(3)
+        bad = self.queued_ids()[1]
+        self.edit_payloads(**{bad: {'subject': None}})
+
+        with self.assertLogs('pages.contact_queue', 'ERROR'):
+            self.assertEqual(drain_queue(batch_size=10), 3)
+        self.assertEqual(sorted(ContactMessage.objects.values_list('subject', flat=True)), ['Trip 0', 'Trip 2'])
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(queue_length(), 0)
+        [(submission_id, payload, error)] = failed_submissions()
+        self.assertEqual((submission_id, payload['message']), (bad, 'Hello'))
+        self.assertIn('IntegrityError', error)
+
+
+class SessionEngineTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(close_spool)
+        caches = {
+            'default': TEST_CACHE['default'],
+            # File-based like the real one, so the LRU is in play
+            'sessions': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': os.path.join(directory.name, 'sessions'),
+            },
+        }
+        overrides = self.settings(
+            CACHES=caches, SESSION_WRITE_BEHIND=True,
+            SESSION_SPOOL_PATH=os.path.join(directory.name, 'spool.sqlite3'),
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def new_session(self, **data):
+        session = SessionStore()
+        session.update(data)
+        session.create()
+        return session
+
+    def forget(self, session):
+        # As if another worker, with neither the LRU nor the cache entry
+        django_caches['sessions'].clear()
+        session_lru.discard(session.session_key)
+
+    def test_reads_come_from_the_lru_until_the_cache_file_changes(self):
+        session = self.new_session(trip='Goa')
+        with mock.patch.object(FileBasedCache, 'get') as cache_get, self.assertNumQueries(0):
+            self.assertEqual(SessionStore(session.session_key)['trip'], 'Goa')
+        cache_get.assert_not_called()
+
+        # Another worker saving the session writes a new cache file
+        django_caches['sessions'].set(
+            'session:' + session.session_key, (b'{"trip":"Ibiza"}', time.time() + 60), 60,
+        )
+        self.assertEqual(SessionStore(session.session_key)['trip'], 'Ibiza')
+
+    def test_saves_are_batched_by_the_drain(self):
+        first = self.new_session(step=1)
+        for step in (2, 3):
+            first['step'] = step
+            first.save()
+        second = self.new_session(step=1)
+        self.assertFalse(Session.objects.exists())
+        self.assertEqual(queued_sessions(), 2)
+
+        self.assertEqual(drain_sessions(), 2)
+        self.assertEqual(queued_sessions(), 0)
+        self.assertEqual(Session.objects.get(pk=first.session_key).get_decoded(), {'step': 3})
+
+        second.delete()
+        drain_sessions()
+        self.assertEqual(list(Session.objects.values_list('pk', flat=True)), [first.session_key])
+
+    def test_cache_misses_fall_back_to_the_spool_then_the_database(self):
+        session = self.new_session(trip='Goa')
+        self.forget(session)
+        with self.assertNumQueries(0):
+            self.assertEqual(SessionStore(session.session_key)['trip'], 'Goa')
+
+        drain_sessions()
+        self.forget(session)
+        with self.assertNumQueries(1):
+            self.assertEqual(SessionStore(session.session_key)['trip'], 'Goa')
+
+        unknown = SessionStore('x' * 32)
+        self.assertIsNone(unknown.get('trip'))
+        self.assertIsNone(unknown.session_key)
+
+    def test_unchanged_sessions_are_not_saved_again(self):
+        session = self.new_session(trip='Goa')
+        drain_sessions()
+        loaded = SessionStore(session.session_key)
+        loaded['trip'] = 'Goa'  # marks the session modified
+        loaded.save()
+        self.assertEqual(queued_sessions(), 0)
+
+        with self.settings(SESSION_EXPIRY_REFRESH_SECONDS=0):
+            loaded.save()
+        self.assertEqual(queued_sessions(), 1)
+
+    def test_flash_messages_survive_the_redirect_without_session_queries(self):
+        user = User.objects.create_user('member', 'member@example.com', 'pw')
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse('traveler_create'), {
+                'name': 'Asha', 'destination': 'Goa', 'email': 'asha@example.com', 'phone': '9876543210',
+            }, follow=True)
+        self.assertContains(response, 'Traveler added successfully')
+        self.assertFalse(any('django_session' in query['sql'] for query in context.captured_queries))
+
+    def test_expired_sessions_are_purged_in_batches(self):
+        past = timezone.now() - timedelta(days=1)
+        Session.objects.bulk_create([
+            Session(session_key=f'expired{i:05d}', session_data='', expire_date=past) for i in range(5)
+        ])
+        self.assertEqual(purge_expired_sessions(batch_size=2), 2)
+        call_command('drain_sessions', stdout=io.StringIO())
+        self.assertEqual(Session.objects.count(), 0)
+
+
+@override_settings(CACHES=TEST_CACHE, PRERENDER_PAGES=True, PRERENDER_DEBOUNCE_SECONDS=0)
+class PrerenderTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff, _ = seed_dataset(users=1, destinations=3, messages_per_user=0, travelers_per_user=0)
+        cls.destinations = list(Destination.objects.order_by('id'))
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(close_spool)
+        overrides = self.settings(
+            PRERENDER_DIR=os.path.join(directory.name, 'pages'),
+            PRERENDER_QUEUE_PATH=os.path.join(directory.name, 'queue.sqlite3'),
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def detail_url(self, destination):
+        return reverse('destination_detail', args=[destination.id])
+
+    def test_prerendered_pages_are_served_without_queries(self):
+        rebuild_all_pages()
+        for url in (reverse('home'), reverse('about'), reverse('gallery'), self.detail_url(self.destinations[0])):
+            with self.subTest(url=url), self.assertNumQueries(0):
+                response = self.client.get(url)
+            self.assertEqual(response['X-Prerendered'], 'HIT')
+            with open(page_file(url), 'rb') as f:
+                self.assertEqual(response.content, f.read())
+        self.assertContains(response, self.destinations[0].name)
+
+    def test_compressed_copies_and_revalidation(self):
+        rebuild_all_pages()
+        response = self.client.get(reverse('gallery'), HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'Destination 2', gzip.decompress(response.content))
+
+        response = self.client.get(reverse('gallery'), HTTP_IF_NONE_MATCH=response['ETag'], HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 304)
+
+    def test_other_visitors_get_the_live_view(self):
+        rebuild_all_pages()
+        self.assertNotIn('X-Prerendered', self.client.get(reverse('gallery'), {'category': 'beaches'}))
+        self.client.cookies['messages'] = 'pending'
+        self.assertNotIn('X-Prerendered', self.client.get(reverse('home')))
+        del self.client.cookies['messages']
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('home'))
+        self.assertNotIn('X-Prerendered', response)
+        self.assertContains(response, self.staff.username)
+
+    def test_saving_a_destination_rerenders_only_the_pages_showing_it(self):
+        rebuild_all_pages()
+        changed, other = self.destinations[0], self.destinations[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            changed.name = 'Renamed Place'
+            changed.save()
+
+        for url in (reverse('home'), reverse('gallery'), self.detail_url(changed)):
+            self.assertFalse(os.path.exists(page_file(url)))
+        self.assertTrue(os.path.exists(page_file(reverse('about'))))
+        self.assertTrue(os.path.exists(page_file(self.detail_url(other))))
+        response = self.client.get(self.detail_url(changed))
+        self.assertNotIn('X-Prerendered', response)
+        self.assertContains(response, 'Renamed Place')
+
+        self.assertEqual(queued_pages(), 3)
+        self.assertEqual(prerender_queued_pages(), 3)
+        self.assertEqual(queued_pages(), 0)
+        response = self.client.get(self.detail_url(changed))
+        self.assertEqual(response['X-Prerendered'], 'HIT')
+        self.assertContains(response, 'Renamed Place')
+
+    def test_deleted_destination_pages_are_removed(self):
+        rebuild_all_pages()
+        deleted = self.destinations[2]
+        url = self.detail_url(deleted)
+        with self.captureOnCommitCallbacks(execute=True):
+            deleted.delete()
+        prerender_queued_pages()
+        self.assertFalse(os.path.exists(page_file(url)))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertNotContains(self.client.get(reverse('gallery')), deleted.name)
+
+    def test_changes_are_debounced(self):
+        with self.settings(PRERENDER_DEBOUNCE_SECONDS=60, PRERENDER_MAX_DELAY_SECONDS=600):
+            queue_pages([reverse('about')])
+            self.assertEqual(prerender_queued_pages(), 0)
+        with self.settings(PRERENDER_DEBOUNCE_SECONDS=60, PRERENDER_MAX_DELAY_SECONDS=0):
+            # Changes that keep coming still get rendered after the maximum delay
+            self.assertEqual(prerender_queued_pages(), 1)
+        self.assertTrue(os.path.exists(page_file(reverse('about'))))
+
+    def test_page_changed_while_rendering_is_not_left_stale(self):
+        url = self.detail_url(self.destinations[0])
+        queue_pages([url])
+        render = prerender.render_page
+
+        def render_then_change(url):
+            content = render(url)
+            rerender_destination_pages([self.destinations[0].id])
+            return content
+
+        with mock.patch.object(prerender, 'render_page', render_then_change):
+            prerender_queued_pages()
+        self.assertFalse(os.path.exists(page_file(url)))
+        self.assertEqual(queued_pages(), 3)
+
+    def test_bulk_imports_rerender_every_page(self):
+        rebuild_all_pages()
+        with self.captureOnCommitCallbacks(execute=True):
+            import_destinations(iter_rows(io.StringIO(
+                'name,country,description,category,image_url,price_per_day,duration_days,highlights\n'
+                'Hampi,India,Ruins,cities,https://example.com/h.jpg,2000,3,Temples\n'
+            ), 'csv'))
+        self.assertFalse(os.path.exists(page_file(reverse('about'))))
+
+        prerender_queued_pages()
+        hampi = Destination.objects.get(name='Hampi')
+        self.assertTrue(os.path.exists(page_file(self.detail_url(hampi))))
+        self.assertTrue(os.path.exists(page_file(reverse('about'))))
+
+
+@override_settings(CACHES=TEST_CACHE, API_PAGE_SIZE=7)
+class ApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_dataset(users=0, destinations=40, messages_per_user=0, travelers_per_user=0)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_through_filtered_destinations(self):
+        query = {'category': 'beaches', 'min_price': '1005', 'max_price': '1039', 'fields': 'name,price_per_day'}
+        seen = []
+        cursor = ''
+        while True:
+            response = self.client.get(reverse('api_destination_list'), {**query, 'cursor': cursor})
+            self.assertEqual(response['Content-Type'], 'application/json')
+            data = response.json()
+            seen += data['results']
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        expected = Destination.objects.filter(
+            category='beaches', price_per_day__gte=1005, price_per_day__lte=1039,
+        ).order_by('-created_at', '-id')
+        self.assertEqual(seen, [{'name': d.name, 'price_per_day': f'{d.price_per_day:.2f}'} for d in expected])
+
+    def test_cached_and_not_modified(self):
+        url = reverse('api_destination_list')
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()['results']), 7)
+        self.assertFalse(response['ETag'].startswith('W/'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).content, response.content)
+            self.assertEqual(self.client.get(url, headers={'If-None-Match': response['ETag']}).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Destination.objects.first().save()
+        changed = self.client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    def test_detail(self):
+        destination = Destination.objects.first()
+        response = self.client.get(reverse('api_destination_detail', args=[destination.id]), {'fields': 'id,country'})
+        self.assertEqual(response.json(), {'id': destination.id, 'country': destination.country})
+        self.assertEqual(len(self.client.get(reverse('api_destination_detail', args=[destination.id])).json()), 12)
+        self.assertEqual(self.client.get(reverse('api_destination_detail', args=[0])).status_code, 404)
+
+    def test_bad_parameters(self):
+        url = reverse('api_destination_list')
+        for query in ['fields=name,owner', 'category=moon', 'min_price=cheap', 'max_price=NaN', 'limit=0', 'limit=999',
+                      'limit=²', 'limit=٣']:
+            response = self.client.get(url, dict([query.split('=')]))
+            self.assertEqual(response.status_code, 400, query)
+            self.assertIn('error', response.json())
+            self.assertNotIn('ETag', response)
+        self.assertEqual(self.client.post(url).status_code, 405)
+
+    def test_not_found_has_no_validator(self):
+        response = self.client.get(reverse('api_destination_detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response)
+
+
+@override_settings(CACHES=TEST_CACHE, GALLERY_PAGE_SIZE=5)
+class FacetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Prices 1000-1039 are all "budget", so spread some into other bands
+        seed_dataset(users=0, destinations=40, messages_per_user=0, travelers_per_user=0)
+        Destination.objects.filter(id__in=Destination.objects.order_by('id').values('id')[:10]).update(price_per_day=12000)
+
+    def setUp(self):
+        cache.clear()
+
+    def counts(self, response):
+        return {
+            facet: {option['label']: option['count'] for option in options}
+            for facet, options in response.context['facets'].items()
+        }
+
+    def test_counts_follow_the_other_filters(self):
+        response = self.client.get(reverse('gallery'), {'category': 'beaches', 'duration': 'short'})
+        counts = self.counts(response)
+        short = Destination.objects.filter(duration_days__lt=4)
+        self.assertEqual(counts['category']['All'], short.count())
+        self.assertEqual(counts['category']['⛰️ Mountains'], short.filter(category='mountains').count())
+        beaches = Destination.objects.filter(category='beaches')
+        self.assertEqual(counts['duration']['Any length'], beaches.count())
+        self.assertEqual(counts['duration']['8+ days'], beaches.filter(duration_days__gte=8).count())
+        self.assertEqual(
+            counts['price']['₹10,000 – 20,000'],
+            beaches.filter(duration_days__lt=4, price_per_day__gte=10000, price_per_day__lt=20000).count(),
+        )
+
+        expected = beaches.filter(duration_days__lt=4).count()
+        shown = len(response.context['destinations'])
+        self.assertEqual(shown, min(expected, 5))
+        self.assertEqual(counts['category']['🏖️ Beaches'], expected)
+
+    def test_next_page_keeps_the_filters(self):
+        response = self.client.get(reverse('gallery'), {'price': 'budget'})
+        self.assertContains(response, 'data-next="/gallery/page/?category=all&amp;price=budget&amp;duration=all&cursor=')
+        cursor = response.context['destinations'].next_cursor
+        response = self.client.get(reverse('gallery_page'), {'price': 'budget', 'cursor': cursor})
+        self.assertTrue(all(destination.price_per_day < 3000 for destination in response.context['destinations']))
+
+    def test_counts_are_cached_until_a_destination_changes(self):
+        filters = {'category': 'all', 'price': 'all', 'duration': 'all'}
+        with self.assertNumQueries(1):
+            facet_counts(filters)
+        with self.assertNumQueries(0):
+            self.assertEqual(facet_counts(filters)['price_premium'], 10)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Destination.objects.filter(price_per_day=12000).first().delete()
+        self.assertEqual(facet_counts(filters)['price_premium'], 9)
+
+
+@override_settings(CACHES=TEST_CACHE)
+class HighlightTests(TestCase):
+
+    def create(self, name, highlights):
+        return Destination.objects.create(
+            name=name, country='Spain', description='Sunny', category='beaches',
+            image_url='https://example.com/a.jpg', price_per_day=100, duration_days=5, highlights=highlights,
+        )
+
+    def slugs(self, destination):
+        return sorted(destination.highlight_tags.values_list('slug', flat=True))
+
+    def test_saving_links_normalised_highlights(self):
+        destination = self.create('Ibiza', 'Beach,  Old   Town\nbeach, ')
+        self.assertEqual(self.slugs(destination), ['beach', 'old-town'])
+        self.assertEqual(Highlight.objects.get(slug='old-town').name, 'Old Town')
+
+        destination.highlights = 'Beach, Nightlife'
+        destination.save()
+        self.assertEqual(self.slugs(destination), ['beach', 'nightlife'])
+        # Old Town is no longer listed anywhere
+        self.assertEqual(sorted(Highlight.objects.values_list('slug', flat=True)), ['beach', 'nightlife'])
+
+    def test_unused_highlights_are_deleted(self):
+        ibiza = self.create('Ibiza', 'Beach, Clubs')
+        majorca = self.create('Majorca', 'Beach, Caves')
+        ibiza.delete()
+        self.assertEqual(sorted(Highlight.objects.values_list('slug', flat=True)), ['beach', 'caves'])
+        self.assertEqual(self.client.get(reverse('highlight_detail', args=['clubs'])).status_code, 404)
+
+        majorca.highlights = 'Caves'
+        majorca.save()
+        self.assertEqual(list(Highlight.objects.values_list('slug', flat=True)), ['caves'])
+
+    def test_imports_link_highlights(self):
+        rows = [
+            (1, {'name': 'Ibiza', 'country': 'Spain', 'description': 'Sunny', 'category': 'beaches',
+                 'image_url': 'https://example.com/a.jpg', 'price_per_day': '100', 'duration_days': '5',
+                 'highlights': ['Beach', 'Clubs']}),
+        ]
+        import_destinations(rows)
+        self.assertEqual(self.slugs(Destination.objects.get(name='Ibiza')), ['beach', 'clubs'])
+
+    def test_backfill_migration(self):
+        Destination.objects.bulk_create([
+            Destination(name=f'Place {i}', country='Spain', description='Sunny', category='beaches',
+                        image_url='https://example.com/a.jpg', price_per_day=100, duration_days=5,
+                        highlights=f'Beach, Spot {i % 3}')
+            for i in range(5)
+        ])
+        self.assertFalse(Highlight.objects.exists())
+
+        migration = importlib.import_module('pages.migrations.0012_backfill_highlights')
+        with mock.patch.object(migration, 'BATCH_SIZE', 2):
+            migration.backfill_highlights(django_apps, mock.Mock(connection=connection))
+        self.assertEqual(Highlight.objects.count(), 4)
+        self.assertEqual(Highlight.objects.get(slug='beach').destinations.count(), 5)
+        self.assertEqual(Highlight.objects.get(slug='spot-1').destinations.count(), 2)
+
+    def test_listing_and_detail_links(self):
+        ibiza = self.create('Ibiza', 'Beach, Clubs')
+        self.create('Zermatt', 'Skiing')
+        response = self.client.get(reverse('highlight_detail', args=['beach']))
+        self.assertEqual([destination.name for destination in response.context['destinations']], ['Ibiza'])
+        self.assertEqual(self.client.get(reverse('highlight_detail', args=['nothing'])).status_code, 404)
+
+        response = self.client.get(reverse('destination_detail', args=[ibiza.id]))
+        self.assertContains(response, 'href="/highlights/clubs/"')
+
+
+@override_settings(CACHES=TEST_CACHE)
+class PopularityTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('member', 'member@example.com', 'pw')
+        cls.goa = cls.create_destination('Goa', 'India')
+        cls.paris = cls.create_destination('Paris', 'France')
+        cls.paris_texas = cls.create_destination('Paris', 'USA')
+
+    def setUp(self):
+        cache.clear()
+
+    @staticmethod
+    def create_destination(name, country):
+        return Destination.objects.create(
+            name=name, country=country, description='Nice', category='cities',
+            image_url='https://example.com/a.jpg', price_per_day=100, duration_days=5,
+        )
+
+    def traveler(self, destination):
+        return Traveler.objects.create(
+            user=self.user, name='Asha', destination=destination, email='asha@example.com', phone='1',
+        )
+
+    def counts(self):
+        return dict(DestinationPopularity.objects.values_list('destination_id', 'traveler_count'))
+
+    def test_match_needs_a_single_destination(self):
+        matches = match_destinations(['  goa ', 'Paris', 'paris, usa', 'Atlantis', ''])
+        self.assertEqual(matches, {'  goa ': self.goa.id, 'paris, usa': self.paris_texas.id})
+
+    def test_match_names_with_non_ascii_capitals(self):
+        ile = self.create_destination('Île-de-France', 'France')
+        urgup = self.create_destination('Ürgüp', 'Türkiye')
+        matches = match_destinations(['ÎLE-DE-FRANCE', 'Ürgüp, Türkiye'])
+        self.assertEqual(matches, {'ÎLE-DE-FRANCE': ile.id, 'Ürgüp, Türkiye': urgup.id})
+
+        self.traveler('Ürgüp')
+        self.assertEqual(self.counts(), {urgup.id: 1})
+
+    def test_saves_and_deletes_keep_counts(self):
+        traveler = self.traveler('GOA')
+        self.assertEqual(traveler.linked_destination, self.goa)
+        self.assertEqual(self.counts(), {self.goa.id: 1})
+
+        traveler.destination = 'Paris, France'
+        traveler.save()
+        self.assertEqual(self.counts(), {self.goa.id: 0, self.paris.id: 1})
+
+        # Unchanged text keeps a link set by hand
+        traveler.linked_destination = self.paris_texas
+        traveler.save()
+        self.assertEqual(self.counts(), {self.goa.id: 0, self.paris.id: 0, self.paris_texas.id: 1})
+
+        traveler.delete()
+        self.assertEqual(self.counts(), {self.goa.id: 0, self.paris.id: 0, self.paris_texas.id: 0})
+
+    def test_counter_changes_refresh_the_home_page(self):
+        first = self.client.get(reverse('home'))
+        self.assertEqual(first['X-Page-Cache'], 'MISS')
+
+        # A second later, so Last-Modified moves past its one-second resolution
+        later = time.time_ns() + 2 * 10**9
+        with mock.patch('pages.cache.time.time_ns', return_value=later), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.traveler('Goa')
+
+        response = self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        response = self.client.get(reverse('home'), HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_backfill_is_batched_and_resumable(self):
+        Traveler.objects.bulk_create([
+            Traveler(user=self.user, name=f'T{i}', destination=text, email='t@example.com', phone='1')
+            for i, text in enumerate(['Goa', 'Goa', 'Paris', 'Paris, France', 'Goa, India'])
+        ])
+        self.assertEqual(self.counts(), {})
+
+        first = Traveler.objects.order_by('id').values_list('id', flat=True)[1]
+        cache.set('backfill_traveler_destinations:last_id', first)
+        output = io.StringIO()
+        call_command('backfill_traveler_destinations', batch_size=2, stdout=output)
+        self.assertIn('Linked 2 travelers', output.getvalue())
+        self.assertEqual(self.counts(), {self.goa.id: 1, self.paris.id: 1})
+
+        call_command('backfill_traveler_destinations', batch_size=2, restart=True, stdout=output)
+        self.assertEqual(self.counts(), {self.goa.id: 3, self.paris.id: 1})
+        self.assertIsNone(cache.get('backfill_traveler_destinations:last_id'))
+
+        DestinationPopularity.objects.update(traveler_count=99)
+        recount_popularity()
+        self.assertEqual(self.counts(), {self.goa.id: 3, self.paris.id: 1})
+
+    def test_home_lists_most_booked(self):
+        for _ in range(2):
+            self.traveler('Paris, France')
+        self.traveler('Goa')
+        self.assertEqual([d.name for d in popular_destinations(5)], ['Paris', 'Goa'])
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Most Booked')
+        self.assertContains(response, '2 travelers')
+
+
+@override_settings(CACHES=TEST_CACHE)
+class RollupTests(TestCase):
+
+    def setUp(self):
+        self.member = User.objects.create_user('member', 'member@example.com', 'pw')
+        self.staff = User.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True)
+
+    def today(self):
+        return DailyStats.objects.get(day=timezone.localdate())
+
+    def assertMatchesRebuild(self):
+        incremental = list(DailyStats.objects.order_by('day').values())
+        rebuild_rollups()
+        self.assertEqual(list(DailyStats.objects.order_by('day').values()), incremental)
+
+    def test_signals_keep_daily_counts(self):
+        self.client.force_login(self.member)
+        self.client.post(reverse('traveler_create'), {
+            'name': 'Asha', 'destination': 'Goa', 'email': 'asha@example.com', 'phone': '9876543210',
+        })
+        message = ContactMessage.objects.create(
+            user=self.member, name='Asha', email='asha@example.com', subject='Hi', message='Hello',
+        )
+        ContactMessage.objects.create(
+            user=self.member, name='Asha', email='asha@example.com', subject='Again', message='Hello',
+        )
+        today = self.today()
+        self.assertEqual(
+            (today.registrations, today.messages, today.unread_messages, today.travelers),
+            (2, 2, 2, 1),
+        )
+
+        self.client.get(reverse('message_detail', args=[message.id]))
+        self.assertEqual((self.today().messages, self.today().read_messages), (2, 1))
+        self.assertMatchesRebuild()
+
+        ContactMessage.objects.get(id=message.id).delete()
+        Traveler.objects.get().delete()
+        today = self.today()
+        self.assertEqual((today.messages, today.unread_messages, today.travelers), (1, 1, 0))
+        self.assertMatchesRebuild()
+
+    def test_rollup_rolls_back_with_the_write(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            User.objects.create_user('ghost', 'ghost@example.com', 'pw')
+            raise RuntimeError
+        self.assertEqual(self.today().registrations, 2)
+
+    def test_bulk_writes_add_their_own_counts(self):
+        import_destinations([
+            (1, {'name': 'Ibiza', 'country': 'Spain', 'description': 'Sunny', 'category': 'beaches',
+                 'image_url': 'https://example.com/a.jpg', 'price_per_day': '100', 'duration_days': '5',
+                 'highlights': ['Beach']}),
+        ])
+        store_messages([(str(uuid.uuid4()), {
+            'user_id': self.member.id, 'name': 'Asha', 'email': 'asha@example.com', 'phone': '',
+            'subject': 'Hi', 'message': 'Hello', 'created_at': '2026-01-02T10:00:00+00:00',
+        })])
+        self.assertEqual(self.today().destinations, 1)
+        january = DailyStats.objects.get(day='2026-01-02')
+        self.assertEqual((january.messages, january.unread_messages), (1, 1))
+        self.assertMatchesRebuild()
+
+    def test_rebuild_command_and_dashboard(self):
+        DailyStats.objects.all().delete()
+        output = io.StringIO()
+        call_command('rebuild_rollups', stdout=output)
+        self.assertIn('Rollups rebuilt for 1 days', output.getvalue())
+
+        recent, totals = dashboard_stats(7)
+        self.assertEqual([row.day for row in recent][-1], timezone.localdate())
+        self.assertEqual(len(recent), 7)
+        self.assertEqual(totals['registrations'], 2)
+
+        self.client.force_login(self.member)
+        self.assertEqual(self.client.get(reverse('dashboard')).status_code, 302)
+        self.client.force_login(self.staff)
+        self.assertContains(self.client.get(reverse('dashboard')), 'Site Activity')
+
+
+@override_settings(CACHES=TEST_CACHE, ADMIN_EXACT_COUNT_LIMIT=50)
+class AdminTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_dataset()
+        cls.admin = User.objects.create_superuser('root', 'root@example.com', 'pw')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def changelist(self, model, query=''):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse(f'admin:pages_{model}_changelist') + query)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in context.captured_queries]
+
+    def test_changelists_run_a_fixed_number_of_queries(self):
+        # user, capped count, planner estimate (only past the limit), one
+        # page of rows with the user joined in, and for destinations the
+        # country choices on a cold cache
+        for model, num_queries in (('traveler', 4), ('userprofile', 3), ('contactmessage', 4), ('destination', 5)):
+            _, queries = self.changelist(model)
+            self.assertEqual(len(queries), num_queries, model)
+
+    def test_counts_are_estimated_past_the_limit(self):
+        Traveler.objects.bulk_create([
+            Traveler(user=self.admin, name='Late', destination='Nowhere', email='late@example.com', phone='1')
+            for _ in range(10)
+        ])
+        # The last ANALYZE (in seed_dataset) saw 150 travelers
+        response, _ = self.changelist('traveler')
+        self.assertEqual(response.context['cl'].result_count, 150)
+        self.assertContains(response, 'about 150 travelers')
+        self.assertContains(response, 'Select all about 150 travelers')
+        response, _ = self.changelist('traveler', '?linked=yes')
+        self.assertEqual(response.context['cl'].result_count, 51)
+        self.assertContains(response, 'more than 50 travelers')
+        response, _ = self.changelist('traveler', '?q=Late')
+        self.assertEqual(response.context['cl'].result_count, 10)
+        self.assertContains(response, '10 results')
+
+        call_command('analyze_database', stdout=io.StringIO())
+        response, _ = self.changelist('traveler')
+        self.assertContains(response, 'about 160 travelers')
+
+        # Never analysed: a lower bound, not a made-up total
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM sqlite_stat1')
+        response, _ = self.changelist('traveler')
+        self.assertContains(response, 'more than 50 travelers')
+        self.assertNotContains(response, '51 travelers')
+
+    def test_country_choices_are_cached_per_destinations_version(self):
+        response, queries = self.changelist('destination')
+        self.assertContains(response, '?country=Country+7')
+        self.assertTrue(any('DISTINCT' in sql for sql in queries))
+        _, queries = self.changelist('destination')
+        self.assertFalse(any('DISTINCT' in sql for sql in queries))
+
+        bump_destinations_version()
+        _, queries = self.changelist('destination')
+        self.assertTrue(any('DISTINCT' in sql for sql in queries))
+
+    def test_search_uses_the_full_text_index(self):
+        response, queries = self.changelist('destination', '?q=Destination 42')
+        self.assertIn('Destination 42', [d.name for d in response.context['cl'].result_list])
+        self.assertTrue(any('MATCH' in sql for sql in queries))
+
+    def test_search_keeps_every_hit_in_search_fields_only(self):
+        # The queryset, as the displayed count is estimated past 50 rows
+        response, _ = self.changelist('destination', '?q=Destination')
+        self.assertEqual(response.context['cl'].queryset.count(), 300)
+        # Every description says "lovely", but description is not searched
+        response, _ = self.changelist('destination', '?q=lovely')
+        self.assertEqual(response.context['cl'].queryset.count(), 0)
+        response, _ = self.changelist('destination', '?q=Destination 42')
+        self.assertEqual(response.context['cl'].queryset.count(), 1)
+
+    def test_bulk_actions(self):
+        destinations = list(Destination.objects.filter(is_featured=False).values_list('id', flat=True)[:3])
+        version = get_destinations_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin:pages_destination_changelist'), {
+                'action': 'mark_as_featured', '_selected_action': destinations,
+            })
+        self.assertEqual(Destination.objects.filter(id__in=destinations, is_featured=True).count(), 3)
+        self.assertNotEqual(get_destinations_version(), version)
+
+    def test_featuring_changes_the_page_validators(self):
+        self.client.logout()
+        first = self.client.get(reverse('home'))
+        destination = Destination.objects.filter(is_featured=False).first()
+        self.client.force_login(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin:pages_destination_changelist'), {
+                'action': 'mark_as_featured', '_selected_action': [destination.id],
+            })
+        self.client.logout()
+        response = self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+        rebuild_rollups()
+        unread = ContactMessage.objects.filter(is_read=False)
+        self.client.post(reverse('admin:pages_contactmessage_changelist'), {
+            'action': 'mark_as_read', '_selected_action': list(unread.values_list('id', flat=True)[:5]),
+        })
+        self.assertEqual(
+            sum(DailyStats.objects.values_list('unread_messages', flat=True)), unread.count(),
+        )
+
+
+@override_settings(CACHES=TEST_CACHE)
+class DestinationImportTests(TestCase):
+    HEADER = 'name,country,description,category,image_url,price_per_day,duration_days,highlights,is_featured\n'
+
+    def run_import(self, text, **kwargs):
+        return import_destinations(iter_rows(io.StringIO(text), 'csv'), batch_size=2, **kwargs)
+
+    def row(self, name, category='beaches', description='Sunny', featured='no'):
+        return f'{name},Spain,{description},{category},https://example.com/{name}.jpg,100,5,"Sand, Sea",{featured}\n'
+
+    def test_bad_rows_do_not_abort_the_batch(self):
+        result = self.run_import(
+            self.HEADER + self.row('Ibiza') + self.row('Nowhere', category='moon') + self.row('Mallorca', featured='yes')
+        )
+        self.assertEqual((result.created, result.failed), (2, 1))
+        self.assertEqual(result.errors[0][0], 3)
+        self.assertTrue(Destination.objects.get(name='Mallorca').is_featured)
+        self.assertFalse(Destination.objects.get(name='Ibiza').is_featured)
+
+    def test_upsert_updates_by_name_and_country(self):
+        self.run_import(self.HEADER + self.row('Ibiza'))
+        result = self.run_import(self.HEADER + self.row('Ibiza', description='Party') + self.row('Menorca'), upsert=True)
+        self.assertEqual((result.created, result.updated), (1, 1))
+        self.assertEqual(Destination.objects.filter(name='Ibiza').get().description, 'Party')
+
+    def test_upsert_keeps_the_last_row_for_an_existing_place(self):
+        self.run_import(self.HEADER + self.row('Ibiza'))
+        result = self.run_import(
+            self.HEADER + self.row('Ibiza', description='First') + self.row('Ibiza', description='Last'), upsert=True,
+        )
+        self.assertEqual((result.created, result.updated), (0, 2))
+        self.assertEqual(Destination.objects.filter(name='Ibiza').get().description, 'Last')
+
+
+@override_settings(CACHES=TEST_CACHE)
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff, cls.members = seed_dataset(users=2, destinations=0, messages_per_user=10, travelers_per_user=5)
+
+    def test_streams_filtered_messages(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('message_export') + '?format=jsonl&status=unread')
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), ContactMessage.objects.filter(is_read=False).count())
+        self.assertIn('"is_read": false', lines[0])
+
+    def test_csv_cells_never_start_a_formula(self):
+        ContactMessage.objects.create(
+            user=self.members[0], name='=HYPERLINK("http://evil.example")', email='a@example.com',
+            phone='+911234567890', subject='@SUM(A1)', message='-2+3',
+        )
+        rows = list(csv.reader(stream_export('messages', 'csv')))
+        row = dict(zip(rows[0], rows[-1]))
+        self.assertEqual(row['name'], '\'=HYPERLINK("http://evil.example")')
+        self.assertEqual(row['phone'], "'+911234567890")
+        self.assertEqual(row['subject'], "'@SUM(A1)")
+        self.assertEqual(row['message'], "'-2+3")
+        self.assertEqual(row['email'], 'a@example.com')
+
+    def test_export_is_staff_only(self):
+        self.client.force_login(self.members[0])
+        response = self.client.get(reverse('traveler_export'))
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(CACHES=TEST_CACHE, THUMBNAIL_WORKERS=0)
+class ThumbnailTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff, cls.members = seed_dataset(users=2, destinations=0, messages_per_user=0, travelers_per_user=0)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media = self.settings(MEDIA_ROOT=directory.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def photo(self, size=(2000, 1000), color='red'):
+        exif = Image.Exif()
+        exif[0x010F] = 'Secret Camera'
+        buffer = io.BytesIO()
+        Image.new('RGB', size, color).save(buffer, 'JPEG', exif=exif)
+        return ContentFile(buffer.getvalue())
+
+    def upload(self, user, name, **kwargs):
+        return self.upload_to(user.userprofile, name, **kwargs)
+
+    def upload_to(self, profile, name, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.profile_picture.save(name, self.photo(**kwargs))
+        return profile
+
+    def test_derivatives_are_resized_and_stripped(self):
+        profile = self.upload(self.members[0], 'beach.jpg')
+        name = profile.profile_picture.name
+        expected = {'avatar': (80, 80), 'card': (320, 320), 'full': (1280, 640)}
+        for size, dimensions in expected.items():
+            for extension in THUMBNAIL_FORMATS:
+                with default_storage.open(thumbnail_name(name, size, extension)) as f:
+                    image = Image.open(f)
+                    self.assertEqual(image.size, dimensions)
+                    self.assertNotIn(0x010F, image.getexif())
+        self.assertTrue(profile.avatar_url.endswith('/thumbs/beach.jpg/avatar.jpg'))
+
+    def test_existing_derivatives_are_not_generated_again(self):
+        profile = self.upload(self.members[0], 'beach.jpg')
+        with mock.patch('pages.thumbnails.generate_thumbnails') as generate:
+            with self.captureOnCommitCallbacks(execute=True):
+                profile.phone = '12345'
+                profile.save()
+        generate.assert_not_called()
+
+    def test_generating_again_overwrites_in_place(self):
+        name = self.upload(self.members[0], 'beach.jpg').profile_picture.name
+        with default_storage.open(name, 'wb') as f:
+            f.write(self.photo(color='blue').read())
+        generate_thumbnails(name)
+
+        directory = posixpath.dirname(thumbnail_name(name, 'full', 'jpg'))
+        _, files = default_storage.listdir(directory)
+        self.assertEqual(len(files), len(THUMBNAIL_SIZES) * len(THUMBNAIL_FORMATS))
+        with default_storage.open(thumbnail_name(name, 'avatar', 'jpg')) as f:
+            red, green, blue = Image.open(f).convert('RGB').getpixel((40, 40))
+        self.assertGreater(blue, red)
+
+    def test_uploads_never_share_derivatives(self):
+        first = self.upload(self.members[0], 'beach_full.jpg', color='red')
+        second = self.upload(self.members[1], 'beach.jpg', color='blue')
+
+        self.assertTrue(default_storage.exists(first.profile_picture.name))
+        self.assertNotEqual(first.picture_url('full'), second.picture_url('full'))
+        with default_storage.open(thumbnail_name(second.profile_picture.name, 'full', 'jpg')) as f:
+            red, green, blue = Image.open(f).convert('RGB').getpixel((0, 0))
+        self.assertGreater(blue, red)
+
+
+    def test_replaced_and_deleted_pictures_lose_their_derivatives(self):
+        profile = self.upload(self.members[0], 'beach.jpg')
+        old = profile.profile_picture.name
+        profile = UserProfile.objects.get(id=profile.id)
+        self.upload_to(profile, 'mountain.jpg')
+        new = profile.profile_picture.name
+
+        self.assertFalse(default_storage.exists(posixpath.dirname(thumbnail_name(old, 'full', 'jpg'))))
+        self.assertTrue(default_storage.exists(thumbnail_name(new, 'full', 'jpg')))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.delete()
+        for size in THUMBNAIL_SIZES:
+            for extension in THUMBNAIL_FORMATS:
+                self.assertFalse(default_storage.exists(thumbnail_name(new, size, extension)))
+
+    def test_transparent_areas_turn_white(self):
+        buffer = io.BytesIO()
+        image = Image.new('RGBA', (200, 200), (0, 0, 0, 0))
+        image.paste((255, 0, 0, 255), (50, 50, 150, 150))
+        image.save(buffer, 'PNG')
+        profile = self.members[0].userprofile
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.profile_picture.save('logo.png', ContentFile(buffer.getvalue()))
+
+        for extension in THUMBNAIL_FORMATS:
+            with default_storage.open(thumbnail_name(profile.profile_picture.name, 'card', extension)) as f:
+                thumbnail = Image.open(f).convert('RGB')
+                corner, middle = thumbnail.getpixel((2, 2)), thumbnail.getpixel((160, 160))
+            self.assertTrue(all(channel > 240 for channel in corner), corner)
+            self.assertGreater(middle[0], 200)
+            self.assertLess(middle[1], 60)
+
+class StaticAssetTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = tempfile.TemporaryDirectory()
+        cls.enterClassContext(cls.static_root)
+        cls.enterClassContext(override_settings(STATIC_ROOT=cls.static_root.name))
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(cls.static_root.name, 'staticfiles.json')) as f:
+            cls.base_css = json.load(f)['paths']['css/base.css']
+        cls.middleware = StaticFilesMiddleware(lambda request: HttpResponse('app'))
+
+    def get(self, path, **headers):
+        return self.middleware(RequestFactory().get(path, headers=headers))
+
+    def test_hashed_file_is_immutable_and_precompressed(self):
+        response = self.get('/static/' + self.base_css, accept_encoding='gzip, deflate')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        with open(os.path.join(self.static_root.name, self.base_css), 'rb') as f:
+            self.assertEqual(gzip.decompress(response.content), f.read())
+
+    def test_unhashed_file_and_revalidation(self):
+        response = self.get('/static/css/base.css', accept_encoding='gzip;q=0')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        response = self.get('/static/css/base.css', if_none_match=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_other_paths_reach_the_app(self):
+        self.assertEqual(self.get('/static/missing.css').content, b'app')
+        self.assertEqual(self.get('/about/').content, b'app')
+
+    def test_pages_link_assets_instead_of_inlining(self):
+        with override_settings(DEBUG=False):
+            response = self.client.get('/about/')
+        self.assertContains(response, '/static/' + self.base_css)
+        self.assertNotContains(response, '<style>')
+        self.assertNotContains(response, 'googleapis')
+
+
+@override_settings(CACHES=TEST_CACHE)
+class MetricsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff, cls.members = seed_dataset(users=1, destinations=30, messages_per_user=0, travelers_per_user=0)
+
+    def setUp(self):
+        cache.clear()
+        metrics_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(metrics_dir.cleanup)
+        self.enterContext(self.settings(METRICS_DIR=metrics_dir.name))
+        self.metrics_dir = metrics_dir.name
+
+    def view_totals(self, view):
+        return registry.snapshot().get(view, {'requests': {}, 'sql_queries': 0, 'response_bytes': 0})
+
+    def test_records_per_view(self):
+        before = self.view_totals('gallery')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/gallery/')
+        after = self.view_totals('gallery')
+
+        self.assertEqual(after['requests']['200'], before['requests'].get('200', 0) + 1)
+        self.assertEqual(after['sql_queries'] - before['sql_queries'], len(queries))
+        self.assertEqual(after['response_bytes'] - before['response_bytes'], len(response.content))
+        self.assertGreater(after['template_seconds'], 0)
+
+    def test_endpoint_merges_worker_files(self):
+        other_worker = {'about': {
+            'requests': {'200': 1000}, 'buckets': [1000] + [0] * 10, 'latency_sum': 1.5,
+            'latency_count': 1000, 'sql_queries': 0, 'sql_seconds': 0, 'template_seconds': 2,
+            'response_bytes': 5000,
+        }}
+        with open(os.path.join(self.metrics_dir, 'other.json'), 'w') as f:
+            json.dump(other_worker, f)
+        local = self.view_totals('about')['requests'].get('200', 0)
+
+        self.client.force_login(self.staff)
+        response = self.client.get('/metrics')
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertContains(response, f'pages_requests_total{{view="about",status="200"}} {1000 + local}\n')
+        self.assertContains(response, '# TYPE pages_request_duration_seconds histogram')
+        self.assertContains(response, 'pages_request_duration_seconds_bucket{view="about",le="0.005"}')
+
+    def test_files_of_exited_workers_are_folded(self):
+        def worker_file(pid, requests):
+            filename = f'{pid}-{uuid.uuid4().hex[:8]}.json'
+            with open(os.path.join(self.metrics_dir, filename), 'w') as f:
+                json.dump({'contact': {
+                    'requests': {'200': requests}, 'buckets': [requests] + [0] * 10, 'latency_sum': 1.0,
+                    'latency_count': requests, 'sql_queries': 0, 'sql_seconds': 0, 'template_seconds': 0,
+                    'response_bytes': 0,
+                }}, f)
+            return filename
+
+        def exited_pid():
+            process = subprocess.Popen([sys.executable, '-c', ''])
+            process.wait()
+            return process.pid
+
+        local = self.view_totals('contact')['requests'].get('200', 0)
+        live = worker_file(os.getppid(), 1)
+        dead = worker_file(exited_pid(), 10)
+        self.assertEqual(registry.collect()['contact']['requests']['200'], local + 11)
+        self.assertEqual(registry.collect()['contact']['requests']['200'], local + 11)
+
+        worker_file(exited_pid(), 100)
+        self.assertEqual(registry.collect()['contact']['requests']['200'], local + 111)
+        names = set(os.listdir(self.metrics_dir))
+        self.assertIn(live, names)
+        self.assertNotIn(dead, names)
+        self.assertEqual(
+            {name for name in names if name.endswith('.json')},
+            {live, f'{registry.process_id}.json', 'dead-processes.json'},
+        )
+
+    def test_endpoint_is_staff_only(self):
+        self.client.force_login(self.members[0])
+        self.assertEqual(self.client.get('/metrics').status_code, 302)
+
+
+@override_settings(CACHES=TEST_CACHE, METRICS_DIR=None)
+class BenchmarkSuiteTests(TestCase):
+
+    def test_every_route_answers_every_role(self):
+        staff, member = seed_benchmark_data(50)
+        results = benchmark_routes(staff, member, iterations=1, warmup=0)
+
+        named = {pattern.name for pattern in project_urls.urlpatterns if getattr(pattern, 'name', None)}
+        self.assertEqual({key.split()[0] for key in results}, named - {'logout'})
+        errors = [key for key, stats in results.items() if stats['status'] >= 500]
+        self.assertEqual(errors, [])
+
+    def test_regressions_respect_thresholds(self):
+        def stats(p95_ms, queries=3):
+            return {'p95_ms': p95_ms, 'queries': queries}
+
+        baseline = {'home anonymous': stats(10), 'search staff': stats(10), 'about member': stats(1)}
+        current = {'home anonymous': stats(14), 'search staff': stats(14), 'about member': stats(1.5, queries=4)}
+        regressions = find_regressions(baseline, current, {'default': 0.25, 'search': 0.5}, min_delta_ms=2)
+
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('about member: 4 queries'))
+        self.assertTrue(regressions[1].startswith('home anonymous: p95 14.0 ms'))
+
+
+
+class BenchmarkCommandTests(TransactionTestCase):
+    # The command creates its own test database, which cannot happen inside
+    # the transaction a TestCase wraps around each test
+
+    def test_command_runs(self):
+        out = io.StringIO()
+        # The command sets up its own test environment
+        teardown_test_environment()
+        try:
+            call_command('bench_routes', iterations=1, warmup=0, stdout=out)
+        finally:
+            setup_test_environment()
+        self.assertIn('seeded 1000 rows per table', out.getvalue())
+        self.assertRegex(out.getvalue(), r'home staff +200 ')
+
+
+class ReversedPool:
+    # Stands in for multiprocessing.Pool (the in-memory test database is not
+    # shared with child processes) and writes the chunks last one first
+    def __init__(self, workers, initializer, initargs):
+        initializer(*initargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def imap_unordered(self, func, tasks):
+        return map(func, reversed(list(tasks)))
+
+
+class SeedDataTests(TestCase):
+
+    def seed(self, prefix, **options):
+        options = {'users': 40, 'destinations': 50, 'travelers': 2000, 'messages': 2000, **options}
+        return seed_database(batch_size=500, prefix=prefix, **options)
+
+    def test_workers_give_the_same_data(self):
+        with mock.patch('pages.seeding.SEED_CHUNK_SIZE', 3000 // 7):
+            one = self.seed('a', users=3000)
+            with mock.patch('pages.seeding.multiprocessing.Pool', ReversedPool):
+                two = self.seed('b', users=3000, workers=2)
+
+        for (staff_ids, member_ids), prefix in ((one, 'a'), (two, 'b')):
+            self.assertEqual(len(staff_ids), 3)
+            self.assertEqual(User.objects.filter(id__in=staff_ids, is_staff=True).count(), 3)
+            self.assertFalse(Destination.objects.filter(created_by__username__startswith=prefix, created_by__is_staff=False))
+        # Members in the same order of activity, by username rather than id
+        self.assertEqual(
+            [User.objects.get(id=user_id).username[1:] for user_id in one[1][:20]],
+            [User.objects.get(id=user_id).username[1:] for user_id in two[1][:20]],
+        )
+        busiest = [
+            list(Traveler.objects.filter(user_id=member_ids[0]).order_by('email').values_list('email', 'destination'))
+            for _, member_ids in (one, two)
+        ]
+        self.assertEqual(busiest[0], busiest[1])
+
+    def test_same_seed_same_data(self):
+        self.seed('a')
+        first = list(ContactMessage.objects.order_by('id').values_list('subject', 'message', 'is_read'))
+        ContactMessage.objects.all().delete()
+        self.seed('b')
+        second = list(ContactMessage.objects.order_by('id').values_list('subject', 'message', 'is_read'))
+        self.assertEqual(first, second)
+
+    def test_skewed_rows(self):
+        staff_ids, member_ids = self.seed('seed')
+        self.assertEqual(User.objects.filter(username__startswith='seed').count(), 40)
+        self.assertEqual(UserProfile.objects.count(), 40)
+        self.assertEqual(User.objects.get(id=staff_ids[0]).is_staff, True)
+
+        travelers = Traveler.objects.filter(user_id=member_ids[0]).count()
+        self.assertGreater(travelers, 2000 / len(member_ids) * 5)
+        self.assertTrue(User.objects.get(id=member_ids[0]).check_password('password'))
+
+        oldest = ContactMessage.objects.order_by('created_at').first().created_at
+        self.assertLess(oldest, timezone.now() - timedelta(days=90))
+        unread = ContactMessage.objects.filter(is_read=False).count()
+        self.assertTrue(0 < unread < 2000)
+
+
+    def test_timestamps_leave_the_model_fields_alone(self):
+        # Other threads keep saving with auto_now while a seed runs
+        flags = set()
+        bulk_create = QuerySet.bulk_create
+
+        def spy(queryset, *args, **kwargs):
+            flags.add(Destination._meta.get_field('updated_at').auto_now)
+            return bulk_create(queryset, *args, **kwargs)
+
+        with mock.patch.object(QuerySet, 'bulk_create', spy):
+            self.seed('seed')
+        self.assertEqual(flags, {True})
+
+        oldest = Destination.objects.order_by('created_at').first()
+        self.assertLess(oldest.created_at, timezone.now() - timedelta(days=30))
+        self.assertEqual(oldest.updated_at, oldest.created_at)
+        self.assertLess(Traveler.objects.order_by('created_at').first().created_at, timezone.now() - timedelta(days=30))
+
+class SQLiteConcurrencyTests(SimpleTestCase):
+    """
+    Threads with their own connections to a real database file, as
+    separate server workers would have.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.settings_dict = dict(
+            connections['default'].settings_dict,
+            NAME=os.path.join(directory.name, 'concurrency.sqlite3'),
+        )
+        self.query('CREATE TABLE booking (id INTEGER PRIMARY KEY, seats INTEGER)')
+
+    def connect(self, **options):
+        settings_dict = dict(self.settings_dict)
+        settings_dict['OPTIONS'] = {**settings_dict['OPTIONS'], **options}
+        # Registered per thread, so transaction.atomic(using=...) finds it
+        connections['concurrency'] = TunedSQLiteWrapper(settings_dict, 'concurrency')
+        return connections['concurrency']
+
+    def query(self, sql):
+        db = self.connect()
+        try:
+            cursor = db.cursor()
+            cursor.execute(sql)
+            return cursor.fetchone()
+        finally:
+            db.close()
+
+    def run_threads(self, target, count):
+        errors = []
+
+        def run():
+            try:
+                target()
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections['concurrency'].close()
+
+        threads = [threading.Thread(target=run) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    def test_pragmas(self):
+        self.assertEqual(self.query('PRAGMA journal_mode'), ('wal',))
+        self.assertEqual(self.query('PRAGMA synchronous'), (1,))  # NORMAL
+
+    def test_read_then_write_transactions_do_not_deadlock(self):
+        # With a plain BEGIN, two of these that read at the same time can
+        # never both upgrade to a write, and one fails with "database is locked"
+        def book():
+            self.connect()
+            for _ in range(20):
+                with transaction.atomic(using='concurrency'):
+                    cursor = connections['concurrency'].cursor()
+                    cursor.execute('SELECT COALESCE(SUM(seats), 0) FROM booking')
+                    cursor.fetchone()
+                    cursor.execute('INSERT INTO booking (seats) VALUES (1)')
+
+        self.assertEqual(self.run_threads(book, 8), [])
+        self.assertEqual(self.query('SELECT COUNT(*) FROM booking'), (160,))
+
+    def test_readers_do_not_wait_for_a_writer(self):
+        writing = threading.Event()
+
+        def write():
+            self.connect()
+            with transaction.atomic(using='concurrency'):
+                connections['concurrency'].cursor().execute('INSERT INTO booking (seats) VALUES (5)')
+                writing.set()
+                time.sleep(0.5)
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        writing.wait()
+        started = time.perf_counter()
+        # The reader sees the last committed state straight away
+        self.assertEqual(self.query('SELECT COUNT(*) FROM booking'), (0,))
+        self.assertLess(time.perf_counter() - started, 0.25)
+        writer.join()
+
+    def test_lock_errors_are_retried(self):
+        blocker = sqlite3.connect(self.settings_dict['NAME'], isolation_level=None, check_same_thread=False)
+        blocker.execute('BEGIN IMMEDIATE')
+        threading.Timer(0.3, blocker.execute, ['COMMIT']).start()
+
+        # No busy wait at all, so only the retries can get past the lock
+        pragmas = {**self.settings_dict['OPTIONS']['pragmas'], 'busy_timeout': 0}
+        db = self.connect(pragmas=pragmas, lock_retries=10)
+        try:
+            with transaction.atomic(using='concurrency'):
+                db.cursor().execute('INSERT INTO booking (seats) VALUES (2)')
+        finally:
+            db.close()
+            blocker.close()
+        self.assertEqual(self.query('SELECT seats FROM booking'), (2,))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(SimpleTestCase):
+
+    def route(self, request, write=False):
+        router = PrimaryReplicaRouter()
+        seen = []
+
+        def view(request):
+            seen.append(router.db_for_read(Destination))
+            if write:
+                router.db_for_write(Destination)
+                seen.append(router.db_for_read(Destination))
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return seen, response
+
+    def test_safe_requests_read_from_a_replica(self):
+        seen, response = self.route(RequestFactory().get('/gallery/'))
+        self.assertEqual(seen, ['replica'])
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_writes_pin_reads_to_the_primary(self):
+        seen, response = self.route(RequestFactory().get('/'), write=True)
+        self.assertEqual(seen, ['replica', 'default'])
+        self.assertEqual(response.cookies[STICKY_COOKIE]['max-age'], 10)
+
+        request = RequestFactory().get('/gallery/')
+        request.COOKIES[STICKY_COOKIE] = '1'
+        self.assertEqual(self.route(request)[0], ['default'])
+
+    def test_unsafe_methods_and_other_code_use_the_primary(self):
+        self.assertEqual(self.route(RequestFactory().post('/contact/'))[0], ['default'])
+        self.assertEqual(PrimaryReplicaRouter().db_for_read(Destination), 'default')
+        self.assertFalse(PrimaryReplicaRouter().allow_migrate('replica', 'pages'))
+
+    def test_copy_sqlite_database(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        source = sqlite3.connect(os.path.join(directory.name, 'primary.sqlite3'))
+        source.execute('PRAGMA journal_mode = WAL')
+        source.execute('CREATE TABLE booking (seats INTEGER)')
+        source.execute('INSERT INTO booking VALUES (3)')
+        source.commit()
+
+        target_path = os.path.join(directory.name, 'replica.sqlite3')
+        copy_sqlite_database(source, target_path)
+        source.close()
+        replica = sqlite3.connect(target_path)
+        try:
+            self.assertEqual(replica.execute('SELECT seats FROM booking').fetchone(), (3,))
+            self.assertEqual(replica.execute('PRAGMA journal_mode').fetchone(), ('delete',))
+        finally:
+            replica.close()
+        self.assertEqual(sorted(os.listdir(directory.name)), ['primary.sqlite3', 'replica.sqlite3'])
+
+
+# Project routes with the public pages served by their async versions
+urlpatterns = [
+    path('', async_views.home),
+    path('about/', async_views.about),
+    path('gallery/', async_views.gallery),
+    path('gallery/page/', async_views.gallery_page),
+    path('destinations/<int:id>/', async_views.destination_detail),
+] + project_urls.urlpatterns
+
+
+@override_settings(CACHES=TEST_CACHE, ROOT_URLCONF='pages.tests')
+class AsyncViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff, cls.members = seed_dataset(users=1, destinations=60, messages_per_user=3, travelers_per_user=0)
+        cls.destination = Destination.objects.first()
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_pages_match_sync_views(self):
+        for url in ['/', '/about/', '/gallery/?category=cities', f'/destinations/{self.destination.id}/']:
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            await cache.aclear()
+            with self.settings(ROOT_URLCONF='mywebsite.urls'):
+                expected = await self.async_client.get(url)
+            self.assertEqual(response.content, expected.content, url)
+
+    async def test_conditional_get(self):
+        response = await self.async_client.get('/gallery/')
+        response = await self.async_client.get('/gallery/', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_staff_nav(self):
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(f'/destinations/{self.destination.id}/')
+        self.assertContains(response, 'Edit This Destination')
+        self.assertContains(response, f'<span class="nav-badge">{await ContactMessage.objects.filter(is_read=False).acount()}</span>')
+
+    async def test_missing_destination(self):
+        response = await self.async_client.get('/destinations/0/')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,119 @@
+import logging
+import os
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# name -> (width, height, crop to fill the box?)
+THUMBNAIL_SIZES = {
+    'avatar': (80, 80, True),
+    'card': (320, 320, True),
+    'full': (1280, 1280, False),
+}
+
+# extension -> (Pillow format, save options)
+THUMBNAIL_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+
+
+def thumbnail_name(name, size, extension):
+    # profiles/me.png -> profiles/thumbs/me.png/avatar.webp. Uploads can
+    # never land under thumbs/ (ImageField wants an image extension), and
+    # the whole original name keeps me.png and me.jpg apart.
+    directory, filename = posixpath.split(name)
+    return posixpath.join(directory, 'thumbs', filename, f'{size}.{extension}')
+
+
+def thumbnails_exist(name):
+    return default_storage.exists(thumbnail_name(name, 'full', 'jpg'))
+
+
+def delete_thumbnails(name):
+    """Delete every derivative of ``name``, e.g. once the picture was replaced."""
+    # "full" first, so thumbnails_exist() is never true for half a set
+    for size in sorted(THUMBNAIL_SIZES, key=lambda size: size != 'full'):
+        for extension in THUMBNAIL_FORMATS:
+            default_storage.delete(thumbnail_name(name, size, extension))
+    try:
+        os.rmdir(default_storage.path(posixpath.dirname(thumbnail_name(name, 'full', 'jpg'))))
+    except (NotImplementedError, OSError):
+        # Storages without directories, or something else is in there
+        pass
+
+
+def _flatten(image):
+    # JPEG (and WebP as saved here) has no alpha, and a plain convert('RGB')
+    # turns transparent pixels black, so they are laid on white instead
+    if image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def generate_thumbnails(name):
+    """
+    Write every size/format derivative of the uploaded image ``name``.
+
+    Images are re-encoded from pixels only, so EXIF (GPS, camera serial
+    numbers) and other metadata never reach the derivatives. The EXIF
+    rotation is applied first so photos keep the right way up.
+    """
+    with default_storage.open(name, 'rb') as original:
+        image = Image.open(original)
+        image = ImageOps.exif_transpose(image)
+        image = _flatten(image)
+
+    # "full" is written last: thumbnails_exist() checks it to mean "all done"
+    for size in sorted(THUMBNAIL_SIZES, key=lambda size: size == 'full'):
+        width, height, crop = THUMBNAIL_SIZES[size]
+        if crop:
+            resized = ImageOps.fit(image, (width, height), Image.LANCZOS)
+        else:
+            resized = image.copy()
+            resized.thumbnail((width, height), Image.LANCZOS)
+
+        for extension, (image_format, options) in THUMBNAIL_FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, image_format, **options)
+            target = thumbnail_name(name, size, extension)
+            if default_storage.exists(target):
+                default_storage.delete(target)
+            default_storage.save(target, ContentFile(buffer.getvalue()))
+
+
+def _run(name):
+    try:
+        generate_thumbnails(name)
+    except Exception:
+        # A broken upload must not kill the worker thread
+        logger.exception('Could not generate thumbnails for %s', name)
+
+
+def queue_thumbnails(name):
+    """
+    Generate derivatives for ``name`` on a background thread once the
+    current transaction commits, so the upload request returns at once.
+    With THUMBNAIL_WORKERS = 0 they are generated inline instead.
+    """
+    global _executor
+
+    if not settings.THUMBNAIL_WORKERS:
+        transaction.on_commit(lambda: _run(name))
+        return
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS, thread_name_prefix='thumbnails')
+    transaction.on_commit(lambda: _executor.submit(_run, name))
@@ -1,15 +1,32 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User
-from .models import Traveler, ContactMessage, UserProfile, Destination
-from .forms import TravelerForm, ContactForm, UserRegistrationForm, UserProfileForm, DestinationForm
+from django.db import transaction
+from django.urls import reverse
+from .models import Traveler, ContactMessage, UserProfile, Destination, Highlight
+from .forms import TravelerForm, ContactForm, UserRegistrationForm, UserProfileForm, DestinationForm, DestinationImportForm, ExportFilterForm
+from .exporters import export_filename, stream_export
+from .importers import detect_format, import_destinations, iter_rows, open_text
+from .contact_queue import enqueue_contact_message
+from .cache import cache_public_page, destination_condition, destinations_condition, home_condition
+from .facets import build_facets, facet_counts, filter_q, filter_query, parse_filters
+from .counters import invalidate_unread_counts, unread_count
+from .metrics import registry, render_prometheus
+from .pagination import keyset_page
+from .popularity import popular_destinations
+from .rollups import add_to_rollup, dashboard_stats
+from .search import search_destinations
 
 # Helper function to check if user is admin
 def is_admin(user):
     return user.is_staff or user.is_superuser
 
+@home_condition
+@cache_public_page(popularity=True)
 def home(request):
     # Get featured destinations for slider
     featured_destinations = Destination.objects.filter(is_featured=True)[:8]
@@ -17,6 +34,9 @@ def home(request):
     context = {
         'title': 'Welcome to TravelXplore',
         'featured_destinations': featured_destinations,
+        # Counters, not a COUNT over travelers. Every counter change bumps
+        # the popularity version, which keys the cached copy and the ETag.
+        'popular_destinations': popular_destinations(settings.POPULAR_DESTINATIONS_COUNT),
     }
     return render(request, 'home.html', context)
 
@@ -27,16 +47,81 @@ def about(request):
     }
     return render(request, 'about.html', context)
 
+# Only the columns the gallery cards actually show
+GALLERY_CARD_FIELDS = ('id', 'name', 'country', 'category', 'image_url',
+                       'price_per_day', 'duration_days', 'created_at')
+
+def gallery_queryset(request):
+    filters = parse_filters(request)
+    destinations = Destination.objects.only(*GALLERY_CARD_FIELDS).filter(filter_q(filters))
+    return filters, destinations
+
+def get_gallery_page(request):
+    filters, destinations = gallery_queryset(request)
+    page = keyset_page(destinations, request.GET.get('cursor'), settings.GALLERY_PAGE_SIZE)
+    return filters, page
+
+@destinations_condition
+@cache_public_page
 def gallery(request):
-    # Get all destinations for gallery
-    destinations = Destination.objects.all()
-    
+    # First page of destinations, filtered by the facets in the database
+    filters, page = get_gallery_page(request)
+
     context = {
         'title': 'Gallery',
-        'destinations': destinations,
+        'destinations': page,
+        'list_path': reverse('gallery'),
+        'filter_query': filter_query(filters),
+        'facets': build_facets(filters, facet_counts(filters)),
     }
     return render(request, 'gallery.html', context)
 
+@destinations_condition
+@cache_public_page
+def gallery_page(request):
+    # HTML fragment with the next page of cards, used for infinite scroll
+    filters, page = get_gallery_page(request)
+    context = {'destinations': page, 'list_path': reverse('gallery'), 'filter_query': filter_query(filters)}
+    return render(request, 'gallery_items.html', context)
+
+def get_highlight_page(request, slug):
+    highlight = get_object_or_404(Highlight, slug=slug)
+    # Walks the link table's highlight_id index, not the highlights text
+    destinations = Destination.objects.only(*GALLERY_CARD_FIELDS).filter(highlight_tags=highlight)
+    page = keyset_page(destinations, request.GET.get('cursor'), settings.GALLERY_PAGE_SIZE)
+    return highlight, page
+
+@destinations_condition
+@cache_public_page
+def highlight_detail(request, slug):
+    highlight, page = get_highlight_page(request, slug)
+    context = {
+        'title': highlight.name,
+        'highlight': highlight,
+        'destinations': page,
+        'list_path': reverse('highlight_detail', args=[slug]),
+    }
+    return render(request, 'highlight_detail.html', context)
+
+@destinations_condition
+@cache_public_page
+def highlight_page(request, slug):
+    # Next page of cards for infinite scroll, like gallery_page
+    _, page = get_highlight_page(request, slug)
+    context = {'destinations': page, 'list_path': reverse('highlight_detail', args=[slug])}
+    return render(request, 'gallery_items.html', context)
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    results = search_destinations(query) if query else []
+
+    context = {
+        'title': 'Search',
+        'query': query,
+        'results': results,
+    }
+    return render(request, 'search.html', context)
+
 # ============ AUTHENTICATION VIEWS ============
 
 def register_view(request):
@@ -50,14 +135,13 @@ def register_view(request):
             email = form.cleaned_data['email']
             password = form.cleaned_data['password']
             
-            # Create user
-            user = User.objects.create_user(username=username, email=email, password=password)
-            
-            # Create user profile
-            UserProfile.objects.create(
-                user=user,
-                phone=form.cleaned_data.get('phone', '')
-            )
+            # Create user and profile (and the dashboard rollup) together
+            with transaction.atomic():
+                user = User.objects.create_user(username=username, email=email, password=password)
+                UserProfile.objects.create(
+                    user=user,
+                    phone=form.cleaned_data.get('phone', '')
+                )
             
             # IMPORTANT: Automatically log in the user after registration
             login(request, user)
@@ -119,7 +203,12 @@ def contact(request):
         if form.is_valid():
             contact_message = form.save(commit=False)
             contact_message.user = request.user
-            contact_message.save()
+            if settings.CONTACT_WRITE_BEHIND:
+                # Stored in batches by drain_contact_queue, off the request path
+                enqueue_contact_message(contact_message)
+            else:
+                with transaction.atomic():
+                    contact_message.save()
             messages.success(request, '✅ Thank you! Your message has been sent successfully!')
             return redirect('contact')
     else:
@@ -142,7 +231,7 @@ def contact(request):
 
 @login_required(login_url='login')
 def traveler_list(request):
-    travelers = Traveler.objects.filter(user=request.user)
+    travelers = Traveler.objects.filter(user=request.user).order_by('-created_at')
     return render(request, 'traveler_list.html', {'travelers': travelers})
 
 @login_required(login_url='login')
@@ -152,7 +241,8 @@ def traveler_create(request):
         if form.is_valid():
             traveler = form.save(commit=False)
             traveler.user = request.user
-            traveler.save()
+            with transaction.atomic():
+                traveler.save()
             messages.success(request, '✅ Traveler added successfully!')
             return redirect('traveler_list')
     else:
@@ -166,7 +256,8 @@ def traveler_update(request, id):
     form = TravelerForm(request.POST or None, instance=traveler)
 
     if form.is_valid():
-        form.save()
+        with transaction.atomic():
+            form.save()
         messages.success(request, '✅ Traveler updated successfully!')
         return redirect('traveler_list')
 
@@ -177,7 +268,8 @@ def traveler_delete(request, id):
     traveler = get_object_or_404(Traveler, id=id, user=request.user)
 
     if request.method == 'POST':
-        traveler.delete()
+        with transaction.atomic():
+            traveler.delete()
         messages.success(request, '✅ Traveler deleted successfully!')
         return redirect('traveler_list')
 
@@ -185,14 +277,33 @@ def traveler_delete(request, id):
 
 # ============ MESSAGE VIEWS ============
 
+# Only the columns the inbox table shows (skips the message body)
+MESSAGE_LIST_FIELDS = ('id', 'user_id', 'name', 'email', 'subject', 'created_at', 'is_read')
+
 @login_required(login_url='login')
 def message_list(request):
     if request.user.is_staff:
-        messages_all = ContactMessage.objects.all()
+        inbox = ContactMessage.objects.only(*MESSAGE_LIST_FIELDS)
     else:
-        messages_all = ContactMessage.objects.filter(user=request.user)
-    
-    return render(request, 'message_list.html', {'messages': messages_all})
+        inbox = ContactMessage.objects.only(*MESSAGE_LIST_FIELDS).filter(user=request.user)
+
+    status = request.GET.get('status', 'all')
+    if status == 'unread':
+        inbox = inbox.filter(is_read=False)
+    elif status == 'read':
+        inbox = inbox.filter(is_read=True)
+    else:
+        status = 'all'
+
+    page = keyset_page(inbox, request.GET.get('cursor'), settings.INBOX_PAGE_SIZE)
+
+    context = {
+        'inbox': page,
+        'status': status,
+        'unread_total': unread_count(request.user),
+        'is_first_page': not request.GET.get('cursor'),
+    }
+    return render(request, 'message_list.html', context)
 
 @login_required(login_url='login')
 def message_detail(request, id):
@@ -200,9 +311,16 @@ def message_detail(request, id):
         message = get_object_or_404(ContactMessage, id=id)
     else:
         message = get_object_or_404(ContactMessage, id=id, user=request.user)
-    
-    message.is_read = True
-    message.save()
+
+    if not message.is_read:
+        # Single-column UPDATE that is a no-op if someone else got here first
+        with transaction.atomic():
+            marked = ContactMessage.objects.filter(id=message.id, is_read=False).update(is_read=True)
+            if marked:
+                # update() sends no post_save
+                add_to_rollup(message.created_at, unread_messages=-1)
+                invalidate_unread_counts([message.user_id])
+        message.is_read = True
     return render(request, 'message_detail.html', {'message': message})
 
 @login_required(login_url='login')
@@ -213,12 +331,39 @@ def message_delete(request, id):
         message = get_object_or_404(ContactMessage, id=id, user=request.user)
     
     if request.method == 'POST':
-        message.delete()
+        with transaction.atomic():
+            message.delete()
         messages.success(request, '✅ Message deleted successfully!')
         return redirect('message_list')
     
     return render(request, 'message_confirm_delete.html', {'message': message})
 
+# ============ EXPORTS (Admin Only) ============
+
+def export_response(request, kind):
+    form = ExportFilterForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest('Invalid export filters: ' + form.errors.as_text())
+
+    file_format = form.cleaned_data['format'] or 'csv'
+    content_type = 'application/x-ndjson' if file_format == 'jsonl' else 'text/csv'
+    response = StreamingHttpResponse(
+        stream_export(kind, file_format, **form.filters()),
+        content_type=f'{content_type}; charset=utf-8',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(kind, file_format)}"'
+    return response
+
+@login_required(login_url='login')
+@user_passes_test(is_admin, login_url='home')
+def message_export(request):
+    return export_response(request, 'messages')
+
+@login_required(login_url='login')
+@user_passes_test(is_admin, login_url='home')
+def traveler_export(request):
+    return export_response(request, 'travelers')
+
 # ============ DESTINATION VIEWS (Admin Only) ============
 
 @login_required(login_url='login')
@@ -235,7 +380,8 @@ def destination_create(request):
         if form.is_valid():
             destination = form.save(commit=False)
             destination.created_by = request.user
-            destination.save()
+            with transaction.atomic():
+                destination.save()
             messages.success(request, '✅ Destination added successfully!')
             return redirect('destination_list')
     else:
@@ -265,13 +411,62 @@ def destination_delete(request, id):
     destination = get_object_or_404(Destination, id=id)
     
     if request.method == 'POST':
-        destination.delete()
+        with transaction.atomic():
+            destination.delete()
         messages.success(request, '✅ Destination deleted successfully!')
         return redirect('destination_list')
     
     return render(request, 'destination_confirm_delete.html', {'destination': destination})
 
+@login_required(login_url='login')
+@user_passes_test(is_admin, login_url='home')
+def destination_import(request):
+    result = None
+
+    if request.method == 'POST':
+        form = DestinationImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            file_format = form.cleaned_data['format']
+            if file_format == 'auto':
+                file_format = detect_format(upload.name)
+
+            # Rows are read straight from the uploaded (temporary) file
+            result = import_destinations(
+                iter_rows(open_text(upload.file), file_format),
+                batch_size=settings.IMPORT_BATCH_SIZE,
+                upsert=form.cleaned_data['upsert'],
+                created_by=request.user,
+            )
+            if result.created or result.updated:
+                messages.success(request, f'✅ Imported {result.created + result.updated} destinations!')
+            if result.failed:
+                messages.error(request, f'❌ {result.failed} rows could not be imported.')
+    else:
+        form = DestinationImportForm()
+
+    return render(request, 'destination_import.html', {'form': form, 'result': result})
+
+# Daily activity for staff, read from the DailyStats rollup rows
+@login_required(login_url='login')
+@user_passes_test(is_admin, login_url='home')
+def dashboard(request):
+    recent, totals = dashboard_stats(settings.DASHBOARD_DAYS)
+    # Newest day first, like the other admin tables
+    return render(request, 'dashboard.html', {'days': recent[::-1], 'totals': totals})
+
+# Request metrics of every worker, in Prometheus text format
+@login_required(login_url='login')
+@user_passes_test(is_admin, login_url='home')
+def metrics(request):
+    return HttpResponse(
+        render_prometheus(registry.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
 # Public destination detail view (everyone can see)
+@destination_condition
+@cache_public_page
 def destination_detail(request, id):
-    destination = get_object_or_404(Destination, id=id)
+    destination = get_object_or_404(Destination.objects.prefetch_related('highlight_tags'), id=id)
     return render(request, 'destination_detail.html', {'destination': destination})
\ No newline at end of file